@@ -0,0 +1,100 @@
+# benchmarks/bench_ann_recall.py
+#
+# Recall@k vs query latency for each VECTOR_INDEX_TYPE, against the exact
+# flat index as ground truth. Uses synthetic clustered vectors by default, or
+# the vectors of an existing store with --store (e.g. settings.VECTOR_DB_PATH).
+#
+#   python -m benchmarks.bench_ann_recall --n 50000 --dim 768 --k 5
+#   python -m benchmarks.bench_ann_recall --store ./vector_store
+
+import argparse
+import os
+import time
+import faiss
+import numpy as np
+from db.index_factory import apply_search_params, create_index, reconstruct_all
+
+
+def _synthetic(n: int, dim: int, n_queries: int, seed: int = 0):
+    """
+    Gaussian blobs, roughly how chunk embeddings of many policies cluster.
+    Queries are perturbed copies of random base vectors.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n // 200, 1), dim), dtype=np.float32)
+    base = centers[rng.integers(len(centers), size=n)] + 0.3 * rng.standard_normal((n, dim), dtype=np.float32)
+    picks = base[rng.integers(n, size=n_queries)]
+    queries = picks + 0.1 * rng.standard_normal(picks.shape, dtype=np.float32)
+    return np.ascontiguousarray(base), np.ascontiguousarray(queries)
+
+def _from_store(path: str, n_queries: int, seed: int = 0):
+    index = faiss.read_index(os.path.join(path, "index.faiss"))
+    base = reconstruct_all(index)
+    rng = np.random.default_rng(seed)
+    picks = base[rng.integers(len(base), size=n_queries)]
+    queries = picks + 0.05 * rng.standard_normal(picks.shape, dtype=np.float32)
+    return np.ascontiguousarray(base), np.ascontiguousarray(queries)
+
+def _timed_search(index, queries: np.ndarray, k: int):
+    """
+    Per-query latency (one search per question, like the single-query path).
+    """
+    index.search(queries[:1], k)  # warm-up
+    lat = []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, I = index.search(q[None, :], k)
+        lat.append(time.perf_counter() - t0)
+    _, I = index.search(queries, k)
+    return I, np.array(lat) * 1000
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--n", type=int, default=50000, help="synthetic corpus size")
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--store", help="benchmark on the vectors of an existing store directory")
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    ap.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    args = ap.parse_args()
+
+    if args.store:
+        base, queries = _from_store(args.store, args.queries)
+    else:
+        base, queries = _synthetic(args.n, args.dim, args.queries)
+    n, dim = base.shape
+    print(f"📦 {n} vectors × {dim} dims, {len(queries)} queries, k={args.k}\n")
+
+    flat = create_index("flat", dim)
+    flat.add(base)
+    truth, flat_lat = _timed_search(flat, queries, args.k)
+
+    print(f"{'index':<10} {'param':<14} {'build s':>8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'speedup':>8}")
+    print(f"{'flat':<10} {'-':<14} {0:>8.1f} {1:>9.3f} "
+          f"{np.percentile(flat_lat, 50):>8.3f} {np.percentile(flat_lat, 99):>8.3f} {1:>7.1f}x")
+
+    for index_type in ("ivf_flat", "ivf_pq", "hnsw"):
+        t0 = time.perf_counter()
+        index = create_index(index_type, dim, base)
+        index.add(base)
+        build = time.perf_counter() - t0
+
+        if index_type == "hnsw":
+            sweep = [("efSearch", {"ef_search": ef}) for ef in args.ef_search]
+        else:
+            sweep = [("nprobe", {"nprobe": p}) for p in args.nprobe]
+        for name, params in sweep:
+            apply_search_params(index, **params)
+            found, lat = _timed_search(index, queries, args.k)
+            label = f"{name}={next(iter(params.values()))}"
+            print(f"{index_type:<10} {label:<14} {build:>8.1f} {_recall(found, truth):>9.3f} "
+                  f"{np.percentile(lat, 50):>8.3f} {np.percentile(lat, 99):>8.3f} "
+                  f"{np.median(flat_lat) / np.median(lat):>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# benchmarks/bench_embedding_backends.py
+#
+# Embedding backends on CPU: torch fp32 (SentenceTransformer) vs ONNX Runtime
+# fp32 vs ONNX Runtime dynamic int8 (EMBEDDING_BACKEND / EMBEDDING_ONNX_QUANTIZE).
+# Each backend runs in a fresh subprocess so its memory is measured alone, and
+# reports:
+#   chunk embedding : chunks/s for `--chunks` synthetic CHUNK_SIZE-character
+#                     chunks, `--batch-size` per forward pass (ingest path)
+#   query embedding : p50/p99 latency of single embed_query calls and of one
+#                     embed_queries call for `--questions` questions (request path)
+#   memory          : RSS after loading the model and peak RSS
+#   agreement       : min / mean cosine similarity to the torch embeddings
+# The embedding cache is disabled in the workers. The first ONNX run exports the
+# model to <EMBEDDING_MODEL_PATH>/onnx/ (not timed).
+#
+#   python -m benchmarks.bench_embedding_backends [--chunks 512 --queries 200 --threads 4]
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+_WORDS = (
+    "insured policy premium hospitalisation benefit claim waiting period sum "
+    "insured coverage exclusion deductible renewal grace network provider room "
+    "rent ICU treatment pre-existing disease co-payment limit maternity day care"
+).split()
+
+BACKENDS = {
+    "torch": {"EMBEDDING_BACKEND": "torch"},
+    "onnx": {"EMBEDDING_BACKEND": "onnx", "EMBEDDING_ONNX_QUANTIZE": "false"},
+    "onnx-int8": {"EMBEDDING_BACKEND": "onnx", "EMBEDDING_ONNX_QUANTIZE": "true"},
+}
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:   # Windows
+        return float("nan")
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choices(_WORDS, k=rng.randint(8, 18))).capitalize() + "."
+
+def _texts(chunks: int, queries: int, chunk_size: int):
+    rng = random.Random(0)
+    docs = []
+    for _ in range(chunks):
+        text = ""
+        while len(text) < chunk_size:
+            text += _sentence(rng) + " "
+        docs.append(text[:chunk_size])
+    questions = [_sentence(rng).rstrip(".") + "?" for _ in range(queries)]
+    return docs, questions
+
+def _worker(args):
+    # Environment is set up by the parent before anything reads config
+    t0 = time.perf_counter()
+    from config import settings
+    from embedder.embed import embed_queries, embed_query, embed_texts, loaded_backend, warm_up
+    warm_up()
+    load_s = time.perf_counter() - t0
+    rss_loaded = _rss_mb()
+
+    docs, questions = _texts(args.chunks, args.queries, settings.CHUNK_SIZE)
+    embed_texts(docs[:args.batch_size], batch_size=args.batch_size)   # warm-up
+    t0 = time.perf_counter()
+    doc_vecs = embed_texts(docs, batch_size=args.batch_size)
+    chunk_s = time.perf_counter() - t0
+
+    latencies = []
+    query_vecs = []
+    for q in questions:
+        t0 = time.perf_counter()
+        query_vecs.append(embed_query(q))
+        latencies.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    embed_queries(questions[:args.questions])
+    batch_s = time.perf_counter() - t0
+
+    np.savez(args.out, docs=doc_vecs, queries=np.stack(query_vecs))
+    print(json.dumps({
+        "backend": loaded_backend(),   # may be "torch" if the ONNX load fell back
+        "load_s": load_s,
+        "chunks_per_s": len(docs) / chunk_s,
+        "query_p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "query_p99_ms": float(np.percentile(latencies, 99)) * 1000,
+        "questions_ms": batch_s * 1000,
+        "rss_loaded_mb": rss_loaded,
+        "rss_peak_mb": _peak_rss_mb(),
+    }))
+
+def _cosines(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    ap.add_argument("--chunks", type=int, default=512, help="chunks embedded per backend")
+    ap.add_argument("--batch-size", type=int, default=32, help="chunks per forward pass")
+    ap.add_argument("--queries", type=int, default=200, help="single-question embed_query calls")
+    ap.add_argument("--questions", type=int, default=10, help="questions in the embed_queries batch")
+    ap.add_argument("--threads", type=int, default=0, help="EMBEDDING_ONNX_THREADS (0 → ORT default)")
+    ap.add_argument("--worker", choices=list(BACKENDS), help=argparse.SUPPRESS)
+    ap.add_argument("--out", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        _worker(args)
+        return
+
+    results, vectors = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            out = os.path.join(tmp, f"{backend}.npz")
+            env = {
+                **os.environ, **BACKENDS[backend],
+                "EMBEDDING_ONNX_THREADS": str(args.threads),
+                "EMBED_CACHE_ENABLED": "false",
+            }
+            cmd = [
+                sys.executable, "-m", "benchmarks.bench_embedding_backends", "--worker", backend, "--out", out,
+                "--chunks", str(args.chunks), "--batch-size", str(args.batch_size),
+                "--queries", str(args.queries), "--questions", str(args.questions),
+            ]
+            print(f"⏳ {backend} …")
+            proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"❌ {backend} failed:\n{proc.stderr[-2000:]}")
+                continue
+            # Backend log lines (export, fallbacks) come before the JSON line
+            lines = proc.stdout.strip().splitlines()
+            for line in lines[:-1]:
+                print(f"   {line}")
+            results[backend] = json.loads(lines[-1])
+            if results[backend]["backend"] != backend:
+                print(f"   ⚠️ {backend} fell back to {results[backend]['backend']}; its row measures that")
+            with np.load(out) as data:
+                vectors[backend] = (data["docs"], data["queries"])
+
+    print(
+        f"\n📊 {'backend':<10} {'load s':>7} {'chunks/s':>9} {'q p50 ms':>9} {'q p99 ms':>9}"
+        f" {f'{args.questions}q ms':>8} {'RSS MB':>7} {'peak MB':>8} {'cos min':>8} {'cos mean':>9}"
+    )
+    for backend, r in results.items():
+        cos_min = cos_mean = float("nan")
+        if "torch" in vectors and backend != "torch":
+            cos = np.concatenate([_cosines(a, b) for a, b in zip(vectors[backend], vectors["torch"])])
+            cos_min, cos_mean = float(cos.min()), float(cos.mean())
+        print(
+            f"   {backend:<10} {r['load_s']:7.1f} {r['chunks_per_s']:9.1f} {r['query_p50_ms']:9.2f}"
+            f" {r['query_p99_ms']:9.2f} {r['questions_ms']:8.1f} {r['rss_loaded_mb']:7.0f}"
+            f" {r['rss_peak_mb']:8.0f} {cos_min:8.4f} {cos_mean:9.4f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_hybrid_search.py
+#
+# Dense-only vs hybrid (BM25 + dense, reciprocal rank fusion) retrieval on a
+# synthetic policy corpus where every chunk carries an exact identifier — a
+# clause number ("Section 12.3.4") and a plan/product name ("Plan Q-17") —
+# and each question asks about one of them in paraphrased wording. Reports
+# hit@k (the chunk holding the identifier is in the top k) and per-batch
+# search latency for both modes. Uses the configured embedding model.
+#
+#   python -m benchmarks.bench_hybrid_search [--chunks 5000 --questions 200 --k 5]
+
+import argparse
+import random
+import time
+from typing import List, Tuple
+import numpy as np
+from embedder.embed import embed_queries, embed_texts, get_embedding_dimension
+from db.vector_store import FaissVectorStore
+
+_WORDS = (
+    "insured policy premium hospitalisation benefit claim waiting period sum "
+    "insured coverage exclusion deductible renewal grace network provider room "
+    "rent ICU treatment pre-existing disease co-payment limit maternity day care"
+).split()
+_TEMPLATES = [
+    "What does Section {clause} say about {topic}?",
+    "Under {plan}, how is {topic} handled?",
+    "Explain clause {clause} of the policy.",
+    "Is {topic} covered for {plan}?",
+]
+
+
+def _corpus(n_chunks: int, n_questions: int, seed: int = 0) -> Tuple[List[str], List[str], List[int]]:
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(n_chunks):
+        clause = f"{i // 100 + 1}.{i // 10 % 10 + 1}.{i % 10 + 1}"
+        plan = f"Plan {chr(65 + i % 26)}-{i // 26}"
+        body = " ".join(rng.choices(_WORDS, k=rng.randint(60, 120)))
+        chunks.append(f"Section {clause} ({plan}): {body}.")
+    targets = rng.sample(range(n_chunks), n_questions)
+    questions = []
+    for t in targets:
+        clause, plan = chunks[t].split(" ", 2)[1], chunks[t].split("(", 1)[1].split(")", 1)[0]
+        questions.append(rng.choice(_TEMPLATES).format(clause=clause, plan=plan, topic=" ".join(rng.choices(_WORDS, k=2))))
+    return chunks, questions, targets
+
+def _hit_rate(results: List[List[str]], chunks: List[str], targets: List[int]) -> float:
+    return float(np.mean([chunks[t] in hits for hits, t in zip(results, targets)]))
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--chunks", type=int, default=5000)
+    ap.add_argument("--questions", type=int, default=200)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--repeat", type=int, default=5, help="timed passes per mode")
+    args = ap.parse_args()
+
+    chunks, questions, targets = _corpus(args.chunks, args.questions)
+    print(f"⏳ Embedding {len(chunks)} chunks …")
+    store = FaissVectorStore(get_embedding_dimension(), persist_path=None)
+    store.add_documents(chunks, embed_texts(chunks, batch_size=64))
+    query_vecs = embed_queries(questions)
+
+    t0 = time.perf_counter()
+    store.warm_up_lexical()
+    print(f"🔤 BM25 index over {len(chunks)} chunks built in {time.perf_counter() - t0:.2f}s")
+
+    modes = {
+        "dense": lambda: store.search_batch(query_vecs, top_k=args.k),
+        "hybrid": lambda: store.hybrid_search_batch(query_vecs, questions, top_k=args.k),
+    }
+    print(f"\n📊 {'mode':<8} {f'hit@{args.k}':>7} {'batch ms':>9} {'ms/question':>12}")
+    for name, run in modes.items():
+        results = run()
+        timings = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - t0)
+        batch_ms = float(np.median(timings)) * 1000
+        print(f"   {name:<8} {_hit_rate(results, chunks, targets):7.3f} {batch_ms:9.1f} {batch_ms / len(questions):12.3f}")
+
+if __name__ == "__main__":
+    main()
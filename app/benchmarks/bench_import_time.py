@@ -0,0 +1,82 @@
+# benchmarks/bench_import_time.py
+#
+# Import-time profile and regression guard. Imports each entry point in a fresh
+# interpreter with `python -X importtime` (`--runs` times, median reported)
+# and lists the slowest modules it pulled in. Exits non-zero if an entry point
+# imports any of the heavy libraries that must load lazily (torch,
+# sentence_transformers, faiss, the PDF/DOCX parsers, langchain, onnxruntime)
+# or takes longer than `--budget-ms`, so it can run in CI.
+#
+#   python -m benchmarks.bench_import_time [--modules main index_documents --budget-ms 1500]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Loaded on first use / by the warm-up, never by `import main`
+HEAVY = (
+    "torch", "sentence_transformers", "transformers", "faiss", "onnxruntime",
+    "pdfplumber", "pymupdf", "pymupdf4llm", "docx", "langchain",
+)
+
+
+def _profile(module: str) -> Tuple[float, Dict[str, int], List[str]]:
+    """
+    Total import time (ms), cumulative µs per module, and the heavy libraries
+    that actually executed. faiss counts only once its lazy proxy has loaded.
+    """
+    probe = (
+        f"import sys, importlib.util; import {module}; "
+        f"print('LOADED', *[m for m in {HEAVY!r} if m in sys.modules "
+        f"and not isinstance(sys.modules[m], importlib.util._LazyModule)])"
+    )
+    env = {**os.environ, "AUTH_TOKEN": os.environ.get("AUTH_TOKEN", "bench"),
+           "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "bench")}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    cumulative: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cum)
+    loaded = [m for m in proc.stdout.split("LOADED", 1)[-1].split()]
+    return cumulative.get(module, 0) / 1000, cumulative, loaded
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--modules", nargs="+", default=["main", "rag.answering", "index_documents"])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10, help="slowest modules listed per entry point")
+    ap.add_argument("--budget-ms", type=float, default=1500.0, help="max median import time per entry point")
+    args = ap.parse_args()
+
+    failures = []
+    for module in args.modules:
+        runs = [_profile(module) for _ in range(args.runs)]
+        median = statistics.median(total for total, _, _ in runs)
+        _, cumulative, loaded = runs[-1]
+        print(f"\n📊 import {module}: median {median:.0f} ms over {args.runs} runs")
+        for name, us in sorted(cumulative.items(), key=lambda kv: kv[1], reverse=True)[1:args.top + 1]:
+            print(f"   {us / 1000:8.1f} ms  {name}")
+        if loaded:
+            failures.append(f"{module} imports {', '.join(loaded)} eagerly")
+        if median > args.budget_ms:
+            failures.append(f"{module} takes {median:.0f} ms to import (budget {args.budget_ms:.0f} ms)")
+
+    if failures:
+        print("\n❌ Import-time regressions:")
+        for failure in failures:
+            print(f"   {failure}")
+        sys.exit(1)
+    print("\n✅ No heavy imports at import time, all within budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_llm_client.py
+#
+# Gemini client benchmark against the local mock server (no API key needed).
+# Fires `--prompts` calls at once, the way run_hackrx does, and compares:
+#   per-call clients : a new httpx.AsyncClient per call, no concurrency cap
+#                      (what call_gemini_api used to do)
+#   shared client    : generator.llm.call_gemini_api — pooled keep-alive
+#                      client + global limiter + Retry-After handling
+# and reports wall time, TCP connections opened, peak in-flight calls and
+# 429s seen by the server.
+#
+#   python -m benchmarks.bench_llm_client --prompts 30 --latency 0.2
+#   python -m benchmarks.bench_llm_client --prompts 30 --rate 10   # throttling server
+
+import argparse
+import asyncio
+import os
+import time
+import httpx
+
+from benchmarks.mock_gemini import start_in_thread
+
+
+async def _per_call_clients(url: str, n: int):
+    async def one(i: int):
+        async with httpx.AsyncClient(timeout=30) as client:
+            resp = await client.post(url, json={"contents": [{"parts": [{"text": f"q{i}"}]}]})
+            return resp.status_code
+    return await asyncio.gather(*(one(i) for i in range(n)))
+
+async def _shared_client(n: int):
+    from generator.llm import call_gemini_api, start_llm_client, close_llm_client
+    start_llm_client()
+    try:
+        return await asyncio.gather(*(call_gemini_api(f"q{i}") for i in range(n)), return_exceptions=True)
+    finally:
+        await close_llm_client()
+
+def _report(label: str, elapsed: float, results, stats: dict):
+    ok = sum(1 for r in results if r == 200 or r == "ok")
+    print(f"\n📊 {label}")
+    print(f"   wall time     : {elapsed * 1000:9.1f} ms")
+    print(f"   answered      : {ok}/{len(results)}")
+    print(f"   connections   : {stats['connections']}")
+    print(f"   max in flight : {stats['max_in_flight']}")
+    print(f"   429s          : {stats['throttled']}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--prompts", type=int, default=30, help="calls fired at once (questions per request)")
+    ap.add_argument("--latency", type=float, default=0.1, help="mock server seconds per answer")
+    ap.add_argument("--rate", type=int, default=0, help="mock server requests/second before 429 (0 → never)")
+    ap.add_argument("--concurrency", type=int, default=8, help="GEMINI_MAX_CONCURRENCY for the shared client")
+    args = ap.parse_args()
+
+    server = start_in_thread(latency=args.latency, rate=args.rate, retry_after=1.0)
+    base = f"http://127.0.0.1:{server.server_port}/v1beta/models/"
+    # Must be set before config / generator.llm are imported
+    os.environ["GEMINI_API_BASE_URL"] = base
+    os.environ["GEMINI_MAX_CONCURRENCY"] = str(args.concurrency)
+    os.environ.setdefault("GEMINI_API_KEY", "mock")
+    os.environ.setdefault("AUTH_TOKEN", "mock")
+
+    url = f"{base}gemini-1.5-flash:generateContent"
+    t0 = time.perf_counter()
+    results = asyncio.run(_per_call_clients(url, args.prompts))
+    _report("per-call clients", time.perf_counter() - t0, results, dict(server.stats))
+
+    # Let the throttling window drain so both runs start from the same state
+    time.sleep(1.1)
+    server.reset()
+    t0 = time.perf_counter()
+    results = asyncio.run(_shared_client(args.prompts))
+    _report(f"shared client (max {args.concurrency} in flight)", time.perf_counter() - t0, results, dict(server.stats))
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
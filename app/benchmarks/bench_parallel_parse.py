@@ -0,0 +1,110 @@
+# benchmarks/bench_parallel_parse.py
+#
+# Serial vs parallel PDF → Markdown conversion on a synthetic policy wording.
+# Builds a multi-hundred-page PDF (headings in several font sizes, body
+# paragraphs, ruled tables, some of them continuing across a page break),
+# converts it with parse_document serially and with parse_pdf_parallel (page
+# windows spread over a ProcessPoolExecutor), checks the outputs are
+# byte-identical and reports wall time per worker count.
+#
+#   python -m benchmarks.bench_parallel_parse [--pages 300 --workers 1 2 4 --window 8]
+#
+# Speed-up is bounded by the number of CPU cores; on a 1-core box expect none.
+
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pymupdf
+
+from parser.document_parser import parse_document, parse_pdf_parallel
+
+_WORDS = (
+    "insured policy premium hospitalisation benefit claim waiting period sum "
+    "insured coverage exclusion deductible renewal grace network provider room "
+    "rent ICU treatment pre-existing disease co-payment limit maternity day care"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(_WORDS, k=rng.randint(8, 18))
+    return " ".join(words).capitalize() + "."
+
+def _table(page: pymupdf.Page, y: float, rows: int, rng: random.Random) -> float:
+    """
+    Draws a ruled 3-column table from `y`; returns where it ends.
+    """
+    x0, widths, height = 72, (170, 150, 150), 18
+    for r in range(rows + 1):
+        page.draw_line((x0, y + r * height), (x0 + sum(widths), y + r * height))
+    x = x0
+    for w in (0,) + widths:
+        x += w
+        page.draw_line((x, y), (x, y + rows * height))
+    for r in range(rows):
+        cells = ("Plan " + "ABC"[r % 3], f"{rng.randint(1, 5)}% of SI", f"{rng.randint(15, 90)} days")
+        x = x0
+        for cell, w in zip(cells, widths):
+            page.insert_text((x + 4, y + r * height + 13), cell, fontsize=10)
+            x += w
+    return y + rows * height
+
+def build_pdf(pages: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    doc = pymupdf.open()
+    section = 0
+    for pno in range(pages):
+        page = doc.new_page(width=612, height=792)
+        y = 72
+        if pno % 6 == 0:
+            section += 1
+            page.insert_text((72, y), f"Section {section}: Benefits and Conditions", fontsize=20)
+            y += 34
+        if pno % 3 == 0:
+            page.insert_text((72, y), f"{section}.{pno % 6 // 3 + 1} Scope of Cover", fontsize=15)
+            y += 26
+        if pno % 5 == 1:
+            # Table continued from the previous page
+            y = _table(page, y, 3, rng) + 24
+        while y < 640:
+            line = ""
+            for sentence in (_sentence(rng) for _ in range(3)):
+                line += sentence + " "
+            for start in range(0, len(line), 95):
+                page.insert_text((72, y), line[start:start + 95], fontsize=11)
+                y += 14
+            y += 10
+        if pno % 5 == 0:
+            # Table that runs into the bottom margin and continues on the next page
+            _table(page, 660, 4, rng)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--pages", type=int, default=300)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--window", type=int, default=8, help="pages per parse task")
+    ap.add_argument("--mode", choices=["markdown", "plain"], default="markdown")
+    args = ap.parse_args()
+
+    buffer = build_pdf(args.pages)
+    print(f"📄 Synthetic PDF: {args.pages} pages, {len(buffer) / 2**20:.1f} MiB, {os.cpu_count()} CPU(s)")
+
+    t0 = time.perf_counter()
+    serial = parse_document(buffer, "policy.pdf", "application/pdf", args.mode)
+    t_serial = time.perf_counter() - t0
+    print(f"\n📊 serial            : {t_serial:7.2f} s   ({len(serial):,} chars)")
+
+    for workers in args.workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            t0 = time.perf_counter()
+            text = parse_pdf_parallel(buffer, pool, args.mode, window=args.window, max_in_flight=workers + 1)
+            elapsed = time.perf_counter() - t0
+        same = "identical" if text == serial else "DIFFERENT"
+        print(f"   {workers} worker(s)      : {elapsed:7.2f} s   {t_serial / elapsed:5.2f}x   output {same}")
+
+if __name__ == "__main__":
+    main()
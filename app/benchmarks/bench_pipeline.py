@@ -0,0 +1,440 @@
+# benchmarks/bench_pipeline.py
+#
+# End-to-end pipeline benchmark that runs fully offline: no network, GPU,
+# model download or Gemini key. It
+#   - generates synthetic policy documents (`--docs` per format, `--pages`
+#     pages each) as PDF, DOCX and TXT and serves them from a local HTTP server
+#   - embeds with a deterministic hashing stub (`--embedder stub`, default) or
+#     the model at EMBEDDING_MODEL_PATH (`--embedder model`, e.g. a tiny one)
+#   - answers from the local mock Gemini (benchmarks/mock_gemini.py) after
+#     `--llm-latency-ms`
+# and measures, for generate_prompts (in process) and POST /api/v1/hackrx/run
+# (the real app under uvicorn, over HTTP):
+#   ingest  : first request per document — docs/s, pages/s, MB/s, chunks/s
+#   query   : p50/p99 latency of `--queries` requests on ingested documents
+#   scaling : run_hackrx req/s and p50/p99 at each `--concurrency` level
+#   memory  : RSS after each phase and peak RSS
+#   stages  : calls and mean ms per pipeline stage (rag_stage_seconds)
+# Everything (vector store, caches) lives in a temporary directory, and the
+# answer cache is off unless `--answer-cache`. Results go to `--out` as JSON
+# together with the git commit, so runs on two commits can be diffed.
+#
+#   python -m benchmarks.bench_pipeline [--docs 2 --pages 20 --queries 50 --concurrency 1 4 8 --out bench.json]
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Dict, List, Sequence
+import numpy as np
+
+from benchmarks.mock_gemini import start_in_thread as start_mock_gemini
+
+_WORDS = (
+    "insured policy premium hospitalisation benefit claim waiting period sum "
+    "insured coverage exclusion deductible renewal grace network provider room "
+    "rent ICU treatment pre-existing disease co-payment limit maternity day care"
+).split()
+_QUESTIONS = [
+    "What is the waiting period for {topic}?",
+    "Is {topic} covered under the policy?",
+    "What does Section {clause} say about {topic}?",
+    "How much is the limit for {topic}?",
+    "Are there exclusions for {topic}?",
+]
+FORMATS = ("pdf", "docx", "txt")
+TOKEN = "bench-token"
+
+
+# ─── Deterministic embedder ───────────────────────────────────────────────────
+
+class HashingEncoder:
+    """
+    Stand-in for the SentenceTransformer: signed feature hashing of the
+    lower-cased words, L2-normalised. Same text → same vector on every
+    machine, and texts sharing words land near each other, so retrieval
+    still does real work. Encoding cost is small and stable, which keeps
+    the rest of the pipeline in focus.
+    """
+    def __init__(self, dim: int = 384, max_tokens: int = 512):
+        self.dim = dim
+        self.tokenizer = SimpleNamespace(model_max_length=max_tokens)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, convert_to_numpy: bool = True, show_progress_bar: bool = False, **_):
+        vecs = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                slot, sign = _word_hash(word, self.dim)
+                vecs[row, slot] += sign
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        return vecs / np.maximum(norms, 1e-12)
+
+@lru_cache(maxsize=65536)
+def _word_hash(word: str, dim: int):
+    h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % dim, (1.0 if h >> 63 else -1.0)
+
+
+# ─── Synthetic documents ──────────────────────────────────────────────────────
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choices(_WORDS, k=rng.randint(8, 18))).capitalize() + "."
+
+def _pages(pages: int, seed: int) -> List[List[str]]:
+    """
+    `pages` pages of numbered clauses ("Section 3.2 Maternity") with body
+    paragraphs, ~2,500 characters each.
+    """
+    rng = random.Random(seed)
+    out = []
+    for pno in range(pages):
+        paragraphs = []
+        for clause in range(1, 4):
+            title = " ".join(rng.choices(_WORDS, k=2)).title()
+            paragraphs.append(f"Section {pno + 1}.{clause} {title}")
+            for _ in range(2):
+                paragraphs.append(" ".join(_sentence(rng) for _ in range(5)))
+        out.append(paragraphs)
+    return out
+
+def build_document(fmt: str, pages: int, seed: int = 0) -> bytes:
+    content = _pages(pages, seed)
+    if fmt == "pdf":
+        import pymupdf
+        doc = pymupdf.open()
+        for paragraphs in content:
+            page = doc.new_page(width=612, height=792)
+            page.insert_textbox(pymupdf.Rect(54, 54, 558, 738), "\n\n".join(paragraphs), fontsize=9)
+        return doc.tobytes()
+    if fmt == "docx":
+        import io
+        import docx
+        doc = docx.Document()
+        for pno, paragraphs in enumerate(content):
+            if pno:
+                doc.add_page_break()
+            for i, text in enumerate(paragraphs):
+                if i % 3 == 0:
+                    doc.add_heading(text, level=2)
+                else:
+                    doc.add_paragraph(text)
+        buf = io.BytesIO()
+        doc.save(buf)
+        return buf.getvalue()
+    if fmt == "txt":
+        return "\n\n".join("\n\n".join(paragraphs) for paragraphs in content).encode("utf-8")
+    raise ValueError(f"Unknown format {fmt}")
+
+def _questions(rng: random.Random, n: int, pages: int) -> List[str]:
+    return [
+        rng.choice(_QUESTIONS).format(
+            topic=" ".join(rng.choices(_WORDS, k=2)),
+            clause=f"{rng.randint(1, pages)}.{rng.randint(1, 3)}"
+        )
+        for _ in range(n)
+    ]
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    extensions_map = {
+        **SimpleHTTPRequestHandler.extensions_map,
+        ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        ".txt": "text/plain",
+    }
+
+    def log_message(self, *args):
+        pass
+
+def _serve_directory(directory: str) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), lambda *a: _QuietHandler(*a, directory=directory))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ─── Measurement helpers ──────────────────────────────────────────────────────
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:   # Windows
+        return float("nan")
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _latency(samples: Sequence[float]) -> Dict[str, float]:
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "n": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+def _ingest_rates(seconds: float, docs: List[dict], chunks: int) -> Dict[str, float]:
+    pages = sum(d["pages"] for d in docs)
+    mb = sum(d["bytes"] for d in docs) / 1e6
+    return {
+        "docs": len(docs),
+        "pages": pages,
+        "mb": round(mb, 3),
+        "chunks": chunks,
+        "seconds": seconds,
+        "docs_per_s": len(docs) / seconds,
+        "pages_per_s": pages / seconds,
+        "mb_per_s": mb / seconds,
+        "chunks_per_s": chunks / seconds,
+    }
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ─── Phases ───────────────────────────────────────────────────────────────────
+
+def _bench_generate_prompts(docs: List[dict], args, rng: random.Random) -> dict:
+    from rag.rag_system import generate_prompts
+    from db.vector_store import get_persistent_store
+
+    store = get_persistent_store()
+    before = len(store.texts)
+    t0 = time.perf_counter()
+    for d in docs:
+        generate_prompts(d["url"], _questions(rng, args.questions, args.pages))
+    ingest = _ingest_rates(time.perf_counter() - t0, docs, len(store.texts) - before)
+
+    samples = []
+    for _ in range(args.queries):
+        d = rng.choice(docs)
+        questions = _questions(rng, args.questions, args.pages)
+        t0 = time.perf_counter()
+        generate_prompts(d["url"], questions)
+        samples.append(time.perf_counter() - t0)
+    return {"ingest": ingest, "query": _latency(samples)}
+
+async def _post(client, url: str, document: str, questions: List[str]) -> float:
+    t0 = time.perf_counter()
+    resp = await client.post(url, json={"documents": document, "questions": questions})
+    resp.raise_for_status()
+    if len(resp.json()["answers"]) != len(questions):
+        raise RuntimeError(f"Expected {len(questions)} answers, got {resp.text[:200]}")
+    return time.perf_counter() - t0
+
+async def _bench_run_hackrx(base: str, docs: List[dict], all_docs: List[dict], args, rng: random.Random) -> dict:
+    import httpx
+    from db.vector_store import get_persistent_store
+
+    url = f"{base}/api/v1/hackrx/run"
+    headers = {"Authorization": f"Bearer {TOKEN}"}
+    store = get_persistent_store()
+    async with httpx.AsyncClient(headers=headers, timeout=600) as client:
+        before = len(store.texts)
+        t0 = time.perf_counter()
+        for d in docs:
+            await _post(client, url, d["url"], _questions(rng, args.questions, args.pages))
+        ingest = _ingest_rates(time.perf_counter() - t0, docs, len(store.texts) - before)
+
+        samples = [
+            await _post(client, url, rng.choice(all_docs)["url"], _questions(rng, args.questions, args.pages))
+            for _ in range(args.queries)
+        ]
+
+        scaling = []
+        for level in args.concurrency:
+            requests = [
+                (rng.choice(all_docs)["url"], _questions(rng, args.questions, args.pages))
+                for _ in range(max(args.queries, level))
+            ]
+            queue = iter(requests)
+            latencies: List[float] = []
+
+            async def worker():
+                for document, questions in queue:
+                    latencies.append(await _post(client, url, document, questions))
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(level)))
+            wall = time.perf_counter() - t0
+            scaling.append({"concurrency": level, "wall_s": wall, "req_per_s": len(requests) / wall, **_latency(latencies)})
+    return {"ingest": ingest, "query": _latency(samples), "scaling": scaling}
+
+def _start_server(port: int):
+    import uvicorn
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 300
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.05)
+    return server, thread
+
+def _stages() -> Dict[str, dict]:
+    from telemetry.metrics import STAGE_SECONDS
+    return {
+        key[0]: {"calls": count, "total_s": total, "mean_ms": total / count * 1000}
+        for key, (total, count) in sorted(STAGE_SECONDS.totals().items())
+        if count
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--docs", type=int, default=2, help="documents per format and per entry point")
+    ap.add_argument("--pages", type=int, default=20, help="pages per document")
+    ap.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    ap.add_argument("--questions", type=int, default=5, help="questions per request")
+    ap.add_argument("--queries", type=int, default=50, help="timed requests per latency / scaling measurement")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--embedder", choices=("stub", "model"), default="stub")
+    ap.add_argument("--dim", type=int, default=384, help="stub embedding dimension")
+    ap.add_argument("--llm-latency-ms", type=float, default=50.0, help="mock Gemini latency per call")
+    ap.add_argument("--answer-cache", action="store_true", help="leave the answer cache on")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="", help="write results here as JSON")
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    docs_dir = os.path.join(workdir, "docs")
+    os.makedirs(docs_dir)
+    gemini = start_mock_gemini(latency=args.llm_latency_ms / 1000, answer="Mock answer")
+
+    # Set up the environment before anything reads config
+    os.environ.update({
+        "VECTOR_DB_PATH": os.path.join(workdir, "vector_store"),
+        "GEMINI_API_BASE_URL": f"http://127.0.0.1:{gemini.server_port}/v1beta/models/",
+        "GEMINI_API_KEY": "bench",
+        "AUTH_TOKEN": TOKEN,
+        "ANSWER_CACHE_ENABLED": "true" if args.answer_cache else "false",
+        "WARMUP_BLOCKING": "true",
+        "PARTITIONED_STORE": "false",
+        "ALLOW_DB_UPDATE": "true",
+    })
+    if args.embedder == "stub":
+        os.environ.setdefault("EMBEDDING_MODEL_PATH", os.path.join(workdir, "stub-model"))
+        from embedder.embed import use_model
+        use_model(HashingEncoder(args.dim))
+
+    from config import settings
+
+    print(f"⏳ Generating {args.docs * 2} × {'/'.join(args.formats)} documents of {args.pages} pages in {workdir} …")
+    docs_server = _serve_directory(docs_dir)
+    doc_sets = {"generate_prompts": [], "run_hackrx": []}
+    seed = args.seed
+    for entry_point, docs in doc_sets.items():
+        for fmt in args.formats:
+            for i in range(args.docs):
+                name = f"{entry_point}-{i}.{fmt}"
+                data = build_document(fmt, args.pages, seed=seed)
+                seed += 1
+                with open(os.path.join(docs_dir, name), "wb") as f:
+                    f.write(data)
+                docs.append({
+                    "url": f"http://127.0.0.1:{docs_server.server_port}/{name}",
+                    "format": fmt, "pages": args.pages, "bytes": len(data),
+                })
+
+    rng = random.Random(args.seed)
+    memory = {"start_mb": _rss_mb()}
+    results = {}
+
+    print("⏳ generate_prompts: ingest + query latency …")
+    results["generate_prompts"] = _bench_generate_prompts(doc_sets["generate_prompts"], args, rng)
+    memory["after_generate_prompts_mb"] = _rss_mb()
+
+    print("⏳ run_hackrx: starting uvicorn, ingest, query latency, concurrency scaling …")
+    port = _free_port()
+    server, thread = _start_server(port)
+    try:
+        all_docs = doc_sets["generate_prompts"] + doc_sets["run_hackrx"]
+        results["run_hackrx"] = asyncio.run(
+            _bench_run_hackrx(f"http://127.0.0.1:{port}", doc_sets["run_hackrx"], all_docs, args, rng)
+        )
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+        docs_server.shutdown()
+        gemini.shutdown()
+    memory["after_run_hackrx_mb"] = _rss_mb()
+    memory["peak_mb"] = _peak_rss_mb()
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "args": vars(args),
+        "config": {
+            "embedder": args.embedder,
+            "chunk_size": settings.CHUNK_SIZE,
+            "chunk_overlap": settings.CHUNK_OVERLAP,
+            "context_token_budget": settings.CONTEXT_TOKEN_BUDGET,
+            "parse_pool_workers": settings.PARSE_POOL_WORKERS,
+            "gemini_max_concurrency": settings.GEMINI_MAX_CONCURRENCY,
+        },
+        "results": results,
+        "memory": memory,
+        "stages": _stages(),
+        "mock_gemini": dict(gemini.stats),
+    }
+
+    print(f"\n📊 {'entry point':<17} {'docs/s':>7} {'pages/s':>8} {'MB/s':>6} {'chunks/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, r in results.items():
+        ing, q = r["ingest"], r["query"]
+        print(
+            f"   {name:<17} {ing['docs_per_s']:7.2f} {ing['pages_per_s']:8.1f} {ing['mb_per_s']:6.2f}"
+            f" {ing['chunks_per_s']:9.1f} {q['p50_ms']:8.1f} {q['p99_ms']:8.1f}"
+        )
+    print(f"\n📊 {'concurrency':>11} {'req/s':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for s in results["run_hackrx"]["scaling"]:
+        print(f"   {s['concurrency']:11d} {s['req_per_s']:7.2f} {s['p50_ms']:8.1f} {s['p99_ms']:8.1f}")
+    print(f"\n📊 {'stage':<15} {'calls':>6} {'mean ms':>9}")
+    for name, s in report["stages"].items():
+        print(f"   {name:<15} {s['calls']:6d} {s['mean_ms']:9.2f}")
+    print(f"\n📊 RSS {memory['start_mb']:.0f} → {memory['after_run_hackrx_mb']:.0f} MB, peak {memory['peak_mb']:.0f} MB")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_vector_handoff.py
+#
+# Micro-benchmark for the embedder → vector store hand-off.
+# Compares the old `.tolist()` → `np.array(...).astype('float32')` round trip
+# against passing the encoder's float32 array straight through.
+#
+# Needs only numpy + faiss (the encoder output is simulated), so it runs
+# anywhere:   python -m benchmarks.bench_vector_handoff [--chunks 1000 --dim 768]
+
+import argparse
+import time
+import tracemalloc
+import faiss
+import numpy as np
+
+
+def _list_roundtrip(encoded: np.ndarray) -> np.ndarray:
+    # What embed_texts + add_documents used to do
+    as_lists = encoded.tolist()
+    return np.array(as_lists).astype('float32')
+
+def _zero_copy(encoded: np.ndarray) -> np.ndarray:
+    # What they do now
+    return np.ascontiguousarray(encoded, dtype=np.float32)
+
+def _measure(fn, encoded: np.ndarray, consume, repeat: int):
+    """
+    Best-of-`repeat` wall time, then peak traced allocations in a separate
+    run (tracemalloc slows down Python object creation, so it isn't timed).
+    """
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        consume(fn(encoded))
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    consume(fn(encoded))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+def _report(label: str, old, new):
+    (t_old, m_old), (t_new, m_new) = old, new
+    print(f"\n📊 {label}")
+    print(f"   tolist round trip : {t_old * 1000:9.2f} ms   peak {m_old / 2**20:8.2f} MiB")
+    print(f"   float32 pass-thru : {t_new * 1000:9.2f} ms   peak {m_new / 2**20:8.2f} MiB")
+    print(f"   saved             : {(t_old - t_new) * 1000:9.2f} ms   "
+          f"{(m_old - m_new) / 2**20:8.2f} MiB  ({t_old / max(t_new, 1e-9):.0f}x faster)")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--chunks", type=int, default=1000, help="chunks per ingested document")
+    ap.add_argument("--queries", type=int, default=30, help="questions per request")
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    chunk_out = rng.standard_normal((args.chunks, args.dim), dtype=np.float32)
+    query_out = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    # Ingest: encoder output → IndexFlatL2.add
+    add_to_index = lambda vecs: faiss.IndexFlatL2(args.dim).add(vecs)
+    _report(
+        f"Ingest path ({args.chunks} chunks × {args.dim} dims)",
+        _measure(_list_roundtrip, chunk_out, add_to_index, args.repeat),
+        _measure(_zero_copy, chunk_out, add_to_index, args.repeat),
+    )
+
+    # Query: one vector per question → search input
+    per_query_lists = lambda q: np.stack([_list_roundtrip(v[None, :])[0] for v in q])
+    _report(
+        f"Query path ({args.queries} questions × {args.dim} dims)",
+        _measure(per_query_lists, query_out, lambda vecs: None, args.repeat),
+        _measure(_zero_copy, query_out, lambda vecs: None, args.repeat),
+    )
+
+if __name__ == "__main__":
+    main()
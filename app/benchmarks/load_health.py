@@ -0,0 +1,106 @@
+# benchmarks/load_health.py
+#
+# Load test: does /health stay responsive while heavy ingests run?
+#
+# Measures /health latency on an idle server, then again while `--concurrency`
+# clients keep posting a large document to /api/v1/hackrx/run. With the
+# non-blocking pipeline the two distributions should be close; a blocking
+# pipeline shows /health p99 jumping to the ingest duration.
+#
+#   uvicorn main:app --port 8000            (in another shell)
+#   python -m benchmarks.load_health --url http://localhost:8000 \
+#       --document https://.../policy.pdf --concurrency 4 --duration 30
+#
+# Reads the bearer token from $AUTH_TOKEN (or --token). Repeats of a document
+# are served by the document cache, so pass several distinct --document URLs
+# (they are used round-robin) to keep the ingests heavy. Point
+# GEMINI_API_BASE_URL at a mock server if you don't want to call Gemini.
+
+import argparse
+import asyncio
+import itertools
+import os
+import time
+import httpx
+import numpy as np
+
+
+async def _probe_health(client: httpx.AsyncClient, base_url: str, stop: asyncio.Event, interval: float):
+    latencies = []
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        resp = await client.get(f"{base_url}/health")
+        resp.raise_for_status()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+async def _ingest_loop(client: httpx.AsyncClient, base_url: str, token: str, bodies, stop: asyncio.Event):
+    durations, errors = [], 0
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        try:
+            resp = await client.post(
+                f"{base_url}/api/v1/hackrx/run",
+                json=next(bodies),
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            resp.raise_for_status()
+            durations.append(time.perf_counter() - t0)
+        except httpx.HTTPError:
+            errors += 1
+    return durations, errors
+
+def _summary(latencies):
+    a = np.asarray(latencies)
+    return (f"n={len(a):5d}  p50={np.percentile(a, 50):7.2f} ms  p95={np.percentile(a, 95):7.2f} ms  "
+            f"p99={np.percentile(a, 99):7.2f} ms  max={a.max():7.2f} ms")
+
+async def _phase(args, with_load: bool):
+    stop = asyncio.Event()
+    timeout = httpx.Timeout(args.request_timeout)
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        probe = asyncio.create_task(_probe_health(client, args.url, stop, args.interval))
+        ingests = []
+        if with_load:
+            bodies = itertools.cycle([{"documents": d, "questions": args.questions} for d in args.document])
+            ingests = [
+                asyncio.create_task(_ingest_loop(client, args.url, args.token, bodies, stop))
+                for _ in range(args.concurrency)
+            ]
+        await asyncio.sleep(args.duration)
+        stop.set()
+        latencies = await probe
+        results = await asyncio.gather(*ingests)
+    return latencies, results
+
+async def main_async(args):
+    print(f"🩺 idle baseline ({args.duration}s)")
+    idle, _ = await _phase(args, with_load=False)
+    print("   /health " + _summary(idle))
+
+    print(f"🏋️ under load: {args.concurrency} concurrent ingests over {len(args.document)} document(s)")
+    loaded, results = await _phase(args, with_load=True)
+    print("   /health " + _summary(loaded))
+    durations = [d for ds, _ in results for d in ds]
+    errors = sum(e for _, e in results)
+    if durations:
+        print(f"   ingests: {len(durations)} completed, {errors} failed, "
+              f"mean {np.mean(durations):.2f}s each")
+    ratio = np.percentile(loaded, 99) / max(np.percentile(idle, 99), 1e-6)
+    print(f"\n/health p99 under load is {ratio:.1f}x the idle p99")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--url", default="http://localhost:8000")
+    ap.add_argument("--token", default=os.getenv("AUTH_TOKEN", ""))
+    ap.add_argument("--document", nargs="+", required=True, help="URL(s) of large PDFs to ingest")
+    ap.add_argument("--questions", nargs="+", default=["What is the grace period for premium payment?"])
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds per phase")
+    ap.add_argument("--interval", type=float, default=0.05, help="seconds between /health probes")
+    ap.add_argument("--request-timeout", type=float, default=300.0)
+    asyncio.run(main_async(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
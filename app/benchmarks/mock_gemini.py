@@ -0,0 +1,179 @@
+# benchmarks/mock_gemini.py
+#
+# Local stand-in for the Gemini generateContent endpoint, for load tests and
+# for exercising the client's pooling / rate limiting without an API key.
+#
+#   python -m benchmarks.mock_gemini --port 8799 --latency 0.2 --rate 5
+#   GEMINI_API_BASE_URL=http://127.0.0.1:8799/v1beta/models/ uvicorn main:app
+#
+# Every POST gets a canned answer after `--latency` seconds; JSON-mode calls
+# (packed multi-question prompts) get {"answers": {"1": ..., ...}} with one
+# entry per numbered question. `:streamGenerateContent` calls get the answer
+# as server-sent events, one word each, spread over the same latency. With
+# `--rate N`, more than N requests within one second get a 429 with `Retry-After`.
+# GET /stats returns connection / request / 429 counters (POST /stats/reset
+# zeroes them), which is how bench_llm_client checks connection reuse.
+
+import argparse
+import json
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: float = 0.0, rate: int = 0, retry_after: float = 1.0, answer: str = "ok"):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.rate = rate
+        self.retry_after = retry_after
+        self.answer = answer
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {"connections": 0, "requests": 0, "throttled": 0, "max_in_flight": 0}
+            self._in_flight = 0
+
+    def bump(self, key: str, delta: int = 1):
+        with self._lock:
+            self.stats[key] += delta
+
+    def admit(self) -> bool:
+        """
+        Sliding one-second window; False means "answer 429".
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            if self.rate and len(self._recent) >= self.rate:
+                self.stats["throttled"] += 1
+                return False
+            self._recent.append(now)
+            self.stats["requests"] += 1
+            self._in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+            return True
+
+    def done(self):
+        with self._lock:
+            self._in_flight -= 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so reuse is observable
+
+    def setup(self):
+        super().setup()
+        self.server.bump("connections")
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        if self.path.startswith("/stats"):
+            self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        if self.path.startswith("/stats/reset"):
+            self.server.reset()
+            self._send_json(200, {"status": "ok"})
+            return
+
+        if not self.server.admit():
+            self._send_json(
+                429,
+                {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}},
+                {"Retry-After": f"{self.server.retry_after:g}"},
+            )
+            return
+        try:
+            if ":streamGenerateContent" in self.path:
+                self._stream(self._answer(raw))
+                return
+            time.sleep(self.server.latency)
+            self._send_json(200, {"candidates": [{"content": {"parts": [{"text": self._answer(raw)}]}}]})
+        finally:
+            self.server.done()
+
+    def _stream(self, answer: str):
+        words = answer.split(" ")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, word in enumerate(words):
+            time.sleep(self.server.latency / len(words))
+            text = word if i == 0 else " " + word
+            event = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+            if i == len(words) - 1:
+                event["usageMetadata"] = {"promptTokenCount": 0, "candidatesTokenCount": len(words)}
+            data = f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _answer(self, raw: bytes) -> str:
+        try:
+            body = json.loads(raw or b"{}")
+            prompt = body["contents"][0]["parts"][0]["text"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            return self.server.answer
+        if body.get("generationConfig", {}).get("responseMimeType") != "application/json":
+            return self.server.answer
+        questions = prompt.split("\nQuestions:\n", 1)[-1]
+        numbers = re.findall(r"^(\d+)\. ", questions, flags=re.MULTILINE)
+        return json.dumps({"answers": {n: f"{self.server.answer} ({n})" for n in numbers}})
+
+    def log_message(self, *args):
+        pass
+
+
+def start_in_thread(port: int = 0, **kwargs) -> MockGeminiServer:
+    """
+    Starts a server on 127.0.0.1 in a daemon thread; `server.server_port`
+    holds the bound port when `port` is 0.
+    """
+    server = MockGeminiServer(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    ap = argparse.ArgumentParser(description="Mock Gemini generateContent server")
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds before each answer")
+    ap.add_argument("--rate", type=int, default=0, help="requests/second before answering 429 (0 → never)")
+    ap.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    ap.add_argument("--answer", default="ok")
+    args = ap.parse_args()
+
+    server = MockGeminiServer(
+        ("127.0.0.1", args.port),
+        latency=args.latency, rate=args.rate, retry_after=args.retry_after, answer=args.answer,
+    )
+    print(f"✅ Mock Gemini listening on http://127.0.0.1:{args.port}/v1beta/models/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
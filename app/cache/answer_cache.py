@@ -0,0 +1,293 @@
+# cache/answer_cache.py
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+import numpy as np
+from config import settings
+
+
+def normalize_question(question: str) -> str:
+    """
+    Case-, whitespace- and trailing-punctuation-insensitive form of a question.
+    """
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?.!: ").strip()
+
+def _config_fingerprint() -> str:
+    # Answers are only valid for the chunker, embedder and LLM that made them
+    return (
+        f"{settings.EMBEDDING_MODEL_PATH}|{settings.CHUNK_SIZE}|{settings.CHUNK_OVERLAP}"
+        f"|{settings.GEMINI_QNA_MODEL}"
+    )
+
+def document_fingerprint(sha256: str, namespace: str = "") -> str:
+    """
+    Cache namespace for questions about one document's bytes. New content at
+    the same URL hashes differently, so it never sees the old answers.
+    `namespace` (partition, retrieval scope) keeps answers built from
+    different context apart.
+    """
+    return _scoped(f"doc:{sha256}|{_config_fingerprint()}", namespace)
+
+def store_fingerprint(n_chunks: int, namespace: str = "") -> str:
+    """
+    Cache namespace for document-less questions (answered from the persistent
+    store alone); any chunk added to the store starts a new namespace.
+    """
+    return _scoped(f"store:{n_chunks}|{_config_fingerprint()}", namespace)
+
+def _scoped(fingerprint: str, namespace: str) -> str:
+    return f"{namespace}/{fingerprint}" if namespace else fingerprint
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    vector: Optional[np.ndarray]    # unit-length question embedding (near-duplicate matching)
+    created_at: float
+
+
+class AnswerCache:
+    """
+    (document fingerprint, normalized question) → generated answer.
+
+    An exact miss can still hit a near-duplicate question about the same
+    document: cosine similarity of the question embeddings ≥ `similarity`
+    (0 disables that). Entries expire after `ttl_seconds`; the in-memory tier is
+    an LRU of `max_entries`, optionally backed by SQLite (`db_path`) so answers
+    survive restarts.
+    """
+    def __init__(
+        self,
+        max_entries: int = settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = settings.ANSWER_CACHE_TTL_SECONDS,
+        similarity: float = settings.ANSWER_CACHE_SIMILARITY,
+        db_path: Optional[str] = None,
+        max_disk_entries: int = settings.ANSWER_CACHE_DISK_MAX_ENTRIES,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.max_disk_entries = max_disk_entries
+        self._entries: "OrderedDict[Tuple[str, str], CachedAnswer]" = OrderedDict()
+        self._by_fingerprint: Dict[str, Set[str]] = {}
+        self._loaded: Set[str] = set()     # fingerprints fully pulled from SQLite
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidated": 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " fingerprint TEXT NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL,"
+                " vector BLOB, created_at REAL NOT NULL, used_at REAL NOT NULL,"
+                " PRIMARY KEY (fingerprint, question))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_used_at ON answers (used_at)")
+            self._db.commit()
+
+    # ─── Lookups ──────────────────────────────────────────────────────────────
+
+    def get(self, fingerprint: str, question: str) -> Optional[str]:
+        """
+        Exact (normalized) match; a None here is not yet counted as a miss,
+        see `get_similar`.
+        """
+        key = (fingerprint, normalize_question(question))
+        with self._lock:
+            self._load_fingerprint(fingerprint)
+            entry = self._live(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            self._touch_disk(key)
+            return entry.answer
+
+    def get_similar(self, fingerprint: str, vector: np.ndarray) -> Optional[str]:
+        """
+        Best near-duplicate question about the same document, if it clears
+        the similarity threshold. Counts a miss otherwise.
+        """
+        with self._lock:
+            if self.similarity > 0:
+                self._load_fingerprint(fingerprint)
+                keys = [(fingerprint, q) for q in self._by_fingerprint.get(fingerprint, ())]
+                candidates = [(k, e) for k in keys if (e := self._live(k)) is not None and e.vector is not None]
+                if candidates:
+                    scores = np.stack([e.vector for _, e in candidates]) @ _unit(vector)
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity:
+                        key, entry = candidates[best]
+                        self._entries.move_to_end(key)
+                        self.counters["similar_hits"] += 1
+                        self._touch_disk(key)
+                        return entry.answer
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, fingerprint: str, question: str, answer: str, vector: Optional[np.ndarray] = None):
+        if not answer:
+            return
+        key = (fingerprint, normalize_question(question))
+        entry = CachedAnswer(answer, _unit(vector) if vector is not None else None, time.time())
+        with self._lock:
+            self._insert(key, entry)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                        (key[0], key[1], entry.answer,
+                         entry.vector.tobytes() if entry.vector is not None else None,
+                         entry.created_at, entry.created_at),
+                    )
+                    self._prune_disk()
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Failed to write answer cache entry: {e}")
+
+    # ─── Invalidation ─────────────────────────────────────────────────────────
+
+    def invalidate(self, fingerprint: str) -> int:
+        """
+        Drops every answer about one document; returns how many were cached.
+        """
+        with self._lock:
+            self._load_fingerprint(fingerprint)
+            questions = self._by_fingerprint.pop(fingerprint, set())
+            for q in questions:
+                self._entries.pop((fingerprint, q), None)
+            self._loaded.discard(fingerprint)
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers WHERE fingerprint = ?", (fingerprint,))
+                self._db.commit()
+            self.counters["invalidated"] += len(questions)
+            return len(questions)
+
+    def clear(self):
+        with self._lock:
+            self.counters["invalidated"] += len(self._entries)
+            self._entries.clear()
+            self._by_fingerprint.clear()
+            self._loaded.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["similar_hits"] + self.counters["misses"]
+            hits = self.counters["hits"] + self.counters["similar_hits"]
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+    # ─── Internals (caller holds the lock) ────────────────────────────────────
+
+    def _expired(self, entry: CachedAnswer) -> bool:
+        return self.ttl_seconds > 0 and time.time() - entry.created_at > self.ttl_seconds
+
+    def _live(self, key: Tuple[str, str]) -> Optional[CachedAnswer]:
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry):
+            self._remove(key)
+            self.counters["expired"] += 1
+            return None
+        return entry
+
+    def _insert(self, key: Tuple[str, str], entry: CachedAnswer):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._by_fingerprint.setdefault(key[0], set()).add(key[1])
+        # Evict least-recently-used entries (they remain in SQLite, if any)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._forget(evicted)
+            self.counters["evictions"] += 1
+
+    def _remove(self, key: Tuple[str, str]):
+        self._entries.pop(key, None)
+        self._forget(key)
+        if self._db is not None:
+            self._db.execute("DELETE FROM answers WHERE fingerprint = ? AND question = ?", key)
+            self._db.commit()
+
+    def _forget(self, key: Tuple[str, str]):
+        questions = self._by_fingerprint.get(key[0])
+        if questions is not None:
+            questions.discard(key[1])
+            if not questions:
+                del self._by_fingerprint[key[0]]
+        # Partially resident now: reload from disk on next use
+        self._loaded.discard(key[0])
+
+    def _load_fingerprint(self, fingerprint: str):
+        if self._db is None or fingerprint in self._loaded:
+            return
+        cutoff = time.time() - self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+        rows = self._db.execute(
+            "SELECT question, answer, vector, created_at FROM answers"
+            " WHERE fingerprint = ? AND created_at >= ?",
+            (fingerprint, cutoff),
+        ).fetchall()
+        for question, answer, blob, created_at in rows:
+            key = (fingerprint, question)
+            if key not in self._entries:
+                vector = np.frombuffer(blob, dtype=np.float32) if blob else None
+                self._insert(key, CachedAnswer(answer, vector, created_at))
+        self._loaded.add(fingerprint)
+
+    def _touch_disk(self, key: Tuple[str, str]):
+        # Disk-tier LRU uses used_at
+        if self._db is not None:
+            self._db.execute(
+                "UPDATE answers SET used_at = ? WHERE fingerprint = ? AND question = ?",
+                (time.time(), *key),
+            )
+            self._db.commit()
+
+    def _prune_disk(self):
+        if self.ttl_seconds > 0:
+            self._db.execute("DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM answers WHERE rowid IN ("
+            " SELECT rowid FROM answers ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+
+
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+def get_answer_cache() -> AnswerCache:
+    """
+    Returns the process-wide answer cache.
+    """
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                db_path = None
+                if settings.ANSWER_CACHE_BACKEND == "sqlite":
+                    db_path = settings.ANSWER_CACHE_PATH or os.path.join(
+                        settings.VECTOR_DB_PATH, "answer_cache.sqlite3"
+                    )
+                _answer_cache = AnswerCache(db_path=db_path)
+    return _answer_cache
@@ -0,0 +1,336 @@
+# cache/document_cache.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import settings
+from db.chunk_metadata import ChunkMeta
+from embedder.embed import loaded_backend
+
+
+@dataclass
+class CachedDocument:
+    """
+    Everything a repeat document needs to skip parse/chunk/embed.
+
+    `chunks`/`vectors` are all of the document's chunks in order, whether or
+    not a store already held some of them (the store it is searched against
+    decides which are new; see rag_system._pending_chunks). `id_range` is
+    where they landed when one store took every chunk as new. `pages` holds
+    the 1-based first/last page of each chunk.
+    """
+    sha256: str
+    chunks: List[str]
+    vectors: np.ndarray                       # (len(chunks), dim) float32
+    id_range: Optional[Tuple[int, int]] = None
+    pages: Optional[List[Tuple[int, int]]] = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + sum(len(c) for c in self.chunks)
+
+    def metadata(self, indices: Optional[List[int]] = None) -> List[ChunkMeta]:
+        """
+        ChunkMeta of the given chunks (all by default) for the vector store.
+        """
+        indices = range(len(self.chunks)) if indices is None else indices
+        if self.pages is None:
+            return [ChunkMeta(self.sha256) for _ in indices]
+        return [ChunkMeta(self.sha256, *self.pages[i]) for i in indices]
+
+
+@dataclass
+class UrlEntry:
+    sha256: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    checked_at: float
+
+    def matches(self, headers: Dict[str, str]) -> bool:
+        """
+        True if HEAD response headers prove the content hasn't changed.
+        """
+        headers = {k.lower(): v for k, v in headers.items()}
+        if self.etag and headers.get("etag"):
+            return headers["etag"] == self.etag
+        if self.last_modified and headers.get("last-modified"):
+            return headers["last-modified"] == self.last_modified
+        return False
+
+
+# Bumped when what an entry holds changes (v2: every chunk, not only the new ones)
+_FORMAT_VERSION = 2
+
+def _config_fingerprint() -> str:
+    # Cached chunks/vectors are only valid for the chunker + model that made
+    # them, and the backend that ran it (ONNX / int8 vectors differ slightly)
+    return (
+        f"v{_FORMAT_VERSION}|{settings.EMBEDDING_MODEL_PATH}|{loaded_backend()}"
+        f"|{settings.CHUNK_SIZE}|{settings.CHUNK_OVERLAP}"
+    )
+
+
+class DocumentCache:
+    """
+    Two-level cache of ingested documents:
+
+    - URL → (content SHA-256, ETag, Last-Modified), so a repeat URL costs a HEAD
+      request, or nothing within `fresh_seconds` of the last check. Kept in
+      SQLite (`urls.sqlite3`; in memory without a cache_dir), at most
+      `max_urls` of them, least recently checked dropped first.
+    - SHA-256 → CachedDocument, an in-memory LRU bounded by entries and bytes,
+      backed by an on-disk tier (`<sha>.json` + `<sha>.npy`) that survives restarts.
+    """
+    def __init__(
+        self,
+        max_entries: int = settings.DOC_CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.DOC_CACHE_MAX_MB * 1024 * 1024,
+        cache_dir: Optional[str] = None,
+        max_disk_bytes: int = settings.DOC_CACHE_DISK_MAX_MB * 1024 * 1024,
+        fresh_seconds: float = settings.DOC_CACHE_FRESH_SECONDS,
+        max_urls: int = settings.DOC_CACHE_MAX_URLS,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.fresh_seconds = fresh_seconds
+        self.max_urls = max_urls
+        self._docs: "OrderedDict[str, CachedDocument]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self._open_urls()
+
+    # ─── URL tier ─────────────────────────────────────────────────────────────
+
+    def lookup_url(self, url: str) -> Optional[UrlEntry]:
+        with self._lock:
+            row = self._urls.execute(
+                "SELECT sha256, etag, last_modified, checked_at FROM urls WHERE url = ?", (url,)
+            ).fetchone()
+        return UrlEntry(*row) if row else None
+
+    def is_fresh(self, entry: UrlEntry) -> bool:
+        return time.time() - entry.checked_at < self.fresh_seconds
+
+    def record_url(self, url: str, sha256: str, headers: Dict[str, str]):
+        headers = {k.lower(): v for k, v in headers.items()}
+        self._write_urls(
+            "INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?)",
+            [(url, sha256, headers.get("etag"), headers.get("last-modified"), time.time())],
+            prune=True,
+        )
+
+    def touch_url(self, url: str):
+        self._write_urls("UPDATE urls SET checked_at = ? WHERE url = ?", [(time.time(), url)])
+
+    # ─── Content tier ─────────────────────────────────────────────────────────
+
+    def get(self, sha256: str) -> Optional[CachedDocument]:
+        with self._lock:
+            doc = self._docs.get(sha256)
+            if doc is not None:
+                self._docs.move_to_end(sha256)
+                self.counters["hits"] += 1
+                return doc
+        doc = self._read_disk(sha256)
+        with self._lock:
+            if doc is not None:
+                self._insert(doc)
+            self.counters["disk_hits" if doc is not None else "misses"] += 1
+        return doc
+
+    def put(self, doc: CachedDocument):
+        with self._lock:
+            self._insert(doc)
+        self._write_disk(doc)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = sum(self.counters.values())
+            return {
+                **self.counters,
+                "entries": len(self._docs),
+                "bytes": self._bytes,
+                "hit_rate": (self.counters["hits"] + self.counters["disk_hits"]) / lookups if lookups else 0.0,
+            }
+
+    def mark_persisted(self, sha256: str, id_range: Tuple[int, int]):
+        # Not a lookup: bypasses get() so the hit counters stay meaningful
+        with self._lock:
+            doc = self._docs.get(sha256)
+        if doc is None:
+            doc = self._read_disk(sha256)
+        if doc is None:
+            return
+        doc.id_range = id_range
+        self._write_disk(doc, vectors=False)
+
+    def _insert(self, doc: CachedDocument):
+        old = self._docs.pop(doc.sha256, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._docs[doc.sha256] = doc
+        self._bytes += doc.nbytes
+        # Evict least-recently-used entries (they remain on disk)
+        while self._docs and (len(self._docs) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._docs.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    # ─── Disk tier ────────────────────────────────────────────────────────────
+
+    def _paths(self, sha256: str) -> Tuple[str, str]:
+        return (
+            os.path.join(self.cache_dir, f"{sha256}.json"),
+            os.path.join(self.cache_dir, f"{sha256}.npy"),
+        )
+
+    def _read_disk(self, sha256: str) -> Optional[CachedDocument]:
+        if not self.cache_dir:
+            return None
+        meta_path, vec_path = self._paths(sha256)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("config") != _config_fingerprint():
+                return None
+            vectors = np.load(vec_path)
+            os.utime(meta_path)  # disk-tier LRU uses mtime
+        except (OSError, ValueError):
+            return None
+        id_range = tuple(meta["id_range"]) if meta.get("id_range") else None
+        pages = [tuple(p) for p in meta["pages"]] if meta.get("pages") else None
+        return CachedDocument(sha256, meta["chunks"], vectors, id_range, pages)
+
+    def _write_disk(self, doc: CachedDocument, vectors: bool = True):
+        if not self.cache_dir:
+            return
+        meta_path, vec_path = self._paths(doc.sha256)
+        try:
+            # Both files via temp + rename: a crash or a concurrent worker
+            # never leaves a half-written entry under the final names
+            if vectors:
+                tmp = vec_path + ".tmp"
+                with open(tmp, "wb") as f:
+                    np.save(f, doc.vectors)
+                os.replace(tmp, vec_path)
+            tmp = meta_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "config": _config_fingerprint(),
+                    "chunks": doc.chunks,
+                    "id_range": list(doc.id_range) if doc.id_range else None,
+                    "pages": doc.pages,
+                }, f)
+            os.replace(tmp, meta_path)
+            self._evict_disk()
+        except OSError as e:
+            print(f"⚠️ Failed to write document cache entry: {e}")
+
+    def _evict_disk(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json") or name == "urls.json":
+                continue
+            sha = name[:-5]
+            meta_path, vec_path = self._paths(sha)
+            try:
+                size = os.path.getsize(meta_path) + os.path.getsize(vec_path)
+                entries.append((os.path.getmtime(meta_path), sha, size))
+                total += size
+            except OSError:
+                continue
+        for _, sha, size in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            for path in self._paths(sha):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+
+    # ─── URL map (SQLite) ─────────────────────────────────────────────────────
+
+    def _open_urls(self):
+        db_path = os.path.join(self.cache_dir, "urls.sqlite3") if self.cache_dir else ":memory:"
+        self._urls = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        if self.cache_dir:
+            # Several uvicorn workers may share the file
+            self._urls.execute("PRAGMA journal_mode=WAL")
+        self._urls.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            " url TEXT PRIMARY KEY, sha256 TEXT NOT NULL, etag TEXT, last_modified TEXT,"
+            " checked_at REAL NOT NULL)"
+        )
+        self._urls.execute("CREATE INDEX IF NOT EXISTS urls_checked_at ON urls (checked_at)")
+        self._urls.commit()
+        self._url_rows = self._urls.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        if self.cache_dir and self._url_rows == 0:
+            self._import_url_json()
+
+    def _import_url_json(self):
+        # One-off import of the older urls.json map; the file itself is left alone
+        path = os.path.join(self.cache_dir, "urls.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            rows = [
+                (url, e["sha256"], e.get("etag"), e.get("last_modified"), float(e["checked_at"]))
+                for url, e in raw.items()
+            ]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            print(f"⚠️ Could not import {path}: {e}")
+            return
+        self._write_urls("INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?)", rows, prune=True)
+
+    def _write_urls(self, sql: str, rows: List[tuple], prune: bool = False):
+        with self._lock:
+            try:
+                changed = self._urls.executemany(sql, rows).rowcount
+                if prune:
+                    self._url_rows += changed   # over-counts replaced rows; corrected by _prune_urls
+                    self._prune_urls()
+                self._urls.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ Failed to write document cache URL map: {e}")
+
+    def _prune_urls(self):
+        # Caller holds the lock. Drops the least recently checked URLs
+        if self.max_urls <= 0 or self._url_rows <= self.max_urls:
+            return
+        self._urls.execute(
+            "DELETE FROM urls WHERE url IN ("
+            " SELECT url FROM urls ORDER BY checked_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_urls,),
+        )
+        self._url_rows = self._urls.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+
+_document_cache: Optional[DocumentCache] = None
+_document_cache_lock = threading.Lock()
+
+def get_document_cache() -> DocumentCache:
+    """
+    Returns the process-wide document cache.
+    """
+    global _document_cache
+    if _document_cache is None:
+        with _document_cache_lock:
+            if _document_cache is None:
+                cache_dir = settings.DOC_CACHE_DIR or os.path.join(settings.VECTOR_DB_PATH, "doc_cache")
+                _document_cache = DocumentCache(cache_dir=cache_dir)
+    return _document_cache
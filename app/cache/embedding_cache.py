@@ -0,0 +1,167 @@
+# cache/embedding_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from config import settings
+
+_SQL_BATCH = 500   # keys per IN (...) lookup; stays under SQLite's parameter limit
+
+
+def text_key(text: str) -> bytes:
+    """
+    Content address of a chunk: SHA-256 of its UTF-8 bytes.
+    """
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+def model_fingerprint(model_path: str = settings.EMBEDDING_MODEL_PATH) -> str:
+    """
+    Identifies the embedding model: its path plus, for a local model
+    directory, the names, sizes and mtimes of its files, so retraining the
+    model in place invalidates the cache as well as pointing at another one.
+    The onnx/ export (embedder/onnx_backend.py) is derived, not part of it.
+    """
+    h = hashlib.sha256(model_path.encode("utf-8"))
+    if os.path.isdir(model_path):
+        for root, dirs, names in os.walk(model_path):
+            if root == model_path and "onnx" in dirs:
+                dirs.remove("onnx")
+            dirs.sort()
+            for name in sorted(names):
+                st = os.stat(os.path.join(root, name))
+                rel = os.path.relpath(os.path.join(root, name), model_path)
+                h.update(f"|{rel}:{st.st_size}:{st.st_mtime_ns}".encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+class EmbeddingCache:
+    """
+    (model ID, chunk hash) → float32 embedding, in SQLite.
+
+    `model_id` is "<model path>|<backend>|<fingerprint>". Opening the cache
+    purges rows of the same model path and backend with another fingerprint
+    (the model files changed), and leaves other models' and backends' rows
+    alone: workers on different backends can share the file. Bounded to
+    `max_entries` rows, oldest inserts dropped first.
+    """
+    def __init__(
+        self,
+        db_path: str,
+        model_id: str,
+        max_entries: int = settings.EMBED_CACHE_MAX_ENTRIES,
+    ):
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "writes": 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        # Several uvicorn workers may share the file
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, key BLOB NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, key))"
+        )
+        stale = model_id.rsplit("|", 1)[0] + "|"
+        purged = self._db.execute(
+            "DELETE FROM embeddings WHERE substr(model, 1, ?) = ? AND model != ?",
+            (len(stale), stale, model_id),
+        ).rowcount
+        self._db.commit()
+        self._rows = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if purged > 0:
+            print(f"🧹 Embedding model changed; dropped {purged} cached embeddings.")
+
+    def get_many(self, texts: List[str]) -> Dict[int, np.ndarray]:
+        """
+        Positions of `texts` that are cached → their (dim,) float32 vectors.
+        """
+        keys = [text_key(t) for t in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                    (self.model_id, *batch),
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            hits = {i: found[k] for i, k in enumerate(keys) if k in found}
+            self.counters["hits"] += len(hits)
+            self.counters["misses"] += len(keys) - len(hits)
+        return hits
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        rows = [(self.model_id, text_key(t), v.tobytes()) for t, v in zip(texts, vectors)]
+        with self._lock:
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+                self._rows += len(rows)   # over-counts replaced rows; corrected by _prune
+                self._prune()
+                self._db.commit()
+                self.counters["writes"] += len(rows)
+            except sqlite3.Error as e:
+                print(f"⚠️ Failed to write embedding cache entries: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM embeddings")
+            self._db.commit()
+            self._rows = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": self._rows,
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            }
+
+    def _prune(self):
+        # Caller holds the lock. Newest rows have the highest rowids
+        if self.max_entries <= 0 or self._rows <= self.max_entries:
+            return
+        self._db.execute(
+            "DELETE FROM embeddings WHERE rowid IN ("
+            " SELECT rowid FROM embeddings ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self._rows = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_backend: Optional[str] = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache(backend: Optional[str] = None) -> Optional[EmbeddingCache]:
+    """
+    Returns the process-wide embedding cache, or None when EMBED_CACHE_ENABLED is off.
+
+    `backend` is the one actually serving embeddings (embed.loaded_backend(),
+    not the configured one: an ONNX load can fall back to torch). ONNX / int8
+    vectors are close to, not equal to, the torch ones, so it is part of the
+    cache's model ID; the cache is opened by the first call that names it and
+    reopened if it changes. Without one, returns the cache if already open.
+    """
+    global _embedding_cache, _embedding_cache_backend
+    if not settings.EMBED_CACHE_ENABLED:
+        return None
+    if backend is None or backend == _embedding_cache_backend:
+        return _embedding_cache
+    with _embedding_cache_lock:
+        if backend != _embedding_cache_backend:
+            db_path = settings.EMBED_CACHE_PATH or os.path.join(
+                settings.VECTOR_DB_PATH, "embedding_cache.sqlite3"
+            )
+            model_path = settings.EMBEDDING_MODEL_PATH
+            _embedding_cache = EmbeddingCache(db_path, f"{model_path}|{backend}|{model_fingerprint(model_path)}")
+            _embedding_cache_backend = backend
+    return _embedding_cache
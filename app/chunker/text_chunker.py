@@ -1,14 +1,30 @@
 
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import re
+import threading
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Tuple
 from config import settings
 
-# Initialize a reusable splitter
-splitter = RecursiveCharacterTextSplitter(
-    chunk_size=settings.CHUNK_SIZE,  ##chunk size 512 tokens
-    chunk_overlap=settings.CHUNK_OVERLAP, #
-    separators=["\n\n", "\n", " ", "","\n___+\n","\n---+\n","\n\\*\\*\\*+\n","```\n", "\n#{1,6}"]
-)
+_SEPARATORS = ["\n\n", "\n", " ", "","\n___+\n","\n---+\n","\n\\*\\*\\*+\n","```\n", "\n#{1,6}"]
+
+# Reusable splitter, built on first use: importing langchain costs most of a
+# second, which /health, CLIs and test collection shouldn't pay
+_splitter = None
+_splitter_lock = threading.Lock()
+
+def get_splitter():
+    global _splitter
+    if _splitter is None:
+        with _splitter_lock:
+            if _splitter is None:
+                from langchain.text_splitter import RecursiveCharacterTextSplitter
+                _splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=settings.CHUNK_SIZE,  ##chunk size 512 tokens
+                    chunk_overlap=settings.CHUNK_OVERLAP, #
+                    separators=_SEPARATORS
+                )
+    return _splitter
 
 def chunk_text(text: str) -> list[str]:
     """
@@ -19,7 +35,123 @@ def chunk_text(text: str) -> list[str]:
     """
     if not text:
         return []
-    return splitter.split_text(text)
+    return get_splitter().split_text(text)
+
+# ─── Streaming ───────────────────────────────────────────────────────────────
+# iter_chunks replays what splitter.split_text does at the top level (split at
+# "\n\n", keeping the separator at the start of each piece, and greedily merge
+# pieces into chunks with overlap), one piece at a time, so it yields exactly
+# the chunks chunk_text would, without waiting for the whole document.
+#
+# It leans on private TextSplitter internals (_merge_splits' logic, _join_docs,
+# _split_text, _chunk_size/_chunk_overlap/_separators) as of
+# langchain-text-splitters==0.3.9, the version pinned in requirements.txt.
+# test_chunker_equivalence.py checks the output against split_text; run it
+# before moving that pin.
+
+_TOP_SEPARATOR = _SEPARATORS[0]
+_TOP_PATTERN = re.compile(re.escape(_TOP_SEPARATOR))
+
+class _StreamingMerge:
+    """
+    TextSplitter._merge_splits fed one split at a time (separator "", since
+    the splitter keeps separators on the splits).
+    """
+    def __init__(self):
+        self.current: List[str] = []
+        self.total = 0
+
+    def add(self, split: str) -> List[str]:
+        splitter = get_splitter()
+        done = []
+        size = len(split)
+        if self.total + size > splitter._chunk_size:
+            if self.current:
+                doc = splitter._join_docs(self.current, "")
+                if doc is not None:
+                    done.append(doc)
+                while self.total > splitter._chunk_overlap or (
+                    self.total + size > splitter._chunk_size and self.total > 0
+                ):
+                    self.total -= len(self.current[0])
+                    self.current = self.current[1:]
+        self.current.append(split)
+        self.total += size
+        return done
+
+    def flush(self) -> List[str]:
+        doc = get_splitter()._join_docs(self.current, "") if self.current else None
+        self.current, self.total = [], 0
+        return [doc] if doc is not None else []
+
+def _chunk_split(split: str, merge: _StreamingMerge) -> List[str]:
+    splitter = get_splitter()
+    if len(split) < splitter._chunk_size:
+        return merge.add(split)
+    # Oversized piece: close the running chunk, split it with the finer separators
+    return merge.flush() + splitter._split_text(split, splitter._separators[1:])
+
+def iter_chunks(pages: Iterable[str]) -> Iterator[List[str]]:
+    """
+    Streaming `chunk_text` over a document's pages: yields each batch of
+    chunks as soon as later text can no longer change it. The concatenated
+    batches equal chunk_text("".join(pages)).
+    """
+    merge = _StreamingMerge()
+    pending = ""
+    for page in pages:
+        pending += page
+        # The top-level separator is "\n\n" only once the text contains one
+        starts = [m.start() for m in _TOP_PATTERN.finditer(pending)]
+        if not starts:
+            continue
+        # Every piece but the one starting at the last separator is complete
+        bounds = ([0] if starts[0] else []) + starts
+        done: List[str] = []
+        for start, end in zip(bounds, bounds[1:]):
+            done.extend(_chunk_split(pending[start:end], merge))
+        pending = pending[starts[-1]:]
+        if done:
+            yield done
+
+    if not pending.startswith(_TOP_SEPARATOR):
+        # No separator anywhere: nothing was streamed, chunk it in one go
+        rest = chunk_text(pending)
+    else:
+        rest = (_chunk_split(pending, merge) if pending else []) + merge.flush()
+    if rest:
+        yield rest
+
+def iter_chunks_with_pages(pages: Iterable[str]) -> Iterator[List[Tuple[str, int, int]]]:
+    """
+    `iter_chunks`, with the 1-based first and last page of every chunk.
+    Chunks are verbatim (whitespace-trimmed) slices of the page text that
+    start in order, so each one is found just from the previous chunk's
+    start; one that can't be found gets the previous chunk's position.
+    """
+    page_ends: List[int] = []   # cumulative end offset of every page read so far
+    text = ""                   # page text from `offset` on
+    offset = 0
+
+    def read(pages):
+        nonlocal text
+        for page in pages:
+            page_ends.append((page_ends[-1] if page_ends else 0) + len(page))
+            text += page
+            yield page
+
+    def page_of(pos: int) -> int:
+        return min(bisect_right(page_ends, pos), len(page_ends) - 1) + 1
+
+    for batch in iter_chunks(read(pages)):
+        located = []
+        for chunk in batch:
+            pos = text.find(chunk, 0)
+            start = offset + (pos if pos >= 0 else 0)
+            located.append((chunk, page_of(start), page_of(start + max(len(chunk), 1) - 1)))
+            # Later chunks start at or after this one: drop the text before it
+            text, offset = text[start - offset:], start
+        yield located
 
 # chunker/text_chunker.py
 
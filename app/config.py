@@ -17,6 +17,13 @@ class Settings(BaseSettings):
     # ──────────────────────────────
     GEMINI_API_BASE_URL: str = "https://generativelanguage.googleapis.com/v1beta/models/"
     GEMINI_QNA_MODEL: str = "gemini-1.5-flash"
+    GEMINI_TIMEOUT: float = 120.0         # per-request timeout in seconds
+    GEMINI_HTTP2: bool = True             # HTTP/2 via `h2` (in requirements.txt); HTTP/1.1 if it is missing
+    GEMINI_MAX_CONNECTIONS: int = 10      # connection pool size of the shared client
+    GEMINI_KEEPALIVE_EXPIRY: float = 30.0 # seconds an idle pooled connection is kept
+    GEMINI_MAX_CONCURRENCY: int = 8       # in-flight Gemini calls across all requests
+    GEMINI_REQUESTS_PER_MINUTE: int = 0   # token-bucket rate limit (0 → unlimited)
+    GEMINI_MAX_RETRY_AFTER: float = 60.0  # cap on a server-sent Retry-After, in seconds
 
     # ──────────────────────────────
     # Chunking (character‐based)
@@ -30,20 +37,121 @@ class Settings(BaseSettings):
     # Path to your locally-downloaded HuggingFace model directory
     EMBEDDING_MODEL_PATH: str = r"C:\Projects\SM _ insurance\baseline\rag_insurance\insurance_bert_embed"
 
+    # Inference backend: "torch" (SentenceTransformer, on CUDA when available) or
+    # "onnx" (ONNX Runtime, always on CPU, without importing torch once exported;
+    # exported to <EMBEDDING_MODEL_PATH>/onnx/ on first use; needs onnxruntime + onnx)
+    EMBEDDING_BACKEND: str = "torch"
+    EMBEDDING_ONNX_QUANTIZE: bool = False # dynamic int8 weights (smaller, faster; slightly less exact)
+    EMBEDDING_ONNX_THREADS: int = 0       # ONNX Runtime intra-op threads (0 → one per physical core)
+    EMBEDDING_ONNX_MIN_COSINE: float = 0.99  # an export must match torch at least this closely to be used
+
+    EMBED_CACHE_ENABLED: bool = True      # reuse embeddings of chunk texts seen before (SQLite, keyed by text hash + model)
+    EMBED_CACHE_PATH: str = ""            # empty → <VECTOR_DB_PATH>/embedding_cache.sqlite3
+    EMBED_CACHE_MAX_ENTRIES: int = 2_000_000  # oldest rows dropped past this (0 → unbounded)
+
     # ──────────────────────────────
     # Vector Store
     # ──────────────────────────────
     VECTOR_DB_PATH: str = r"C:\Projects\SM _ insurance\baseline\rag_insurance\vector_store"
 
+    VECTOR_STORE_MMAP: bool = True        # mmap index + chunk texts (shared across workers, O(1) open)
+    WAL_COMPACT_BYTES: int = 64 * 1024 * 1024  # merge the write-ahead log into a new base segment past this size
+    WAL_FSYNC: bool = True                # fsync every WAL append (durable across power loss)
+
+    # Index type for the persistent store: flat | ivf_flat | ivf_pq | hnsw
+    # (see benchmarks/bench_ann_recall.py for recall vs latency on your data)
+    VECTOR_INDEX_TYPE: str = "flat"
+    INDEX_TRAIN_MIN_VECTORS: int = 10000  # IVF types stay flat until this many vectors exist
+    IVF_NLIST: int = 0                    # coarse clusters; 0 → ~4·sqrt(n) at training time
+    IVF_NPROBE: int = 16                  # clusters visited per query (recall ↑, speed ↓)
+    PQ_M: int = 64                        # PQ sub-quantizers (must divide the embedding dim)
+    PQ_NBITS: int = 8                     # bits per PQ code
+    HNSW_M: int = 32                      # graph neighbours per node
+    HNSW_EF_CONSTRUCTION: int = 200       # build-time search depth
+    HNSW_EF_SEARCH: int = 64              # query-time search depth (recall ↑, speed ↓)
+
+    # ──────────────────────────────
+    # Partitions (multi-tenant)
+    # ──────────────────────────────
+    PARTITIONED_STORE: bool = False       # one persistent store per tenant under <VECTOR_DB_PATH>/partitions
+    DEFAULT_TENANT: str = "default"       # partition for requests that name no tenant
+    PARTITION_MEMORY_MB: int = 2048       # resident partitions above this are unloaded, least recently used first
+    PARTITION_TENANTS: str = ""           # comma-separated tenants that may get a partition besides those in ROUTING.json ("*" → any)
+    PARTITION_MAX_COUNT: int = 256        # partitions at most; new tenants are refused beyond it (0 → unbounded)
+
+    # ──────────────────────────────
+    # Document Cache
+    # ──────────────────────────────
+    DOC_CACHE_MAX_ENTRIES: int = 64       # documents kept in memory (LRU)
+    DOC_CACHE_MAX_MB: int = 512           # in-memory size bound (vectors + chunk text)
+    DOC_CACHE_DIR: str = ""               # on-disk tier; empty → <VECTOR_DB_PATH>/doc_cache
+    DOC_CACHE_DISK_MAX_MB: int = 4096     # on-disk size bound
+    DOC_CACHE_FRESH_SECONDS: int = 300    # within this window a repeat URL skips even the HEAD request
+    DOC_CACHE_MAX_URLS: int = 100000      # URL → content hash entries kept (least recently checked dropped; 0 → unbounded)
+
+    # ──────────────────────────────
+    # Answer Cache
+    # ──────────────────────────────
+    ANSWER_CACHE_ENABLED: bool = True     # reuse answers to repeated (document, question) pairs
+    ANSWER_CACHE_MAX_ENTRIES: int = 10000 # in-memory LRU bound
+    ANSWER_CACHE_TTL_SECONDS: int = 86400 # answers expire after this long (0 → never)
+    ANSWER_CACHE_SIMILARITY: float = 0.95 # cosine threshold for near-duplicate questions (0 → exact only)
+    ANSWER_CACHE_BACKEND: str = "memory"  # "memory" or "sqlite" (survives restarts)
+    ANSWER_CACHE_PATH: str = ""           # SQLite file; empty → <VECTOR_DB_PATH>/answer_cache.sqlite3
+    ANSWER_CACHE_DISK_MAX_ENTRIES: int = 100000
+
     # ──────────────────────────────
     # RAG / Retrieval
     # ──────────────────────────────
-    TOP_K_CHUNKS: int = 5                 # number of chunks to retrieve per query
+    TOP_K_CHUNKS: int = 5                 # max chunks of context per question
+    CONTEXT_CANDIDATES: int = 8           # chunks fetched per store and question before filtering
+    CONTEXT_TOKEN_BUDGET: int = 2600      # context tokens per question (≈ 5 chunks of CHUNK_SIZE 1800)
+    CONTEXT_MAX_DISTANCE: float = 0.0     # drop chunks farther than this (squared L2; 0 → off; BM25-only hits kept)
+    CONTEXT_MIN_SCORE_RATIO: float = 0.0  # drop chunks scoring below this fraction of the question's best (0 → off)
+    HYBRID_SEARCH: bool = True            # fuse BM25 keyword matches with dense search (reciprocal rank fusion)
+    HYBRID_CANDIDATES: int = 50           # IDs taken from each ranking before fusion
+    HYBRID_DENSE_WEIGHT: float = 1.0      # fusion weight of the dense ranking
+    HYBRID_LEXICAL_WEIGHT: float = 1.0    # fusion weight of the BM25 ranking
+    RRF_K: int = 60                       # rank damping: score = Σ weight / (RRF_K + rank)
+    BM25_K1: float = 1.2                  # term-frequency saturation
+    BM25_B: float = 0.75                  # chunk-length normalization
+
+    # ──────────────────────────────
+    # Startup
+    # ──────────────────────────────
+    WARMUP_ON_STARTUP: bool = True        # load model / FAISS / parsers from the lifespan (else on first request)
+    WARMUP_BLOCKING: bool = False         # finish warm-up before accepting traffic (else in the background; see /ready)
+
+    # ──────────────────────────────
+    # Observability
+    # ──────────────────────────────
+    METRICS_ENABLED: bool = True          # GET /metrics in the Prometheus text format (per worker process)
+    SERVER_TIMING_HEADER: bool = False    # per-request stage breakdown in a Server-Timing response header
+
+    # ──────────────────────────────
+    # Request Pipeline Concurrency
+    # ──────────────────────────────
+    BLOCKING_POOL_WORKERS: int = 4        # threads for embedding / FAISS / cache IO
+    PARSE_POOL_WORKERS: int = 2           # processes for document parsing (0 → use the thread pool)
+    PARSE_PAGE_WINDOW: int = 8            # PDF pages per parse task (parsed one window ahead of embedding)
+    MAX_DOCUMENT_MB: int = 100            # downloads larger than this are rejected (0 → no limit)
+    EMBED_STREAM_BATCH: int = 64          # chunks embedded per batch while a document is still parsing
+
+    # ──────────────────────────────
+    # Bulk Indexing (index_documents.py)
+    # ──────────────────────────────
+    INDEX_DOCS_DIR: str = r"C:\Projects\SM _ insurance\baseline\rag_insurance\Domain Documents"
+    INDEX_PARSE_WORKERS: int = 4          # processes parsing + chunking files concurrently
+    INDEX_EMBED_BATCH: int = 256          # chunks per encode call in the embedding stage
+    INDEX_MANIFEST_PATH: str = ""         # per-file hashes for resumable runs; empty → <VECTOR_DB_PATH>/indexed_files.json
 
     # ──────────────────────────────
     # LLM / Prompting
     # ──────────────────────────────
-    MAX_LLM_INPUT_TOKENS: int = 30000     # prompt size warning threshold
+    MAX_LLM_INPUT_TOKENS: int = 30000     # prompt size budget (packed prompts stay under it)
+    LLM_BATCH_QUESTIONS: bool = True      # pack several questions into one Gemini call
+    LLM_BATCH_MAX_QUESTIONS: int = 10     # questions per packed prompt
+    STREAM_PING_SECONDS: float = 15.0     # keep-alive comment on an idle answer stream (0 → off)
 
     # ──────────────────────────────
     # Database Update & Retry
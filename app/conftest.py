@@ -0,0 +1,47 @@
+# conftest.py
+#
+# pytest setup for the unit tests in app/ (run from app/: `python -m pytest`).
+# The older test_*.py scripts below call live services at import time, so they
+# stay manual (`python test_rag.py`) and are not collected.
+#
+# Settings are read once on first import, so the environment is filled in
+# here before any test module imports config: dummy secrets, and a throwaway
+# VECTOR_DB_PATH with persisting and the SQLite caches off, so nothing touches
+# the real store and every test computes its results afresh.
+
+import os
+import shutil
+import tempfile
+
+collect_ignore = ["test_api.py", "test_chunker.py", "test_embedder.py", "test_parser.py", "test_rag.py"]
+
+_workdir = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ.setdefault("AUTH_TOKEN", "test-token")
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("EMBEDDING_MODEL_PATH", os.path.join(_workdir, "model"))
+os.environ["VECTOR_DB_PATH"] = os.path.join(_workdir, "vector_store")
+os.environ["ALLOW_DB_UPDATE"] = "false"
+os.environ["EMBED_CACHE_ENABLED"] = "false"
+os.environ["ANSWER_CACHE_ENABLED"] = "false"
+
+import pytest
+
+
+@pytest.fixture
+def hashing_model():
+    """
+    Installs the benchmark's deterministic HashingEncoder as the embedding
+    model for one test, then restores whatever was loaded before.
+    """
+    from benchmarks.bench_pipeline import HashingEncoder
+    from embedder import embed
+
+    previous, previous_backend = embed._model, embed._backend
+    model = HashingEncoder(dim=64)
+    embed.use_model(model)
+    yield model
+    embed.use_model(previous, previous_backend)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_workdir, ignore_errors=True)
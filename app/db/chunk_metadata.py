@@ -0,0 +1,126 @@
+# db/chunk_metadata.py
+
+import json
+import os
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+
+DOCS_FILE = "meta.docs.json"            # source document IDs, in first-seen order
+COLUMNS = ("doc", "page_start", "page_end")  # int32 columns saved as meta.<column>.npy, -1 = unknown
+
+
+class ChunkMeta(NamedTuple):
+    """
+    Where a chunk came from: the source document's ID (its content SHA-256)
+    and the 1-based pages it spans.
+    """
+    doc_id: Optional[str] = None
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+
+
+class ChunkMetadataTable:
+    """
+    Per-chunk metadata aligned with vector IDs, stored column-wise: one int32
+    array per field (document IDs interned to small integers), so a store of
+    millions of chunks costs 12 bytes per chunk instead of a Python object
+    each. Chunks stored without metadata (older stores) read as unknown.
+    """
+    def __init__(self, n_unknown: int = 0):
+        self._docs: List[str] = []
+        self._doc_index: Dict[str, int] = {}
+        self._columns = np.full((len(COLUMNS), max(n_unknown, 1024)), -1, dtype=np.int32)
+        self._n = n_unknown
+
+    @classmethod
+    def open(cls, directory: str) -> Optional["ChunkMetadataTable"]:
+        """
+        Loads the table saved in `directory`, or returns None if it has none.
+        """
+        paths = [os.path.join(directory, f"meta.{name}.npy") for name in COLUMNS]
+        docs_path = os.path.join(directory, DOCS_FILE)
+        if not all(os.path.exists(p) for p in paths + [docs_path]):
+            return None
+        columns = [np.load(p) for p in paths]
+        if len({len(c) for c in columns}) != 1:
+            raise ValueError(f"Chunk metadata in {directory} is inconsistent")
+        table = cls(len(columns[0]))
+        for row, values in enumerate(columns):
+            table._columns[row, :len(values)] = values
+        with open(docs_path, "r", encoding="utf-8") as f:
+            table._docs = json.load(f)
+        table._doc_index = {doc_id: i for i, doc_id in enumerate(table._docs)}
+        return table
+
+    def __len__(self) -> int:
+        return self._n
+
+    def extend(self, metadata: Optional[Sequence[ChunkMeta]], n: int):
+        """
+        Appends the metadata of `n` chunks (`metadata` None → all unknown).
+        """
+        if self._n + n > self._columns.shape[1]:
+            grown = np.full((len(COLUMNS), max(self._n + n, 2 * self._columns.shape[1])), -1, dtype=np.int32)
+            grown[:, :self._n] = self._columns[:, :self._n]
+            self._columns = grown
+        if metadata is None:
+            self._columns[:, self._n:self._n + n] = -1
+        else:
+            rows = np.array(
+                [[self._intern(m.doc_id), _or_unknown(m.page_start), _or_unknown(m.page_end)] for m in metadata],
+                dtype=np.int32
+            ).reshape(-1, len(COLUMNS))
+            self._columns[:, self._n:self._n + n] = rows.T
+        self._n += n
+
+    def _intern(self, doc_id: Optional[str]) -> int:
+        if doc_id is None:
+            return -1
+        index = self._doc_index.get(doc_id)
+        if index is None:
+            index = self._doc_index[doc_id] = len(self._docs)
+            self._docs.append(doc_id)
+        return index
+
+    def get(self, ids: Sequence[int]) -> List[ChunkMeta]:
+        """
+        Metadata of the given chunk IDs (one vectorized gather per column).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        known = (ids >= 0) & (ids < self._n)
+        values = np.full((len(COLUMNS), len(ids)), -1, dtype=np.int32)
+        values[:, known] = self._columns[:, ids[known]]
+        return [
+            ChunkMeta(
+                self._docs[doc] if doc >= 0 else None,
+                int(start) if start >= 0 else None,
+                int(end) if end >= 0 else None,
+            )
+            for doc, start, end in values.T.tolist()
+        ]
+
+    def rows(self, start: int, end: int) -> List[ChunkMeta]:
+        return self.get(range(start, end))
+
+    def copy(self) -> "ChunkMetadataTable":
+        table = ChunkMetadataTable()
+        table._docs = list(self._docs)
+        table._doc_index = dict(self._doc_index)
+        table._columns = self._columns[:, :self._n].copy()
+        table._n = self._n
+        return table
+
+    def save(self, directory: str, count: Optional[int] = None):
+        """
+        Writes the first `count` rows (all by default) into `directory`.
+        """
+        count = self._n if count is None else count
+        for row, name in enumerate(COLUMNS):
+            with open(os.path.join(directory, f"meta.{name}.npy"), "wb") as f:
+                np.save(f, self._columns[row, :count])
+        with open(os.path.join(directory, DOCS_FILE), "w", encoding="utf-8") as f:
+            json.dump(self._docs, f)
+
+
+def _or_unknown(value: Optional[int]) -> int:
+    return -1 if value is None else int(value)
@@ -0,0 +1,115 @@
+# db/chunk_store.py
+
+import mmap
+import os
+from typing import Iterable, Iterator, List, Optional, Sequence, Union
+import numpy as np
+
+TEXTS_FILE = "texts.bin"     # UTF-8 chunk texts, concatenated
+OFFSETS_FILE = "texts.idx"   # uint64 offsets into texts.bin, len = n + 1
+
+
+class ChunkTextStore(Sequence):
+    """
+    Chunk texts stored as one UTF-8 blob plus an offsets array, both
+    memory-mapped read-only. Opening is O(1) regardless of corpus size and
+    every worker process shares the same page cache instead of holding its
+    own unpickled list. Texts added since the segment was written live in a
+    plain list (`_tail`) until the next compaction writes a new segment.
+    """
+    def __init__(self, texts: Optional[Iterable[str]] = None):
+        self._blob: Optional[mmap.mmap] = None
+        self._offsets = np.zeros(1, dtype=np.uint64)
+        self._base_len = 0
+        self._tail: List[str] = list(texts or [])
+        self._tail_bytes = sum(len(t) for t in self._tail)
+
+    @classmethod
+    def open(cls, directory: str) -> Optional["ChunkTextStore"]:
+        """
+        Maps texts.bin/texts.idx from `directory`, or returns None if absent.
+        """
+        blob_path = os.path.join(directory, TEXTS_FILE)
+        offsets_path = os.path.join(directory, OFFSETS_FILE)
+        if not (os.path.exists(blob_path) and os.path.exists(offsets_path)):
+            return None
+        store = cls()
+        store._map(blob_path, offsets_path)
+        return store
+
+    def _map(self, blob_path: str, offsets_path: str):
+        offsets = np.memmap(offsets_path, dtype=np.uint64, mode="r") \
+            if os.path.getsize(offsets_path) else np.zeros(1, dtype=np.uint64)
+        size = os.path.getsize(blob_path)
+        # texts.bin is written before texts.idx, so a crash in between leaves
+        # offsets that still describe a valid prefix of the blob
+        if int(offsets[-1]) > size:
+            raise ValueError(f"{offsets_path} points past the end of {blob_path}")
+        blob = None
+        if size:
+            with open(blob_path, "rb") as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._blob = blob
+        self._offsets = offsets
+        self._base_len = len(offsets) - 1
+
+    def __len__(self) -> int:
+        return self._base_len + len(self._tail)
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("chunk index out of range")
+        if i < self._base_len:
+            start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+            return self._blob[start:end].decode("utf-8")
+        return self._tail[i - self._base_len]
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def extend(self, texts: Iterable[str]):
+        texts = list(texts)
+        self._tail.extend(texts)
+        self._tail_bytes += sum(len(t) for t in texts)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate size of the texts: the mapped blob and offsets plus the
+        characters held in the tail.
+        """
+        return int(self._offsets[-1]) + self._offsets.nbytes + self._tail_bytes
+
+    def save(self, directory: str, count: Optional[int] = None):
+        """
+        Writes the first `count` texts (all by default) as texts.bin/texts.idx
+        into `directory`. Files are written aside and os.replace'd, blob first,
+        so processes mapping the old files keep a consistent view.
+        """
+        count = len(self) if count is None else count
+        blob_path = os.path.join(directory, TEXTS_FILE)
+        offsets_path = os.path.join(directory, OFFSETS_FILE)
+
+        base_count = min(count, self._base_len)
+        encoded = [t.encode("utf-8") for t in self._tail[:count - base_count]]
+        base_bytes = int(self._offsets[base_count])
+        tail_offsets = base_bytes + np.cumsum([len(b) for b in encoded], dtype=np.uint64)
+        offsets = np.concatenate([np.asarray(self._offsets[:base_count + 1], dtype=np.uint64), tail_offsets])
+
+        with open(blob_path + ".tmp", "wb") as f:
+            if self._blob is not None:
+                f.write(self._blob[:base_bytes])
+            f.writelines(encoded)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(blob_path + ".tmp", blob_path)
+        with open(offsets_path + ".tmp", "wb") as f:
+            f.write(offsets.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(offsets_path + ".tmp", offsets_path)
@@ -0,0 +1,111 @@
+# db/index_factory.py
+
+import math
+from typing import Optional
+import numpy as np
+from config import settings
+from lazy_import import lazy_module
+
+# Imported on first use (opening / building an index), not at import
+faiss = lazy_module("faiss")
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+
+def needs_training(index_type: str) -> bool:
+    return index_type in ("ivf_flat", "ivf_pq")
+
+def index_type_of(index: "faiss.Index") -> str:
+    """
+    Maps a (possibly loaded-from-disk) FAISS index back to its INDEX_TYPES name.
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    return "flat"
+
+def auto_nlist(n: int) -> int:
+    """
+    ~4·√n coarse clusters, capped so each gets the ~39 training points FAISS wants.
+    """
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+def _pq_m(dim: int, m: int) -> int:
+    # PQ sub-quantizers must divide the dimension; fall back to the nearest divisor below
+    while dim % m:
+        m -= 1
+    return m
+
+def create_index(
+    index_type: str,
+    dim: int,
+    train_vectors: Optional[np.ndarray] = None,
+    nlist: int = settings.IVF_NLIST,
+    pq_m: int = settings.PQ_M,
+    pq_nbits: int = settings.PQ_NBITS,
+    hnsw_m: int = settings.HNSW_M,
+    ef_construction: int = settings.HNSW_EF_CONSTRUCTION,
+) -> "faiss.Index":
+    """
+    Builds an empty index of the given type. IVF types are trained on
+    `train_vectors` (required for them); the caller still has to add vectors.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type!r} (expected one of {INDEX_TYPES})")
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        if train_vectors is None or not len(train_vectors):
+            raise ValueError(f"{index_type} index needs training vectors")
+        nlist = nlist or auto_nlist(len(train_vectors))
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_m(dim, pq_m), pq_nbits)
+        index.train(np.ascontiguousarray(train_vectors, dtype=np.float32))
+
+    apply_search_params(index)
+    return index
+
+def apply_search_params(
+    index: "faiss.Index",
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+):
+    """
+    Sets query-time recall/speed knobs (no-op for flat indexes).
+    """
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(nprobe or settings.IVF_NPROBE, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search or settings.HNSW_EF_SEARCH
+
+def reconstruct_all(index: "faiss.Index") -> np.ndarray:
+    """
+    Returns every stored vector as an (ntotal, d) float32 array
+    (approximate for PQ, whose codes are lossy).
+    """
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    if not index.ntotal:
+        return np.empty((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
+
+def index_bytes(index: "faiss.Index") -> int:
+    """
+    Approximate memory held by the index's vector codes (graph links and
+    IVF lists add a little on top).
+    """
+    try:
+        code_size = index.sa_code_size()
+    except RuntimeError:  # not implemented for this index type
+        code_size = 4 * index.d
+    return int(index.ntotal) * int(code_size)
@@ -0,0 +1,263 @@
+# db/lexical_index.py
+#
+# BM25 inverted index over the stored chunks, used next to the FAISS index
+# for hybrid (keyword + dense) retrieval. Document IDs are the vector IDs, so
+# the two rankings can be fused directly with reciprocal_rank_fusion().
+
+import json
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from config import settings
+
+TERMS_FILE = "lexical.terms.json"      # vocabulary, in row order
+INDPTR_FILE = "lexical.indptr.npy"     # int64 row offsets into ids/tfs, len = n_terms + 1
+IDS_FILE = "lexical.ids.npy"           # uint32 document IDs, ascending within a row
+TFS_FILE = "lexical.tfs.npy"           # uint16 term frequencies
+LENGTHS_FILE = "lexical.lengths.npy"   # uint32 tokens per document
+LEXICAL_FILES = (TERMS_FILE, INDPTR_FILE, IDS_FILE, TFS_FILE, LENGTHS_FILE)
+
+# Clause numbers ("3.1.4"), hyphenated and slashed terms stay whole
+_TOKEN_RE = re.compile(r"\w+(?:[.\-/]\w+)*")
+_STOPWORDS = frozenset("""
+a an and are as at be been being but by can could did do does for from had has have how i if in
+into is it its may me must my no not of on or our shall should so such than that the their them
+then there these they this those to under upon was we were what when where which while who whom
+why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased word tokens without stopwords. Compound tokens ("pre-existing",
+    "covid-19") are also indexed by their parts; numeric ones ("3.1.4") only whole.
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token[0].isdigit() and any(c in token for c in ".-/"):
+            tokens.extend(p for p in re.split(r"[.\-/]", token) if p not in _STOPWORDS)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    BM25 scores over an inverted index. Postings loaded from a base segment
+    are immutable CSR arrays (memory-mapped when VECTOR_STORE_MMAP is on);
+    documents added since append to per-term arrays until the next
+    compaction saves a new segment. Not thread-safe on its own: the vector
+    store adds under its write lock and searches under its read lock.
+    """
+    def __init__(self, k1: float = settings.BM25_K1, b: float = settings.BM25_B):
+        self.k1, self.b = k1, b
+        self._terms: Dict[str, int] = {}                   # term → row
+        self._indptr = np.zeros(1, dtype=np.int64)         # base postings (CSR)
+        self._ids = np.zeros(0, dtype=np.uint32)
+        self._tfs = np.zeros(0, dtype=np.uint16)
+        self._tail_ids: Dict[int, array] = {}              # row → IDs added since the base
+        self._tail_tfs: Dict[int, array] = {}
+        self._lengths = np.zeros(1024, dtype=np.float32)   # tokens per document (grows ×2)
+        self._n = 0
+        self._total_len = 0
+
+    @classmethod
+    def open(cls, directory: str) -> Optional["LexicalIndex"]:
+        """
+        Loads the index saved in `directory`, or returns None if it has none.
+        """
+        if not all(os.path.exists(os.path.join(directory, name)) for name in LEXICAL_FILES):
+            return None
+        mmap_mode = "r" if settings.VECTOR_STORE_MMAP else None
+        index = cls()
+        with open(os.path.join(directory, TERMS_FILE), "r", encoding="utf-8") as f:
+            index._terms = {term: row for row, term in enumerate(json.load(f))}
+        index._indptr = np.load(os.path.join(directory, INDPTR_FILE))
+        index._ids = np.load(os.path.join(directory, IDS_FILE), mmap_mode=mmap_mode)
+        index._tfs = np.load(os.path.join(directory, TFS_FILE), mmap_mode=mmap_mode)
+        lengths = np.load(os.path.join(directory, LENGTHS_FILE))
+        index._grow(len(lengths))
+        index._lengths[:len(lengths)] = lengths
+        index._n = len(lengths)
+        index._total_len = int(lengths.sum())
+        if len(index._indptr) != len(index._terms) + 1 or int(index._indptr[-1]) != len(index._ids):
+            raise ValueError(f"Lexical index in {directory} is inconsistent")
+        return index
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate size of the postings and document lengths (the vocabulary
+        dict not included).
+        """
+        tail = sum(len(a) for a in self._tail_ids.values())
+        return self._indptr.nbytes + self._ids.nbytes + self._tfs.nbytes + self._lengths.nbytes + 6 * tail
+
+    def _grow(self, n: int):
+        if n > len(self._lengths):
+            lengths = np.zeros(max(n, 2 * len(self._lengths)), dtype=np.float32)
+            lengths[:self._n] = self._lengths[:self._n]
+            self._lengths = lengths
+
+    def add(self, texts: Iterable[str]):
+        self.add_tokens([tokenize(text) for text in texts])
+
+    def add_tokens(self, token_lists: Sequence[List[str]]):
+        """
+        Appends documents (already tokenized) with the next consecutive IDs.
+        """
+        self._grow(self._n + len(token_lists))
+        for doc_id, tokens in enumerate(token_lists, self._n):
+            for term, tf in Counter(tokens).items():
+                row = self._terms.setdefault(term, len(self._terms))
+                if row not in self._tail_ids:
+                    self._tail_ids[row], self._tail_tfs[row] = array("I"), array("H")
+                self._tail_ids[row].append(doc_id)
+                self._tail_tfs[row].append(min(tf, 0xFFFF))
+            self._lengths[doc_id] = len(tokens)
+            self._total_len += len(tokens)
+        self._n += len(token_lists)
+
+    def _postings(self, row: int):
+        parts_ids, parts_tfs = [], []
+        if row + 1 < len(self._indptr):
+            start, end = self._indptr[row], self._indptr[row + 1]
+            parts_ids.append(self._ids[start:end])
+            parts_tfs.append(self._tfs[start:end])
+        if row in self._tail_ids:
+            parts_ids.append(np.frombuffer(self._tail_ids[row], dtype=np.uint32))
+            parts_tfs.append(np.frombuffer(self._tail_tfs[row], dtype=np.uint16))
+        # Always a copy: views on the tail arrays would block later appends
+        return np.concatenate(parts_ids), np.concatenate(parts_tfs)
+
+    def search(self, tokens: List[str], top_k: int) -> np.ndarray:
+        """
+        IDs of the top_k documents by BM25 score, best first.
+        """
+        if not self._n:
+            return np.zeros(0, dtype=np.int64)
+        avg_len = self._total_len / self._n or 1.0
+        ids_parts, score_parts = [], []
+        for term, qtf in Counter(tokens).items():
+            row = self._terms.get(term)
+            if row is None:
+                continue
+            ids, tfs = self._postings(row)
+            if not len(ids):
+                continue
+            idf = math.log(1 + (self._n - len(ids) + 0.5) / (len(ids) + 0.5))
+            tf = tfs.astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[ids] / avg_len)
+            ids_parts.append(ids)
+            score_parts.append(qtf * idf * tf * (self.k1 + 1) / (tf + norm))
+        if not ids_parts:
+            return np.zeros(0, dtype=np.int64)
+        # Sum per document over all query terms in one pass
+        docs, inverse = np.unique(np.concatenate(ids_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        if len(scores) > top_k:
+            keep = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            keep = np.arange(len(scores))
+        keep = keep[np.lexsort((docs[keep], -scores[keep]))]
+        return docs[keep].astype(np.int64)
+
+    def search_batch(self, token_lists: Sequence[List[str]], top_k: int) -> np.ndarray:
+        """
+        (len(token_lists), top_k) matrix of IDs, best first, padded with -1
+        (the layout FAISS returns).
+        """
+        out = np.full((len(token_lists), top_k), -1, dtype=np.int64)
+        for i, tokens in enumerate(token_lists):
+            ids = self.search(tokens, top_k)
+            out[i, :len(ids)] = ids
+        return out
+
+    def snapshot(self) -> "LexicalIndex":
+        """
+        Copy that later add_tokens() calls don't affect, for saving while
+        adds carry on. Shares the immutable base arrays; copies only the tail.
+        """
+        copy = LexicalIndex(self.k1, self.b)
+        copy._terms = dict(self._terms)
+        copy._indptr, copy._ids, copy._tfs = self._indptr, self._ids, self._tfs
+        copy._tail_ids = {row: np.frombuffer(a, dtype=np.uint32).copy() for row, a in self._tail_ids.items()}
+        copy._tail_tfs = {row: np.frombuffer(a, dtype=np.uint16).copy() for row, a in self._tail_tfs.items()}
+        copy._lengths = self._lengths[:self._n].copy()
+        copy._n, copy._total_len = self._n, self._total_len
+        return copy
+
+    def save(self, directory: str, count: Optional[int] = None):
+        """
+        Writes the postings of the first `count` documents (all by default)
+        into `directory` as one CSR segment.
+        """
+        count = self._n if count is None else count
+        terms = sorted(self._terms, key=self._terms.get)
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        ids_parts, tfs_parts = [], []
+        for row in range(len(terms)):
+            ids, tfs = self._postings(row)
+            end = int(np.searchsorted(ids, count))
+            ids_parts.append(ids[:end])
+            tfs_parts.append(tfs[:end])
+            indptr[row + 1] = indptr[row] + end
+        arrays = {
+            INDPTR_FILE: indptr,
+            IDS_FILE: np.concatenate(ids_parts) if ids_parts else np.zeros(0, dtype=np.uint32),
+            TFS_FILE: np.concatenate(tfs_parts) if tfs_parts else np.zeros(0, dtype=np.uint16),
+            LENGTHS_FILE: self._lengths[:count].astype(np.uint32),
+        }
+        for name, values in arrays.items():
+            with open(os.path.join(directory, name), "wb") as f:
+                np.save(f, values)
+        with open(os.path.join(directory, TERMS_FILE), "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[np.ndarray],
+    top_k: int,
+    k: int = settings.RRF_K,
+    weights: Optional[Sequence[float]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuses several (n_queries, depth) ID rankings (best first, -1 = empty) into
+    one (n_queries, top_k) ranking by Σ weight / (k + rank), for all queries
+    at once. Ties go to the lower ID. Returns the fused IDs (-1 padded) and
+    their scores (0 for padding).
+    """
+    n_queries = rankings[0].shape[0]
+    weights = weights or [1.0] * len(rankings)
+    ids = np.hstack([np.asarray(r, dtype=np.int64) for r in rankings])
+    scores = np.hstack([
+        np.broadcast_to(w / (k + np.arange(1, r.shape[1] + 1)), r.shape) for r, w in zip(rankings, weights)
+    ])
+    rows = np.broadcast_to(np.arange(n_queries)[:, None], ids.shape)
+    valid = ids >= 0
+    rows, ids, scores = rows[valid], ids[valid], scores[valid]
+    out = np.full((n_queries, top_k), -1, dtype=np.int64)
+    out_scores = np.zeros((n_queries, top_k))
+    if not len(ids):
+        return out, out_scores
+
+    # One key per (query, ID) so an ID found by several rankings sums its scores
+    span = int(ids.max()) + 1
+    keys, inverse = np.unique(rows * span + ids, return_inverse=True)
+    totals = np.bincount(inverse, weights=scores)
+    key_rows, key_ids = keys // span, keys % span
+    order = np.lexsort((key_ids, -totals, key_rows))
+    key_rows, key_ids, totals = key_rows[order], key_ids[order], totals[order]
+    rank = np.arange(len(order)) - np.searchsorted(key_rows, key_rows)
+    keep = rank < top_k
+    out[key_rows[keep], rank[keep]] = key_ids[keep]
+    out_scores[key_rows[keep], rank[keep]] = totals[keep]
+    return out, out_scores
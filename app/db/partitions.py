@@ -0,0 +1,313 @@
+# db/partitions.py
+#
+# Multi-tenant storage: one persistent FaissVectorStore per partition under
+# <VECTOR_DB_PATH>/partitions/<name>/, a routing table from tenant to
+# partition, and an LRU of resident partitions kept under PARTITION_MEMORY_MB.
+# A request searches (and adds to) only its tenant's partition, so its cost
+# is bounded by that partition's size rather than the whole corpus.
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterator, Optional, Tuple
+from config import settings
+from db.vector_store import FaissVectorStore
+
+ROUTING_FILE = "ROUTING.json"
+
+
+class UnknownTenant(ValueError):
+    """
+    The request names a tenant that may not get a partition: not in the
+    routing table or PARTITION_TENANTS, or PARTITION_MAX_COUNT is reached.
+    """
+
+def allowed_tenants(value: str = settings.PARTITION_TENANTS) -> FrozenSet[str]:
+    return frozenset(t.strip() for t in value.split(",") if t.strip())
+
+
+def partition_name(tenant: str) -> str:
+    """
+    Directory-safe partition name for a tenant: a readable slug plus a short
+    hash, so tenants that slugify alike ("Acme Inc", "acme-inc") stay apart.
+    """
+    slug = re.sub(r"[^a-z0-9_]+", "-", tenant.lower()).strip("-")[:40] or "tenant"
+    digest = hashlib.blake2b(tenant.encode("utf-8"), digest_size=4).hexdigest()
+    return f"{slug}-{digest}"
+
+
+@dataclass
+class _Resident:
+    store: FaissVectorStore
+    pins: int = 0              # requests using the store right now (never unloaded while > 0)
+    loaded_at: float = 0.0
+
+
+class PartitionedVectorStore:
+    """
+    Routes tenants to partitions and keeps the partitions in use loaded.
+
+    ROUTING.json maps tenant → partition name; editing it can point several
+    tenants at one shared partition. Tenants come from the request body, so a
+    new one only gets its own partition (see partition_name) if it is in
+    `allowed` (PARTITION_TENANTS; "*" allows any) or is DEFAULT_TENANT, and
+    while fewer than `max_partitions` exist. acquire() loads a partition on
+    demand and pins it until release(); after every acquire/release, unpinned
+    partitions are unloaded least recently used first while the resident ones
+    take more than `memory_budget` bytes (see FaissVectorStore.memory_bytes).
+    """
+    def __init__(
+        self,
+        root: str = os.path.join(settings.VECTOR_DB_PATH, "partitions"),
+        memory_budget: int = settings.PARTITION_MEMORY_MB * 1024 * 1024,
+        dim: Optional[int] = None,
+        allowed: FrozenSet[str] = allowed_tenants(),
+        max_partitions: int = settings.PARTITION_MAX_COUNT
+    ):
+        self.root = root
+        self.memory_budget = memory_budget
+        self.allowed = allowed
+        self.max_partitions = max_partitions
+        self._dim = dim
+        self._routes: Dict[str, str] = {}
+        self._resident: "OrderedDict[str, _Resident]" = OrderedDict()  # LRU order, most recent last
+        self._load_locks: Dict[str, threading.Lock] = {}              # held while a partition loads / closes
+        self._lock = threading.Lock()
+        self._load_routes()
+
+    # ─── Routing ──────────────────────────────────────────────────────────────
+
+    def route(self, tenant: Optional[str], provision: bool = False) -> str:
+        """
+        Partition name for `tenant` (DEFAULT_TENANT when None), recorded in
+        the routing table on first sight. Raises UnknownTenant for a new
+        tenant that isn't allowed or would exceed max_partitions, unless
+        `provision` (operator tools such as index_documents.py --tenant).
+        """
+        tenant = tenant or settings.DEFAULT_TENANT
+        with self._lock:
+            name = self._routes.get(tenant)
+            if name is None:
+                name = partition_name(tenant)
+                if not provision:
+                    self._check_new_tenant(tenant, name)
+                self._routes[tenant] = name
+                self._save_routes()
+            return name
+
+    def _check_new_tenant(self, tenant: str, name: str):
+        # Caller holds self._lock
+        if tenant != settings.DEFAULT_TENANT and "*" not in self.allowed and tenant not in self.allowed:
+            raise UnknownTenant(f"Unknown tenant {tenant!r}.")
+        partitions = set(self._routes.values())
+        if self.max_partitions and name not in partitions and len(partitions) >= self.max_partitions:
+            raise UnknownTenant(f"Partition limit reached ({self.max_partitions}); can't add tenant {tenant!r}.")
+
+    def routes(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._routes)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _load_routes(self):
+        path = os.path.join(self.root, ROUTING_FILE)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._routes = json.load(f)["tenants"]
+        except FileNotFoundError:
+            self._routes = {}
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Could not read partition routing table {path}: {e}")
+            self._routes = {}
+
+    def _save_routes(self):
+        # Caller holds self._lock
+        path = os.path.join(self.root, ROUTING_FILE)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "tenants": self._routes}, f, indent=1, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"⚠️ Failed to write partition routing table: {e}")
+
+    # ─── Loading / unloading ──────────────────────────────────────────────────
+
+    def acquire(self, name: str) -> FaissVectorStore:
+        """
+        The partition's store, loaded if needed and pinned until release(name).
+        Only the first caller for a partition loads it; others wait for it.
+        """
+        with self._lock:
+            if self._pin(name):
+                return self._resident[name].store
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            with self._lock:
+                if self._pin(name):
+                    return self._resident[name].store
+            t0 = time.perf_counter()
+            store = FaissVectorStore(self._dimension(), persist_path=self.path(name))
+            with self._lock:
+                self._resident[name] = _Resident(store, pins=1, loaded_at=time.time())
+        print(f"📂 Loaded partition {name} ({len(store.texts)} chunks) in {time.perf_counter() - t0:.2f}s")
+        self._enforce_budget()
+        return store
+
+    def release(self, name: str):
+        with self._lock:
+            entry = self._resident.get(name)
+            if entry is not None and entry.pins > 0:
+                entry.pins -= 1
+        self._enforce_budget()
+
+    @contextmanager
+    def use(self, tenant: Optional[str]) -> Iterator[FaissVectorStore]:
+        """
+        with partitions.use(tenant) as store: ... — acquire + release.
+        """
+        name = self.route(tenant)
+        store = self.acquire(name)
+        try:
+            yield store
+        finally:
+            self.release(name)
+
+    def _pin(self, name: str) -> bool:
+        # Caller holds self._lock
+        entry = self._resident.get(name)
+        if entry is None:
+            return False
+        entry.pins += 1
+        self._resident.move_to_end(name)
+        return True
+
+    def _dimension(self) -> int:
+        if self._dim is None:
+            from embedder.embed import get_embedding_dimension
+            self._dim = get_embedding_dimension()
+        return self._dim
+
+    def _resident_sizes(self) -> Dict[str, Tuple[FaissVectorStore, int]]:
+        """
+        name → (store, memory_bytes()) of the resident partitions. The sizes
+        are read without holding self._lock: memory_bytes() takes the store's
+        read lock, which waits behind a writer (an add, a compaction's swap).
+        """
+        with self._lock:
+            stores = [(name, entry.store) for name, entry in self._resident.items()]
+        return {name: (store, store.memory_bytes()) for name, store in stores}
+
+    def _enforce_budget(self):
+        """
+        Unloads unpinned partitions, least recently used first, until the
+        resident ones fit in the memory budget. Partitions loaded (or
+        reloaded) since the sizes were read are left for the next call.
+        """
+        sizes = self._resident_sizes()
+        with self._lock:
+            current = {
+                name: nbytes for name, (store, nbytes) in sizes.items()
+                if name in self._resident and self._resident[name].store is store
+            }
+            total = sum(current.values())
+            victims = []
+            for name in list(self._resident):
+                if total <= self.memory_budget:
+                    break
+                if name not in current:
+                    continue
+                store = self._take(name)
+                if store is not None:
+                    total -= current[name]
+                    victims.append((name, store))
+        for name, store in victims:
+            self._close(name, store, current[name])
+
+    def _take(self, name: str) -> Optional[FaissVectorStore]:
+        """
+        Removes an unpinned partition from the resident set, holding its load
+        lock so it can't be reopened before _close() finishes. Caller holds self._lock.
+        """
+        entry = self._resident.get(name)
+        load_lock = self._load_locks.setdefault(name, threading.Lock())
+        if entry is None or entry.pins or not load_lock.acquire(blocking=False):
+            return None
+        del self._resident[name]
+        return entry.store
+
+    def _close(self, name: str, store: FaissVectorStore, nbytes: int):
+        # Waits for the partition's last compaction; then it may be reopened
+        try:
+            store.close()
+        finally:
+            self._load_locks[name].release()
+        print(f"📤 Unloaded partition {name} (~{nbytes / 1e6:.1f} MB)")
+
+    def unload(self, name: Optional[str] = None) -> int:
+        """
+        Unloads `name` (or every partition) unless in use. Returns how many
+        were unloaded.
+        """
+        with self._lock:
+            names = [key for key in self._resident if name is None or key == name]
+            victims = [(key, self._take(key)) for key in names]
+            victims = [(key, store) for key, store in victims if store is not None]
+        for key, store in victims:
+            # Sized outside self._lock (see _resident_sizes)
+            self._close(key, store, store.memory_bytes())
+        return len(victims)
+
+    def reload(self) -> int:
+        """
+        Re-reads every resident partition from disk (e.g. after an offline
+        re-index); partitions not loaded are read fresh on next use anyway.
+        """
+        with self._lock:
+            stores = [entry.store for entry in self._resident.values()]
+        return sum(bool(store.reload()) for store in stores)
+
+    def stats(self) -> dict:
+        sizes = self._resident_sizes()
+        with self._lock:
+            resident = {
+                name: {
+                    "chunks": len(entry.store.texts),
+                    "bytes": sizes[name][1],
+                    "pins": entry.pins,
+                    "loaded_at": entry.loaded_at,
+                }
+                for name, entry in self._resident.items() if name in sizes
+            }
+            routes = dict(self._routes)
+        return {
+            "memory_budget_bytes": self.memory_budget,
+            "max_partitions": self.max_partitions,
+            "resident_bytes": sum(p["bytes"] for p in resident.values()),
+            "resident": resident,
+            "routes": routes,
+        }
+
+
+# ─── Process-wide partitioned store ───────────────────────────────────────────
+
+_partitioned_store: Optional[PartitionedVectorStore] = None
+_partitioned_store_lock = threading.Lock()
+
+def get_partitioned_store() -> PartitionedVectorStore:
+    """
+    Returns the process-wide partition manager (used when PARTITIONED_STORE is on).
+    """
+    global _partitioned_store
+    if _partitioned_store is None:
+        with _partitioned_store_lock:
+            if _partitioned_store is None:
+                _partitioned_store = PartitionedVectorStore()
+    return _partitioned_store
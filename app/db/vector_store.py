@@ -37,57 +37,778 @@
 #         self.text_chunks = []
 # db/vector_store.py
 
-import faiss
+import hashlib
+import json
 import os
 import pickle
-from typing import List
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 from config import settings
+from lazy_import import lazy_module
+from db.chunk_metadata import ChunkMeta, ChunkMetadataTable
+from db.chunk_store import ChunkTextStore
+from db.index_factory import (
+    apply_search_params, create_index, index_bytes, index_type_of, needs_training, reconstruct_all
+)
+from db.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+from db.wal import append_record, fsync_dir, read_records
 import numpy as np
 
+faiss = lazy_module("faiss")  # real import on first use
+
+DIGEST_SIZE = 16  # bytes per chunk digest in hashes.bin
+
+def chunk_digest(text: str) -> bytes:
+    """
+    Content digest used to dedup chunks without comparing full strings.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+def _as_matrix(vectors: np.ndarray, dim: int) -> np.ndarray:
+    """
+    View `vectors` as the (n, dim) C-contiguous float32 matrix FAISS expects.
+    Copies only when the input isn't already in that layout.
+    """
+    return np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, dim)
+
+
+class _ReadWriteLock:
+    """
+    Lets any number of searches run together while an add/reload waits for
+    exclusive access. Pending writers block new readers so they can't starve.
+    """
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+MANIFEST_FILE = "MANIFEST.json"
+
+
+class SearchResult(NamedTuple):
+    """
+    One retrieved chunk. `distance` is the squared L2 distance to the query
+    (nan when only BM25 found the chunk); `score` is higher-is-better: the
+    fused RRF score for hybrid searches, 1 / (1 + distance) for dense ones.
+    """
+    chunk_id: int
+    text: str
+    distance: float
+    score: float
+    doc_id: Optional[str] = None      # source document's content SHA-256
+    page_start: Optional[int] = None  # 1-based pages the chunk spans
+    page_end: Optional[int] = None
+
+
+class _DiskState(NamedTuple):
+    index: "faiss.Index"
+    texts: ChunkTextStore
+    metadata: ChunkMetadataTable
+    mapped: bool
+    delta: "faiss.Index"
+    base_name: str           # "" = files live directly in persist_path (pre-manifest layout)
+    wals: List[str]
+    generation: int
+
+
 class FaissVectorStore:
-    def __init__(self, dim: int, persist_path: str = settings.VECTOR_DB_PATH):
+    """
+    FAISS index + chunk texts, optionally persisted under `persist_path`:
+
+      MANIFEST.json    current base segment + the WAL files to replay on top of it
+      base-NNNNNN/     index.faiss, texts.bin/.idx, hashes.bin, lexical.*, meta.* (immutable, mmapped)
+      wal-NNNNNN.log   append-only records of chunks added since that base
+
+    add_documents fsyncs a small WAL record and adds the vectors to an
+    in-memory flat "delta" index searched alongside the base, so an add costs
+    O(new chunks) on disk. Once the WAL passes WAL_COMPACT_BYTES a background
+    compaction merges base + delta into a new base segment and switches the
+    manifest atomically. A store without a manifest (older layouts, incl.
+    texts.pkl) is read from persist_path itself and migrated by its first
+    compaction; its files are left in place (the manifest takes precedence),
+    so they can be removed by hand once the migration is confirmed. Assumes
+    one writing process per persist_path.
+
+    The BM25 index for hybrid_search_batch is built on first use (from the
+    base segment's lexical.* files plus the chunks after it), then kept up
+    to date by add_documents and saved by each compaction. Chunk metadata
+    (source document, pages) is kept in a ChunkMetadataTable aligned with
+    the vector IDs and logged/saved the same way.
+    """
+    def __init__(
+        self,
+        dim: int,
+        persist_path: str = settings.VECTOR_DB_PATH,
+        index_type: Optional[str] = None
+    ):
         self.dim = dim
         self.persist_path = persist_path
-        self.index = faiss.IndexFlatL2(dim)
-        self.texts = []  # List[str]
+        # Persistent stores use the configured ANN type; in-memory ones stay exact
+        self.index_type = index_type or (settings.VECTOR_INDEX_TYPE if persist_path else "flat")
+        self.index = self._empty_index()                # base segment
+        self._delta = create_index("flat", dim)         # chunks added since the base was written
+        self._frozen: Optional["faiss.Index"] = None      # delta being compacted right now
+        self.texts = ChunkTextStore()  # Sequence[str]: base texts mmapped, newer ones in memory
+        self._meta = ChunkMetadataTable()               # doc ID + page range per vector ID
+        self._ids: Optional[Dict[bytes, int]] = {}  # chunk digest → vector ID (None = not built yet)
+        self._ids_lock = threading.Lock()
+        self._lexical: Optional[LexicalIndex] = None  # BM25 index (None = not built yet)
+        self._base_name = ""
+        self._wals = [_wal_name(0)]
+        self._generation = 0
+        self._lock = _ReadWriteLock()
+        self._write_mutex = threading.RLock()  # serializes add/clear/reload and manifest changes
+        self._compaction_lock = threading.Lock()
 
         # Try to load existing index
         self._load()
+        if self.persist_path is None:
+            self._maybe_build_index()
+        elif (self._base_name == "" and len(self.texts)) or self._needs_ann_build():
+            # Migrate an older layout / train the ANN index without delaying startup
+            self.compact(wait=False)
+
+    def _empty_index(self) -> "faiss.Index":
+        # IVF types can't be trained without data; collect vectors in a flat index first
+        if needs_training(self.index_type):
+            return create_index("flat", self.dim)
+        return create_index(self.index_type, self.dim)
+
+    def _needs_ann_build(self, n: Optional[int] = None) -> bool:
+        """
+        True when the base is still the flat staging index but the configured
+        ANN index can now be built (enough vectors to train IVF; any for HNSW).
+        """
+        if self.index_type == "flat" or index_type_of(self.index) != "flat":
+            return False
+        n = len(self.texts) if n is None else n
+        return bool(n) and (not needs_training(self.index_type) or n >= settings.INDEX_TRAIN_MIN_VECTORS)
 
-    def add_documents(self, texts: List[str], vectors: List[List[float]]):
-        vec_array = np.array(vectors).astype('float32')
-        self.index.add(vec_array)
-        self.texts.extend(texts)
-        self._save()
+    def _maybe_build_index(self):
+        # In-memory stores build in place; persistent ones do it during compaction
+        if self._needs_ann_build(self.index.ntotal):
+            self.rebuild_index()
 
-    def search(self, query_vec: List[float], top_k: int = 5) -> List[str]:
-        q = np.array([query_vec]).astype('float32')
-        _, I = self.index.search(q, top_k)
-        return [self.texts[i] for i in I[0] if i < len(self.texts)]
+    def rebuild_index(self, index_type: Optional[str] = None):
+        """
+        Rebuilds (and, for IVF types, retrains) the index over all stored vectors.
+        Built off to the side; searches use the old index until the swap.
+        Rebuilding from an IVF-PQ index is lossy since PQ codes are approximate.
+        """
+        if self.persist_path is not None:
+            with self._write_mutex:
+                self.index_type = index_type or self.index_type
+            self.compact(wait=True, rebuild=True)
+            return
+        with self._write_mutex:
+            self.index_type = index_type or self.index_type
+            with self._lock.read():
+                vectors = reconstruct_all(self.index)
+            t0 = time.perf_counter()
+            index = create_index(self.index_type, self.dim, vectors)
+            index.add(vectors)
+            with self._lock.write():
+                self.index = index
+        print(f"🧭 Built {self.index_type} index over {len(vectors)} vectors in {time.perf_counter() - t0:.1f}s")
 
-    def _save(self):
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """
+        Tunes IVF nprobe / HNSW efSearch at runtime (defaults come from settings).
+        """
+        with self._lock.write():
+            apply_search_params(self.index, nprobe=nprobe, ef_search=ef_search)
+
+    def add_documents(
+        self,
+        texts: List[str],
+        vectors: np.ndarray,
+        auto_compact: bool = True,
+        metadata: Optional[List[ChunkMeta]] = None
+    ) -> Tuple[int, int]:
+        """
+        Appends the chunks and returns the [start, end) range of IDs they were given.
+        `vectors` should be a (len(texts), dim) float32 array; it is passed to FAISS
+        without a copy when it already is C-contiguous float32. `metadata`, if
+        given, has one ChunkMeta per chunk.
+
+        For persistent stores the chunks are durable (fsynced to the WAL) before
+        they become searchable. Bulk loaders pass auto_compact=False and call
+        compact() once at the end instead of every WAL_COMPACT_BYTES.
+        """
+        vec_array = _as_matrix(vectors, self.dim)
+        wal_size = 0
+        with self._write_mutex:
+            ids = self._id_map()
+            lexical = self._lexical
+            tokens = [tokenize(text) for text in texts] if lexical is not None else None
+            if self.persist_path is not None:
+                os.makedirs(self.persist_path, exist_ok=True)
+                wal_size = append_record(
+                    os.path.join(self.persist_path, self._wals[-1]),
+                    texts, vec_array, fsync=settings.WAL_FSYNC, metadata=metadata
+                )
+            # Only the in-memory append is exclusive
+            with self._lock.write():
+                start = len(self.texts)
+                (self._delta if self.persist_path is not None else self.index).add(vec_array)
+                self.texts.extend(texts)
+                self._meta.extend(metadata, len(texts))
+                for i, text in enumerate(texts, start):
+                    ids.setdefault(chunk_digest(text), i)
+                if lexical is not None:
+                    lexical.add_tokens(tokens)
         if self.persist_path is None:
-            return  # Don't persist in-memory stores
-        faiss.write_index(self.index, os.path.join(self.persist_path, "index.faiss"))
-        with open(os.path.join(self.persist_path, "texts.pkl"), "wb") as f:
-            pickle.dump(self.texts, f)
+            self._maybe_build_index()
+        elif auto_compact and wal_size >= settings.WAL_COMPACT_BYTES:
+            self.compact(wait=False)
+        return start, start + len(texts)
+
+    def add_missing(
+        self,
+        texts: List[str],
+        vectors: np.ndarray,
+        metadata: Optional[List[ChunkMeta]] = None
+    ) -> Optional[Tuple[int, int]]:
+        """
+        add_documents for only those chunks that aren't stored yet, checked
+        and appended under the write mutex, so concurrent requests persisting
+        the same document don't store its chunks twice. Returns the ID range
+        when every chunk was added, None when some (or all) were already there.
+        """
+        with self._write_mutex:
+            positions = self.missing(texts)
+            if not positions:
+                return None
+            if len(positions) == len(texts):
+                return self.add_documents(texts, vectors, metadata=metadata)
+            self.add_documents(
+                [texts[i] for i in positions],
+                _as_matrix(vectors, self.dim)[positions],
+                metadata=[metadata[i] for i in positions] if metadata is not None else None
+            )
+            return None
+
+    def _id_map(self) -> Dict[bytes, int]:
+        # Built on first dedup lookup rather than at load, so opening stays O(1)
+        if self._ids is None:
+            with self._ids_lock:
+                if self._ids is None:
+                    self._ids = self._build_ids(self.texts)
+        return self._ids
+
+    def _lexical_index(self) -> LexicalIndex:
+        # Built on first hybrid search (or warm-up); adds are held off meanwhile
+        if self._lexical is None:
+            with self._write_mutex:
+                if self._lexical is None:
+                    self._lexical = self._build_lexical(self._base_name, self.texts, len(self.texts))
+        return self._lexical
+
+    def _build_lexical(self, base_name: str, texts: ChunkTextStore, count: int) -> LexicalIndex:
+        """
+        BM25 index of the first `count` texts: the base segment's saved
+        postings plus only the chunks after it (or everything, for segments
+        written without them).
+        """
+        lexical = None
+        if self.persist_path is not None and base_name:
+            try:
+                lexical = LexicalIndex.open(os.path.join(self.persist_path, base_name))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not load lexical index, rebuilding it: {e}")
+        if lexical is None or len(lexical) > count:
+            lexical = LexicalIndex()
+        t0 = time.perf_counter()
+        missing = count - len(lexical)
+        lexical.add(texts[i] for i in range(len(lexical), count))
+        if missing > 1000:
+            print(f"🔤 Indexed {missing} chunks for BM25 in {time.perf_counter() - t0:.1f}s")
+        return lexical
+
+    def warm_up_lexical(self):
+        self._lexical_index()
+
+    def memory_bytes(self) -> int:
+        """
+        Approximate memory held by the store (mapped segments included):
+        index codes, chunk texts, BM25 postings and chunk metadata.
+        """
+        with self._lock.read():
+            segments = [self.index, self._frozen, self._delta]
+            lexical = self._lexical
+            total = sum(index_bytes(seg) for seg in segments if seg is not None)
+            total += self.texts.nbytes + 12 * len(self._meta)
+            return total + (lexical.nbytes if lexical is not None else 0)
+
+    def __contains__(self, text: str) -> bool:
+        return chunk_digest(text) in self._id_map()
+
+    def get_id(self, text: str) -> Optional[int]:
+        """
+        Vector ID of an identical stored chunk, if any (O(1)).
+        """
+        return self._id_map().get(chunk_digest(text))
+
+    def missing(self, texts: Iterable[str]) -> List[int]:
+        """
+        Positions of the given chunks that are not stored yet.
+        """
+        ids = self._id_map()
+        return [i for i, text in enumerate(texts) if chunk_digest(text) not in ids]
+
+    def _search(self, q: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k (distances, vector IDs) per query across base, frozen and delta
+        segments. Caller holds the read lock.
+        """
+        segments = [(self.index, 0)]
+        offset = self.index.ntotal
+        for seg in (self._frozen, self._delta):
+            if seg is not None and seg.ntotal:
+                segments.append((seg, offset))
+                offset += seg.ntotal
+        if len(segments) == 1:
+            return self.index.search(q, top_k)
+
+        dists, ids = [], []
+        for seg, offset in segments:
+            D, I = seg.search(q, top_k)
+            dists.append(D)
+            ids.append(np.where(I >= 0, I + offset, -1))
+        D, I = np.hstack(dists), np.hstack(ids)
+        # Missing results come back as -1 with +inf/FLT_MAX distance, so they sort last
+        order = np.argsort(D, axis=1, kind="stable")[:, :top_k]
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+    def search_results(
+        self,
+        query_vecs: np.ndarray,
+        top_k: int = 5,
+        queries: Optional[List[str]] = None,
+        candidates: int = settings.HYBRID_CANDIDATES
+    ) -> List[List[SearchResult]]:
+        """
+        Scored results with chunk metadata, one list per query vector (best
+        first). With `queries` (the query texts) the dense ranking is fused
+        with a BM25 ranking of the texts (reciprocal rank fusion over the top
+        `candidates` of each), so chunks quoting an exact term ("Plan A",
+        "3.1.4") surface even when their embedding isn't the closest.
+        """
+        q = _as_matrix(query_vecs, self.dim)
+        if queries is not None:
+            lexical = self._lexical_index()
+            token_lists = [tokenize(query) for query in queries]
+        with self._lock.read():
+            if queries is None:
+                D, I = self._search(q, top_k)
+                S = 1 / (1 + np.maximum(D, 0))
+            else:
+                dense_D, dense_I = self._search(q, max(top_k, candidates))
+                sparse = lexical.search_batch(token_lists, max(top_k, candidates))
+                I, S = reciprocal_rank_fusion(
+                    [dense_I, sparse], top_k,
+                    weights=(settings.HYBRID_DENSE_WEIGHT, settings.HYBRID_LEXICAL_WEIGHT)
+                )
+                # Dense distance of each fused ID, where the dense ranking had it
+                match = (I[:, :, None] == dense_I[:, None, :]) & (I[:, :, None] >= 0)
+                D = np.where(
+                    match.any(axis=2),
+                    np.take_along_axis(dense_D, match.argmax(axis=2), axis=1),
+                    np.nan
+                )
+            return self._results(I, D, S)
+
+    def _results(self, I: np.ndarray, D: np.ndarray, S: np.ndarray) -> List[List[SearchResult]]:
+        # Caller holds the read lock
+        texts = self.texts
+        valid = (I >= 0) & (I < len(texts))
+        metadata = iter(self._meta.get(I[valid]))
+        return [
+            [
+                SearchResult(int(i), texts[i], float(d), float(s), *next(metadata))
+                for i, d, s, ok in zip(I_row, D_row, S_row, valid_row) if ok
+            ]
+            for I_row, D_row, S_row, valid_row in zip(I, D, S, valid)
+        ]
+
+    def search(self, query_vec: np.ndarray, top_k: int = 5) -> List[str]:
+        return [r.text for r in self.search_results(query_vec, top_k)[0]]
+
+    def search_batch(self, query_vecs: np.ndarray, top_k: int = 5) -> List[List[str]]:
+        """
+        Searches all query vectors in a single FAISS call per segment.
+        Returns one list of chunks per query, in the same order as `search`.
+        """
+        return [[r.text for r in hits] for hits in self.search_results(query_vecs, top_k)]
+
+    def hybrid_search_batch(
+        self,
+        query_vecs: np.ndarray,
+        queries: List[str],
+        top_k: int = 5,
+        candidates: int = settings.HYBRID_CANDIDATES
+    ) -> List[List[str]]:
+        """
+        search_batch fused with BM25 over the query texts (see search_results).
+        """
+        return [[r.text for r in hits] for hits in self.search_results(query_vecs, top_k, queries, candidates)]
+
+    # ─── Compaction ───────────────────────────────────────────────────────────
+
+    def compact(self, wait: bool = True, rebuild: bool = False):
+        """
+        Merges the base segment and everything in the WAL into a new base
+        segment. With wait=False it runs on a background thread (and is
+        skipped if one is already running). `rebuild` also retrains/rebuilds
+        the ANN index over all vectors.
+        """
+        if self.persist_path is None:
+            return
+        if wait:
+            with self._compaction_lock:
+                self._compact(rebuild)
+            return
+        if not self._compaction_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self._compact(rebuild)
+            except Exception as e:
+                print(f"⚠️ Vector store compaction failed: {e}")
+            finally:
+                self._compaction_lock.release()
+        threading.Thread(target=run, name="vector-store-compaction", daemon=True).start()
+
+    def _compact(self, rebuild: bool):
+        t0 = time.perf_counter()
+        # 1) Freeze the delta and start a new WAL for adds that arrive meanwhile.
+        #    The manifest lists both WALs, so a crash now loses nothing.
+        with self._write_mutex:
+            if not (self._delta.ntotal or rebuild or self._needs_ann_build() or self._frozen is not None
+                    or (self._base_name == "" and len(self.texts))):
+                return
+            # Past the last listed WAL: a failed compaction leaves its WAL listed
+            generation = self._generation + len(self._wals)
+            new_wal = _wal_name(generation)
+            self._write_manifest(self._base_name, self._wals + [new_wal], self._generation)
+            frozen = self._delta
+            if self._frozen is not None:
+                # A failed compaction left its frozen delta behind; it comes
+                # right before the delta in ID order, so both are merged here
+                frozen = create_index("flat", self.dim)
+                frozen.add(np.vstack([reconstruct_all(self._frozen), reconstruct_all(self._delta)]))
+            with self._lock.write():
+                self._frozen, self._delta = frozen, create_index("flat", self.dim)
+                self._wals = self._wals + [new_wal]
+            count = len(self.texts)
+            base, frozen, texts = self.index, self._frozen, self.texts
+            digests = self._digests(count)
+            lexical = self._lexical.snapshot() if self._lexical is not None else None
+            metadata = self._meta.copy()
+            old_base_name = self._base_name
+
+        # 2) Write base + frozen delta as a new segment; searches and adds carry on
+        base_name = f"base-{generation:06d}"
+        base_dir = os.path.join(self.persist_path, base_name)
+        tmp_dir = base_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        index = self._merged_index(base, frozen, count, rebuild)
+        faiss.write_index(index, os.path.join(tmp_dir, "index.faiss"))
+        texts.save(tmp_dir, count)
+        with open(os.path.join(tmp_dir, "hashes.bin"), "wb") as f:
+            f.write(b"".join(digests))
+        if lexical is None and settings.HYBRID_SEARCH:
+            # Not built in this process (e.g. the bulk indexer): build it here so loads stay cheap
+            lexical = self._build_lexical(old_base_name, texts, count)
+        if lexical is not None:
+            lexical.save(tmp_dir, count)
+        metadata.save(tmp_dir, count)
+        for name in os.listdir(tmp_dir):
+            with open(os.path.join(tmp_dir, name), "rb") as f:
+                os.fsync(f.fileno())
+        fsync_dir(tmp_dir)
+        shutil.rmtree(base_dir, ignore_errors=True)
+        os.replace(tmp_dir, base_dir)
+
+        # 3) Point the manifest at the new base + only the WAL written since step 1
+        with self._write_mutex:
+            new_texts = ChunkTextStore.open(base_dir)
+            new_meta = ChunkMetadataTable.open(base_dir)
+            new_index, _ = _read_index(os.path.join(base_dir, "index.faiss"))
+            apply_search_params(new_index)
+            self._write_manifest(base_name, [new_wal], generation)
+            with self._lock.write():
+                new_texts.extend(self.texts[count:])
+                new_meta.extend(self._meta.rows(count, len(self._meta)), len(self._meta) - count)
+                self.index, self.texts, self._frozen = new_index, new_texts, None
+                self._meta = new_meta
+                self._base_name, self._wals, self._generation = base_name, [new_wal], generation
+
+        # 4) Old segments/WALs are unreferenced now (mapped copies stay valid on POSIX)
+        self._remove_stale_files()
+        print(f"🗜️ Compacted vector store to {base_name} ({count} chunks) in {time.perf_counter() - t0:.1f}s")
+
+    def _merged_index(self, base: "faiss.Index", frozen: "faiss.Index", count: int, rebuild: bool) -> "faiss.Index":
+        # Work on a private copy: the live base may be a read-only mmap
+        merged = faiss.deserialize_index(faiss.serialize_index(base))
+        new_vectors = reconstruct_all(frozen)
+        kind = index_type_of(merged)
+        if rebuild or (kind == "flat" and self._needs_ann_build(count)):
+            vectors = np.vstack([reconstruct_all(merged), new_vectors])
+            merged = create_index(self.index_type, self.dim, vectors)
+            merged.add(vectors)
+            print(f"🧭 Built {self.index_type} index over {len(vectors)} vectors")
+        elif len(new_vectors):
+            merged.add(new_vectors)
+        return merged
+
+    def _write_manifest(self, base_name: str, wals: List[str], generation: int):
+        path = os.path.join(self.persist_path, MANIFEST_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "generation": generation, "base": base_name, "wals": wals}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        fsync_dir(self.persist_path)
+
+    def _read_manifest(self) -> Optional[dict]:
+        path = os.path.join(self.persist_path, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _remove_stale_files(self):
+        # Only segments this store wrote; pre-manifest files in persist_path are never touched
+        keep = {MANIFEST_FILE, self._base_name, *self._wals}
+        for name in os.listdir(self.persist_path):
+            stale = (
+                (name.startswith("base-") or name.startswith("wal-"))
+                and name not in keep
+            )
+            if not stale:
+                continue
+            path = os.path.join(self.persist_path, name)
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError as e:
+                print(f"⚠️ Could not remove stale vector store file {path}: {e}")
+
+    # ─── Loading ──────────────────────────────────────────────────────────────
 
     def clear(self):
-        self.index = faiss.IndexFlatL2(self.dim)
-        self.texts = []
+        """
+        Empties the in-memory store (doesn't touch files on disk).
+        """
+        with self._write_mutex, self._lock.write():
+            self.index = self._empty_index()
+            self._delta = create_index("flat", self.dim)
+            self._frozen = None
+            self.texts = ChunkTextStore()
+            self._meta = ChunkMetadataTable()
+            self._ids = {}
+            self._lexical = None
+
+    def close(self):
+        """
+        Waits for a running compaction, then drops the in-memory data so it
+        can be freed. Files on disk are kept; open a new store to use them again.
+        """
+        with self._compaction_lock:
+            self.clear()
+
+    def reload(self) -> bool:
+        """
+        Re-reads the on-disk index (e.g. after an offline re-index) and swaps it in.
+        The files are read without holding the lock, so searches keep running
+        against the old snapshot until the swap.
+        """
+        with self._compaction_lock, self._write_mutex:
+            state = self._read_from_disk()
+            if state is None:
+                return False
+            self._apply_state(state)
+        print(f"🔄 Reloaded FAISS vector store from {self.persist_path}")
+        return True
+
+    def _apply_state(self, state: "_DiskState"):
+        with self._lock.write():
+            self.index, self.texts, self._delta = state.index, state.texts, state.delta
+            self._meta = state.metadata
+            self._frozen = None
+            self._base_name, self._wals, self._generation = state.base_name, state.wals, state.generation
+            self._ids = None
+            self._lexical = None
+
+    def _read_from_disk(self) -> Optional["_DiskState"]:
+        if self.persist_path is None or not os.path.isdir(self.persist_path):
+            return None  # Skip loading for in-memory stores
+        manifest = self._read_manifest()
+        if manifest:
+            base_name, wals, generation = manifest["base"], manifest["wals"], manifest["generation"]
+        else:
+            base_name, wals, generation = "", [_wal_name(0)], 0
+        base_dir = os.path.join(self.persist_path, base_name)
+
+        index_path = os.path.join(base_dir, "index.faiss")
+        if os.path.exists(index_path):
+            texts = ChunkTextStore.open(base_dir)
+            if texts is None:
+                legacy_path = os.path.join(base_dir, "texts.pkl")
+                if not os.path.exists(legacy_path):
+                    return None
+                # Pre-mmap layout: rewritten as a base segment by the first compaction
+                with open(legacy_path, "rb") as f:
+                    texts = ChunkTextStore(pickle.load(f))
+            index, mapped = _read_index(index_path)
+            metadata = ChunkMetadataTable.open(base_dir)
+            if metadata is None or len(metadata) != len(texts):
+                metadata = ChunkMetadataTable(len(texts))  # written before chunk metadata existed
+        elif manifest is None and not os.path.exists(os.path.join(self.persist_path, wals[0])):
+            return None
+        else:
+            index, mapped, texts = self._empty_index(), False, ChunkTextStore()
+            metadata = ChunkMetadataTable()
+        apply_search_params(index)
+        kind = index_type_of(index)
+        if kind != "flat" and kind != self.index_type:
+            print(f"⚠️ On-disk index is {kind} but the store is configured for {self.index_type}; "
+                  f"call rebuild_index() to convert")
+
+        # Crash recovery: replay everything logged since the base was written
+        delta = create_index("flat", self.dim)
+        for i, name in enumerate(wals):
+            for rec_texts, rec_vectors, rec_meta in read_records(
+                os.path.join(self.persist_path, name), repair=(i == len(wals) - 1)
+            ):
+                delta.add(rec_vectors)
+                texts.extend(rec_texts)
+                metadata.extend(rec_meta, len(rec_texts))
+        return _DiskState(index, texts, metadata, mapped, delta, base_name, list(wals), generation)
+
+    def _build_ids(self, texts: ChunkTextStore) -> Dict[bytes, int]:
+        """
+        Builds the digest → ID map from the base segment's hashes.bin and
+        hashes only the chunks added after it (or everything, if it's missing).
+        """
+        raw = b""
+        if self.persist_path is not None:
+            hash_path = os.path.join(self.persist_path, self._base_name, "hashes.bin")
+            if os.path.exists(hash_path):
+                with open(hash_path, "rb") as f:
+                    raw = f.read()
+        n_hashed = min(len(raw) // DIGEST_SIZE, len(texts))
+        digests = [raw[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE] for i in range(n_hashed)]
+        digests.extend(chunk_digest(texts[i]) for i in range(n_hashed, len(texts)))
+        ids: Dict[bytes, int] = {}
+        for i, d in enumerate(digests):
+            ids.setdefault(d, i)
+        return ids
+
+    def _digests(self, count: int) -> List[bytes]:
+        # Preserve every position (duplicates included) so hashes.bin lines up with IDs
+        by_id = [b""] * count
+        for d, i in self._id_map().items():
+            if i < count:
+                by_id[i] = d
+        return [d or chunk_digest(self.texts[i]) for i, d in enumerate(by_id)]
 
     def _load(self):
-        if self.persist_path is None:
-            return  # Skip loading for in-memory stores
         try:
-            index_path = os.path.join(self.persist_path, "index.faiss")
-            text_path = os.path.join(self.persist_path, "texts.pkl")
-            if os.path.exists(index_path) and os.path.exists(text_path):
-                self.index = faiss.read_index(index_path)
-                with open(text_path, "rb") as f:
-                    self.texts = pickle.load(f)
+            state = self._read_from_disk()
+            if state is not None:
+                self._apply_state(state)
                 print(f"✅ Loaded FAISS vector store from {self.persist_path}")
         except Exception as e:
             print(f"⚠️ Failed to load vector store: {e}")
 
 
+def _wal_name(generation: int) -> str:
+    return f"wal-{generation:06d}.log"
+
+def _read_index(path: str) -> Tuple["faiss.Index", bool]:
+    """
+    Memory-maps the index file when enabled (and supported by this FAISS build),
+    so workers share its pages instead of each reading a heap copy.
+    Returns the index and whether it is mapped (mapped indexes are read-only).
+    """
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if settings.VECTOR_STORE_MMAP and mmap_flag is not None:
+        try:
+            return faiss.read_index(path, mmap_flag), True
+        except RuntimeError as e:
+            print(f"⚠️ Could not mmap {path}, reading it into memory: {e}")
+    return faiss.read_index(path), False
+
+
+# ─── Process-wide persistent store ────────────────────────────────────────────
+# Loaded once (at FastAPI startup) and shared by every request.
+
+_persistent_store: Optional[FaissVectorStore] = None
+_persistent_store_lock = threading.Lock()
+
+def get_persistent_store() -> FaissVectorStore:
+    """
+    Returns the resident persistent store, loading it on first use.
+    """
+    global _persistent_store
+    if _persistent_store is None:
+        with _persistent_store_lock:
+            if _persistent_store is None:
+                from embedder.embed import get_embedding_dimension
+                _persistent_store = FaissVectorStore(
+                    get_embedding_dimension(),
+                    persist_path=settings.VECTOR_DB_PATH
+                )
+    return _persistent_store
+
+def loaded_persistent_store() -> Optional[FaissVectorStore]:
+    """
+    The resident persistent store if it has been loaded (never loads it).
+    """
+    return _persistent_store
+
+def reload_persistent_store() -> bool:
+    """
+    Reload hook for when the on-disk index has been rebuilt out of process.
+    """
+    return get_persistent_store().reload()
@@ -0,0 +1,101 @@
+# db/wal.py
+#
+# Append-only write-ahead log for the persistent vector store.
+#
+# Record layout (little-endian):
+#   magic b"WAL1" | payload length (u32) | CRC32 of payload (u32) | payload
+# Payload:
+#   header length (u32) | JSON header {"n", "dim", "texts"[, "meta"]} | n*dim float32 vectors
+# "meta" (optional) holds one [doc_id, page_start, page_end] per chunk.
+#
+# A record only counts once it is fully on disk with a matching CRC, so a
+# crash mid-append leaves at most a torn tail record, which replay drops.
+
+import json
+import os
+import struct
+import zlib
+from typing import Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from db.chunk_metadata import ChunkMeta
+
+MAGIC = b"WAL1"
+_FRAME = struct.Struct("<4sII")
+_U32 = struct.Struct("<I")
+
+
+def encode_record(texts: List[str], vectors: np.ndarray, metadata: Optional[Sequence[ChunkMeta]] = None) -> bytes:
+    header = {"n": len(texts), "dim": int(vectors.shape[1]), "texts": texts}
+    if metadata is not None:
+        header["meta"] = [list(m) for m in metadata]
+    header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    payload = _U32.pack(len(header)) + header + np.ascontiguousarray(vectors, dtype=np.float32).tobytes()
+    return _FRAME.pack(MAGIC, len(payload), zlib.crc32(payload)) + payload
+
+def _decode_payload(payload: bytes) -> Tuple[List[str], np.ndarray, Optional[List[ChunkMeta]]]:
+    (header_len,) = _U32.unpack_from(payload, 0)
+    header = json.loads(payload[4:4 + header_len].decode("utf-8"))
+    vectors = np.frombuffer(payload, dtype=np.float32, offset=4 + header_len)
+    metadata = [ChunkMeta(*m) for m in header["meta"]] if "meta" in header else None
+    return header["texts"], vectors.reshape(header["n"], header["dim"]), metadata
+
+def append_record(
+    path: str,
+    texts: List[str],
+    vectors: np.ndarray,
+    fsync: bool = True,
+    metadata: Optional[Sequence[ChunkMeta]] = None
+) -> int:
+    """
+    Appends one record and (optionally) fsyncs it. Returns the new file size.
+    """
+    record = encode_record(texts, vectors, metadata)
+    with open(path, "ab") as f:
+        f.write(record)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+        return f.tell()
+
+def read_records(path: str, repair: bool = True) -> Iterator[Tuple[List[str], np.ndarray, Optional[List[ChunkMeta]]]]:
+    """
+    Yields (texts, vectors, metadata or None) for every intact record. Stops at the first torn
+    or corrupt record and, with `repair`, truncates the file there so later
+    appends don't land behind garbage.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = 0
+    while pos < len(data):
+        if len(data) - pos < _FRAME.size:
+            break
+        magic, length, crc = _FRAME.unpack_from(data, pos)
+        payload = data[pos + _FRAME.size:pos + _FRAME.size + length]
+        if magic != MAGIC or len(payload) != length or zlib.crc32(payload) != crc:
+            break
+        yield _decode_payload(payload)
+        pos += _FRAME.size + length
+    if pos < len(data):
+        print(f"⚠️ Dropping {len(data) - pos} bytes of torn/corrupt WAL tail in {path}")
+        if repair:
+            with open(path, "r+b") as f:
+                f.truncate(pos)
+                f.flush()
+                os.fsync(f.fileno())
+
+def fsync_dir(path: str):
+    """
+    Makes renames/creates inside `path` durable (no-op where unsupported, e.g. Windows).
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -1,35 +1,153 @@
 # embedder/embed.py
 
-from sentence_transformers import SentenceTransformer
-from typing import List
+import threading
+from typing import Dict, List, Optional, Tuple
 from config import settings
-import torch
+from cache.embedding_cache import get_embedding_cache
+from telemetry.metrics import stage
+import numpy as np
 
-# 1) Load your local model
-_model = SentenceTransformer(settings.EMBEDDING_MODEL_PATH, device='cuda' if torch.cuda.is_available() else 'cpu')
+def _load_model() -> Tuple[object, str]:
+    """
+    The configured model and the backend actually serving it: "onnx" /
+    "onnx-int8", or "torch" when that's configured or the ONNX load fails.
+    """
+    # EMBEDDING_BACKEND=onnx means CPU inference by choice: a usable export
+    # loads without importing torch (or probing CUDA) at all
+    if settings.EMBEDDING_BACKEND == "onnx":
+        from embedder.onnx_backend import load_onnx_encoder
+        model = load_onnx_encoder()
+        if model is not None:
+            return model, model.backend
+
+    # torch / sentence_transformers only load with the PyTorch model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    return SentenceTransformer(settings.EMBEDDING_MODEL_PATH, device=device), "torch"
+
+# 1) Your local model (PyTorch, or ONNX Runtime on CPU with EMBEDDING_BACKEND=onnx),
+#    loaded on first use or by warm_up() at server startup
+_model = None
+_backend: Optional[str] = None   # what actually serves _model; tags the embedding cache
+_model_lock = threading.Lock()
+
+def _get_model():
+    global _model, _backend
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model, _backend = _load_model()
+    return _model
+
+def use_model(model, backend: Optional[str] = None):
+    """
+    Installs an already-built encoder in place of the configured model: any
+    object with SentenceTransformer's encode() and
+    get_sentence_embedding_dimension() (e.g. the deterministic stub in
+    benchmarks/bench_pipeline.py). `backend` names it for the embedding
+    cache (default: the model's `backend` attribute, else its class name),
+    so its vectors are never mixed with the real model's. use_model(None)
+    goes back to loading the configured model on next use.
+    """
+    global _model, _backend
+    with _model_lock:
+        _model = model
+        if model is None:
+            _backend = None
+        else:
+            _backend = backend or getattr(model, "backend", type(model).__name__)
+
+def is_model_loaded() -> bool:
+    return _model is not None
+
+def loaded_backend() -> str:
+    """
+    The backend serving embeddings ("torch", "onnx", "onnx-int8", or a
+    use_model name); loads the model if needed.
+    """
+    _get_model()
+    return _backend
+
+def warm_up():
+    """
+    Loads the model and runs one forward pass, so the first request doesn't
+    pay for loading or for the first call's allocations.
+    """
+    _get_model().encode(["warm-up"], convert_to_numpy=True, show_progress_bar=False)
+
+def _as_float32(vecs: np.ndarray) -> np.ndarray:
+    # encode() already returns float32; this only copies if it didn't
+    return np.ascontiguousarray(vecs, dtype=np.float32).reshape(-1, get_embedding_dimension())
+
+def _encode(texts: List[str], batch_size: int) -> np.ndarray:
+    embeddings = _get_model().encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    return _as_float32(embeddings)
+
+def embed_texts(texts: List[str], batch_size: int = 32) -> np.ndarray:
+    """
+    Embed a list of texts (e.g. document chunks), `batch_size` per forward pass.
+    Texts this model has embedded before come from the embedding cache; only
+    the misses (each distinct text once) reach the model.
+    Returns a C-contiguous (len(texts), dim) float32 array.
+    """
+    if not texts:
+        return np.empty((0, get_embedding_dimension()), dtype=np.float32)
+    with stage("embed_chunks"):
+        return _embed_cached(texts, batch_size)
+
+def _embed_cached(texts: List[str], batch_size: int) -> np.ndarray:
+    cache = get_embedding_cache(loaded_backend())
+    if cache is None:
+        return _encode(texts, batch_size)
+
+    out = np.empty((len(texts), get_embedding_dimension()), dtype=np.float32)
+    hits = cache.get_many(texts)
+    for i, vec in hits.items():
+        out[i] = vec
+    misses: Dict[str, List[int]] = {}
+    for i, text in enumerate(texts):
+        if i not in hits:
+            misses.setdefault(text, []).append(i)
+    if misses:
+        unique = list(misses)
+        vecs = _encode(unique, batch_size)
+        for text, vec in zip(unique, vecs):
+            out[misses[text]] = vec
+        cache.put_many(unique, vecs)
+    return out
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
+def embed_query(text: str) -> np.ndarray:
     """
-    Embed a list of texts (e.g. document chunks).
+    Embed a single query string. Returns a (dim,) float32 array.
     """
-    embeddings = _model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
-    return embeddings.tolist()
+    with stage("embed_queries"):
+        vec = _get_model().encode([text], convert_to_numpy=True, show_progress_bar=False)
+    return _as_float32(vec)[0]
 
-def embed_query(text: str) -> List[float]:
+def embed_queries(texts: List[str]) -> np.ndarray:
     """
-    Embed a single query string.
+    Embed all questions of a request in one padded forward pass.
+    Returns a (len(texts), dim) float32 array; row i matches embed_query(texts[i]).
     """
-    vec = _model.encode([text], convert_to_numpy=True, show_progress_bar=False)
-    return vec[0].tolist()
+    with stage("embed_queries"):
+        vecs = _get_model().encode(
+            texts,
+            batch_size=max(len(texts), 1),
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+    return _as_float32(vecs)
 
 def get_embedding_dimension() -> int:
     """
     Returns the model’s embedding dimension.
     """
-    return _model.get_sentence_embedding_dimension()
+    return _get_model().get_sentence_embedding_dimension()
 
 def get_max_input_tokens() -> int:
     """
     Returns the maximum number of tokens that the model can handle as input.
     """
-    return _model.tokenizer.model_max_length
+    return _get_model().tokenizer.model_max_length
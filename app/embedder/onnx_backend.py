@@ -0,0 +1,198 @@
+# embedder/onnx_backend.py
+#
+# ONNX Runtime backend for the local sentence-transformer (EMBEDDING_BACKEND=onnx).
+# The first load exports the model — transformer, pooling and normalization in
+# one graph — to <EMBEDDING_MODEL_PATH>/onnx/, optionally with a dynamically
+# int8-quantized copy, and checks both against the PyTorch model on a few
+# sample sentences; a file is only used once its worst-case cosine similarity
+# to the torch embeddings clears EMBEDDING_ONNX_MIN_COSINE. Later loads only
+# need onnxruntime + the tokenizer, not torch.
+#
+# Needs `onnxruntime` (and `onnx` for export / quantization); without them
+# embed.py falls back to the PyTorch model.
+
+import json
+import os
+from typing import List, Optional
+import numpy as np
+from config import settings
+from cache.embedding_cache import model_fingerprint
+
+ONNX_DIR = "onnx"
+_META = "export.json"
+_SAMPLES = [
+    "What is the waiting period for pre-existing diseases?",
+    "Room rent is capped at 1% of the sum insured per day.",
+    "Claims must be intimated within 24 hours of emergency hospitalisation.",
+    "The policy covers day care procedures listed in Annexure II, subject to the deductible and co-payment.",
+    "Grace period",
+]
+
+
+def onnx_file_name(quantize: bool) -> str:
+    return "model_int8.onnx" if quantize else "model.onnx"
+
+def _write_meta(export_dir: str, meta: dict):
+    tmp = os.path.join(export_dir, _META + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp, os.path.join(export_dir, _META))
+
+def _cosines(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+class OnnxSentenceEncoder:
+    """
+    The parts of SentenceTransformer that embed.py uses (encode,
+    get_sentence_embedding_dimension, tokenizer, max_seq_length), running an
+    exported model under ONNX Runtime on CPU.
+    """
+    def __init__(self, export_dir: str, file_name: str, threads: int = settings.EMBEDDING_ONNX_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(export_dir, _META), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        self.max_seq_length = meta["max_seq_length"]
+        self._dim = meta["dimension"]
+        self._inputs = meta["inputs"]
+        self.backend = "onnx-int8" if file_name == onnx_file_name(True) else "onnx"   # embedding cache tag
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            os.path.join(export_dir, file_name), options, providers=["CPUExecutionProvider"]
+        )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dim
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        (len(texts), dim) float32 embeddings. Like SentenceTransformer.encode,
+        texts are batched longest-first to minimise padding.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        out = np.empty((len(texts), self._dim), dtype=np.float32)
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            encoded = self.tokenizer(
+                [str(texts[i]).strip() for i in idx],
+                padding=True, truncation="longest_first",
+                max_length=self.max_seq_length, return_tensors="np",
+            )
+            feeds = {name: encoded[name].astype(np.int64) for name in self._inputs}
+            out[idx] = self.session.run(None, feeds)[0]
+        return out
+
+
+def export_onnx(model_path: str, export_dir: str, quantize: bool) -> dict:
+    """
+    Exports the sentence-transformer (plus an int8 copy if `quantize`) to
+    `export_dir`, validates every file against the torch model and writes
+    the metadata last. Returns the metadata.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(model_path, device="cpu")
+    st.eval()
+    features = st.tokenize(_SAMPLES[:2])
+    inputs = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in features]
+
+    class SentenceEmbedding(torch.nn.Module):
+        # Transformer → Pooling (→ Normalize) exactly as st.encode runs them
+        def __init__(self):
+            super().__init__()
+            self.st = st
+
+        def forward(self, *tensors):
+            return self.st(dict(zip(inputs, tensors)))["sentence_embedding"]
+
+    os.makedirs(export_dir, exist_ok=True)
+    fp32_path = os.path.join(export_dir, onnx_file_name(False))
+    with torch.no_grad():
+        torch.onnx.export(
+            SentenceEmbedding(), tuple(features[name] for name in inputs), fp32_path + ".tmp",
+            input_names=inputs, output_names=["sentence_embedding"],
+            dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in inputs}, "sentence_embedding": {0: "batch"}},
+            opset_version=17, do_constant_folding=True,
+        )
+    os.replace(fp32_path + ".tmp", fp32_path)
+    files = [onnx_file_name(False)]
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = os.path.join(export_dir, onnx_file_name(True))
+        quantize_dynamic(fp32_path, int8_path + ".tmp", weight_type=QuantType.QInt8)
+        os.replace(int8_path + ".tmp", int8_path)
+        files.append(onnx_file_name(True))
+    st.tokenizer.save_pretrained(export_dir)
+
+    meta = {
+        "source": model_fingerprint(model_path),
+        "max_seq_length": st.max_seq_length,
+        "dimension": st.get_sentence_embedding_dimension(),
+        "inputs": inputs,
+        "files": {},      # validated files only
+    }
+    _write_meta(export_dir, meta)
+
+    reference = st.encode(_SAMPLES, convert_to_numpy=True)
+    for name in files:
+        encoder = OnnxSentenceEncoder(export_dir, name)
+        meta["files"][name] = {"min_cosine": float(_cosines(encoder.encode(_SAMPLES), reference).min())}
+        print(f"📦 Exported {name}: min cosine vs torch {meta['files'][name]['min_cosine']:.5f}")
+    _write_meta(export_dir, meta)
+    return meta
+
+def load_onnx_encoder(
+    model_path: str = settings.EMBEDDING_MODEL_PATH,
+    quantize: bool = settings.EMBEDDING_ONNX_QUANTIZE,
+    threads: int = settings.EMBEDDING_ONNX_THREADS
+) -> Optional[OnnxSentenceEncoder]:
+    """
+    ONNX encoder for the local model, exporting it first if there is no
+    up-to-date export. Returns None (caller uses PyTorch) when onnxruntime is
+    missing, the export fails, or the ONNX output strays from the torch
+    output beyond EMBEDDING_ONNX_MIN_COSINE.
+    """
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print("⚠️ EMBEDDING_BACKEND=onnx but onnxruntime isn't installed; using PyTorch.")
+        return None
+
+    export_dir = os.path.join(model_path, ONNX_DIR)
+    name = onnx_file_name(quantize)
+    meta = None
+    try:
+        with open(os.path.join(export_dir, _META), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        pass
+    if meta is None or meta.get("source") != model_fingerprint(model_path) or name not in meta.get("files", {}):
+        print(f"⏳ Exporting {model_path} to ONNX{' (+ int8)' if quantize else ''}…")
+        try:
+            meta = export_onnx(model_path, export_dir, quantize)
+        except Exception as e:
+            print(f"⚠️ ONNX export failed ({e}); using PyTorch.")
+            return None
+
+    min_cosine = meta["files"][name]["min_cosine"]
+    if min_cosine < settings.EMBEDDING_ONNX_MIN_COSINE:
+        print(
+            f"⚠️ {name} differs from the torch model (min cosine {min_cosine:.4f} < "
+            f"EMBEDDING_ONNX_MIN_COSINE={settings.EMBEDDING_ONNX_MIN_COSINE}); using PyTorch."
+        )
+        return None
+    print(f"✅ Embedding with ONNX Runtime ({name}, min cosine vs torch {min_cosine:.4f})")
+    return OnnxSentenceEncoder(export_dir, name, threads)
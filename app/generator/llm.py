@@ -1,25 +1,215 @@
 # embedder/llm.py
 
 import asyncio
+import json
+import time
+from email.utils import parsedate_to_datetime
 import httpx
 from fastapi import HTTPException
-from typing import Optional
+from typing import Callable, Optional, Tuple
 from config import settings
+from telemetry.metrics import Counter, stage
 
 GEMINI_QNA_URL = (
     f"{settings.GEMINI_API_BASE_URL}"
     f"{settings.GEMINI_QNA_MODEL}:generateContent"
 )
+GEMINI_STREAM_URL = (
+    f"{settings.GEMINI_API_BASE_URL}"
+    f"{settings.GEMINI_QNA_MODEL}:streamGenerateContent?alt=sse"
+)
+
+GEMINI_CALLS = Counter("rag_gemini_calls_total", "Gemini calls by final outcome (retries included)", ("outcome",))
+GEMINI_RETRIES = Counter("rag_gemini_retries_total", "Gemini attempts retried, by HTTP status or 'network'", ("reason",))
+LLM_TOKENS = Counter("rag_llm_tokens_total", "Tokens reported in Gemini's usageMetadata", ("kind",))
+
+class RateLimiter:
+    """
+    Global gate for Gemini calls: at most `max_concurrency` in flight, at most
+    `per_minute` started per minute (token bucket; 0 → no rate cap), and a
+    shared pause after a 429 / Retry-After so all callers back off together.
+    """
+    def __init__(self, max_concurrency: int, per_minute: int = 0):
+        self._sem = asyncio.Semaphore(max(1, max_concurrency))
+        self._rate = per_minute / 60.0
+        # Allow a burst of up to one "concurrency window" of calls
+        self._capacity = float(max(1, min(per_minute, max_concurrency)))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _wait_turn(self) -> None:
+        while True:
+            now = time.monotonic()
+            wait = self._paused_until - now
+            if wait <= 0:
+                if self._rate <= 0:
+                    return
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            await asyncio.sleep(wait)
+
+    async def __aenter__(self):
+        await self._sem.acquire()
+        try:
+            await self._wait_turn()
+        except BaseException:
+            self._sem.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self._sem.release()
+
+# One pooled client for the whole app (opened/closed by main.lifespan), so
+# prompts reuse warm keep-alive / HTTP/2 connections instead of paying a
+# TCP+TLS handshake per call.
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_limiter: Optional[RateLimiter] = None
+
+def _http2_enabled() -> bool:
+    if not settings.GEMINI_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        print("⚠️ GEMINI_HTTP2 is set but `h2` is not installed; using HTTP/1.1 keep-alive.")
+        return False
+    return True
+
+def start_llm_client() -> httpx.AsyncClient:
+    """
+    Opens the shared Gemini client and limiter on the running event loop.
+    """
+    global _client, _client_loop, _limiter
+    _client = httpx.AsyncClient(
+        timeout=settings.GEMINI_TIMEOUT,
+        http2=_http2_enabled(),
+        limits=httpx.Limits(
+            max_connections=settings.GEMINI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GEMINI_MAX_CONNECTIONS,
+            keepalive_expiry=settings.GEMINI_KEEPALIVE_EXPIRY,
+        ),
+    )
+    _client_loop = asyncio.get_running_loop()
+    _limiter = RateLimiter(settings.GEMINI_MAX_CONCURRENCY, settings.GEMINI_REQUESTS_PER_MINUTE)
+    return _client
+
+async def close_llm_client() -> None:
+    global _client, _client_loop, _limiter
+    if _client is not None:
+        await _client.aclose()
+    _client = _client_loop = _limiter = None
+
+def _get_client() -> Tuple[httpx.AsyncClient, RateLimiter]:
+    # Scripts calling call_gemini_api outside the FastAPI lifespan get a client
+    # on first use; clients are bound to their event loop, so a new loop
+    # (e.g. a second asyncio.run) gets a new one.
+    if _client is None or _client_loop is not asyncio.get_running_loop():
+        start_llm_client()
+    return _client, _limiter
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    """
+    Seconds to wait from a Retry-After header (delta-seconds or HTTP date).
+    """
+    value = resp.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), settings.GEMINI_MAX_RETRY_AFTER)
 
 async def call_gemini_api(
     prompt: str,
-    timeout: Optional[float] = 120.0,
+    timeout: Optional[float] = None,
     max_retries: int = 3,
-    backoff_factor: float = 1.0
+    backoff_factor: float = 1.0,
+    json_mode: bool = False,
+    on_text: Optional[Callable[[str], None]] = None
+) -> str:
+    """
+    Sends the prompt to Gemini over the shared client, gated by the global
+    limiter. Retries on 429 / 5xx (honouring Retry-After) and network errors
+    with exponential backoff. `json_mode` asks Gemini for a JSON response.
+    With `on_text`, the answer is streamed (streamGenerateContent) and each
+    text fragment is passed to it as it arrives; once one has been passed on,
+    a failure is no longer retried (that would repeat the text).
+    Timed as the "gemini" stage (each attempt also as "gemini_call").
+    """
+    with stage("gemini"):
+        try:
+            answer = await _call_gemini(prompt, timeout, max_retries, backoff_factor, json_mode, on_text)
+        except Exception:
+            GEMINI_CALLS.inc(outcome="error")
+            raise
+    GEMINI_CALLS.inc(outcome="ok")
+    return answer
+
+def _record_usage(data: dict):
+    usage = data.get("usageMetadata") or {}
+    for kind, field in (("prompt", "promptTokenCount"), ("completion", "candidatesTokenCount")):
+        if isinstance(usage.get(field), int):
+            LLM_TOKENS.inc(usage[field], kind=kind)
+
+def _candidate_text(data: dict) -> str:
+    # Extract text safely
+    return (
+        data.get("candidates", [{}])[0]
+            .get("content", {})
+            .get("parts", [{}])[0]
+            .get("text", "")
+    )
+
+async def _stream_text(
+    client: httpx.AsyncClient,
+    payload: dict,
+    headers: dict,
+    timeout: float,
+    on_text: Callable[[str], None]
 ) -> str:
     """
-    Sends the prompt to Gemini. Retries on 5xx errors with exponential backoff.
+    One streamGenerateContent call: every server-sent event carries the next
+    fragment of the answer (and the last one the usage totals).
     """
+    parts = []
+    last = {}
+    async with client.stream("POST", GEMINI_STREAM_URL, json=payload, headers=headers, timeout=timeout) as resp:
+        if resp.is_error:
+            await resp.aread()
+            resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            last = json.loads(line[5:])
+            text = _candidate_text(last)
+            if text:
+                parts.append(text)
+                on_text(text)
+    _record_usage(last)
+    return "".join(parts)
+
+async def _call_gemini(
+    prompt: str,
+    timeout: Optional[float],
+    max_retries: int,
+    backoff_factor: float,
+    json_mode: bool,
+    on_text: Optional[Callable[[str], None]] = None
+) -> str:
     api_key = settings.GEMINI_API_KEY
     if not api_key:
         raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
@@ -29,27 +219,45 @@ async def call_gemini_api(
         "X-goog-api-key": api_key,
     }
     payload = { "contents": [{ "parts": [{"text": prompt}] }] }
+    if json_mode:
+        payload["generationConfig"] = {"responseMimeType": "application/json"}
+
+    client, limiter = _get_client()
+    if timeout is None:
+        timeout = settings.GEMINI_TIMEOUT
+
+    streamed = False   # text already passed to on_text: a retry would repeat it
+
+    def deliver(text: str):
+        nonlocal streamed
+        streamed = True
+        on_text(text)
 
     for attempt in range(1, max_retries + 1):
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                resp = await client.post(GEMINI_QNA_URL, json=payload, headers=headers)
-                resp.raise_for_status()
-                data = resp.json()
-            # Extract text safely
-            return (
-                data.get("candidates", [{}])[0]
-                    .get("content", {})
-                    .get("parts", [{}])[0]
-                    .get("text", "")
-            ).strip()
+            async with limiter:
+                with stage("gemini_call"):
+                    if on_text is not None:
+                        return (await _stream_text(client, payload, headers, timeout, deliver)).strip()
+                    resp = await client.post(GEMINI_QNA_URL, json=payload, headers=headers, timeout=timeout)
+            resp.raise_for_status()
+            data = resp.json()
+            _record_usage(data)
+            return _candidate_text(data).strip()
 
         except httpx.HTTPStatusError as e:
             status = e.response.status_code
-            # Retry on 5xx
-            if 500 <= status < 600 and attempt < max_retries:
-                delay = backoff_factor * (2 ** (attempt - 1))
-                await asyncio.sleep(delay)
+            # Retry on rate limiting and 5xx
+            if (status == 429 or 500 <= status < 600) and attempt < max_retries and not streamed:
+                GEMINI_RETRIES.inc(reason=str(status))
+                retry_after = _retry_after(e.response)
+                if status == 429 or retry_after is not None:
+                    # The server is throttling us, not just this call:
+                    # hold every caller back until it says to resume
+                    delay = retry_after if retry_after is not None else backoff_factor * (2 ** (attempt - 1))
+                    limiter.pause(delay)
+                else:
+                    await asyncio.sleep(backoff_factor * (2 ** (attempt - 1)))
                 continue
             # For client errors or final failure, raise
             raise HTTPException(
@@ -58,7 +266,8 @@ async def call_gemini_api(
             )
         except (httpx.TransportError, asyncio.TimeoutError) as e:
             # Network or timeout error: retry if attempts remain
-            if attempt < max_retries:
+            if attempt < max_retries and not streamed:
+                GEMINI_RETRIES.inc(reason="network")
                 delay = backoff_factor * (2 ** (attempt - 1))
                 await asyncio.sleep(delay)
                 continue
@@ -1,67 +1,321 @@
 # indexer/index_documents.py
+#
+# Bulk (re-)indexing of a local document library into the persistent store:
+#   parse + chunk : INDEX_PARSE_WORKERS processes, one file per task
+#   embed         : this process, INDEX_EMBED_BATCH chunks per encode call,
+#                   while the workers keep parsing the next files
+#   index         : embedded batches are appended to the store's WAL with
+#                   automatic compaction off, then one compaction at the end
+#                   builds the base segment / ANN index in a single pass
+# A manifest of per-file content hashes makes re-runs incremental: unchanged
+# files are skipped, and a file is only recorded once all of its chunks are
+# durable in the WAL, so a crashed or interrupted run resumes where it stopped
+# (chunks it had already written are deduplicated, not added twice).
+#
+#   python index_documents.py [--docs-dir DIR] [--workers 4] [--batch-size 256]
+#                             [--mode markdown|plain] [--force] [--rebuild-index]
+#                             [--tenant NAME]
+#
+# --tenant indexes into that tenant's partition (PARTITIONED_STORE, see
+# db/partitions.py) instead of the global store, with its own manifest.
+#
+# The store has no deletes: chunks of a changed or removed file's previous
+# version stay searchable until the store is rebuilt from scratch.
 
+import argparse
+import hashlib
+import json
 import os
-from typing import List
-##
-from chunker.text_chunker import chunk_text
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+from chunker.text_chunker import iter_chunks_with_pages
 from embedder.embed import embed_texts, get_embedding_dimension
-from db.vector_store import FaissVectorStore
+from db.chunk_metadata import ChunkMeta
+from db.vector_store import FaissVectorStore, chunk_digest
 from config import settings
-from parser.document_parser import parse_pdf_markdown, parse_pdf_plain
+from parser.document_parser import iter_document_pages
 
 # Use local documents directory
-DOCS_DIR = r"C:\Projects\SM _ insurance\baseline\rag_insurance\Domain Documents"
+DOCS_DIR = settings.INDEX_DOCS_DIR
 USE_MARKDOWN = True  # Toggle this if you want to switch to plain parsing
 
-def index_local_documents() -> FaissVectorStore:
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt", ".eml"}
+MANIFEST_VERSION = 1
+
+
+def _manifest_path(store_path: str = settings.VECTOR_DB_PATH) -> str:
+    if settings.INDEX_MANIFEST_PATH and store_path == settings.VECTOR_DB_PATH:
+        return settings.INDEX_MANIFEST_PATH
+    return os.path.join(store_path, "indexed_files.json")
+
+def _config_fingerprint(mode: str) -> str:
+    # Recorded hashes only mean "already indexed" for the same parser, chunker and model
+    return f"{settings.EMBEDDING_MODEL_PATH}|{settings.CHUNK_SIZE}|{settings.CHUNK_OVERLAP}|{mode}"
+
+def load_manifest(path: str, mode: str) -> Dict[str, dict]:
+    """
+    relative path → {sha256, size, mtime_ns, chunks, indexed_at} from the
+    last run, or {} if there is none or it was made with another config.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable manifest {path}: {e}")
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("config") != _config_fingerprint(mode):
+        print("⚠️ Manifest was written with another model / chunking / parse mode; re-indexing everything.")
+        return {}
+    return manifest.get("files", {})
+
+def save_manifest(path: str, mode: str, files: Dict[str, dict]):
+    # Atomic replace, so a crash mid-write leaves the previous manifest intact
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "config": _config_fingerprint(mode), "files": files}, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def discover_documents(docs_dir: str) -> List[str]:
+    """
+    Supported documents under `docs_dir` (recursively), as sorted relative paths.
+    """
+    found = []
+    for root, _, names in os.walk(docs_dir):
+        for name in names:
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                found.append(os.path.relpath(os.path.join(root, name), docs_dir))
+    return sorted(found)
+
+def parse_file(
+    path: str,
+    mode: str,
+    known_sha256: Optional[str] = None
+) -> Tuple[str, Optional[List[Tuple[str, int, int]]]]:
+    """
+    Parse-worker task: content hash and (chunk, first page, last page) of
+    one file. A file whose hash matches `known_sha256` (touched but
+    unchanged) isn't parsed; its chunks come back as None. Module-level so
+    it pickles to the pool.
+    """
+    with open(path, "rb") as f:
+        buffer = f.read()
+    sha256 = hashlib.sha256(buffer).hexdigest()
+    if sha256 == known_sha256:
+        return sha256, None
+    pages = iter_document_pages(buffer, path, "", mode)
+    return sha256, [chunk for batch in iter_chunks_with_pages(pages) for chunk in batch]
+
+
+class _Progress:
+    """
+    Per-file progress lines plus running and final throughput.
+    """
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.bytes = 0
+        self.chunks = 0
+        self.new_chunks = 0
+        self.embedded = 0
+        self.embed_seconds = 0.0
+        self.t0 = time.perf_counter()
+
+    def file_done(self, rel: str, size: int, chunks: Optional[int], new: int):
+        self.done += 1
+        self.bytes += size
+        self.chunks += chunks or 0
+        self.new_chunks += new
+        elapsed = time.perf_counter() - self.t0
+        rate = self.done / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else 0.0
+        what = "unchanged" if chunks is None else f"{chunks} chunks ({new} new)"
+        print(
+            f"[{self.done:>{len(str(self.total))}}/{self.total}] {rel} · {what}"
+            f" · {rate:.2f} files/s · {self.bytes / 2**20 / elapsed:.1f} MB/s · ETA {eta:.0f}s"
+        )
+
+    def file_failed(self, rel: str, error: Exception):
+        self.done += 1
+        self.failed += 1
+        print(f"❌ Failed to index {rel}: {error}")
+
+    def embedded_batch(self, count: int, seconds: float):
+        self.embedded += count
+        self.embed_seconds += seconds
+        print(f"🧮 Embedded + stored {count} chunks in {seconds:.1f}s ({count / seconds if seconds else 0:.0f} chunks/s)")
+
+    def summary(self, compact_seconds: float):
+        elapsed = time.perf_counter() - self.t0
+        print(
+            f"\n📊 {self.done - self.failed}/{self.total} files indexed ({self.failed} failed) in {elapsed:.1f}s"
+            f"\n   read + parse : {self.bytes / 2**20:.1f} MB, {self.done / elapsed if elapsed else 0:.2f} files/s"
+            f"\n   chunks       : {self.chunks} ({self.new_chunks} new, the rest already stored)"
+            f"\n   embed        : {self.embedded / self.embed_seconds if self.embed_seconds else 0:.0f} chunks/s"
+            f" ({self.embed_seconds:.1f}s)"
+            f"\n   index build  : {compact_seconds:.1f}s"
+        )
+
+
+def index_local_documents(
+    docs_dir: str = DOCS_DIR,
+    workers: int = settings.INDEX_PARSE_WORKERS,
+    batch_size: int = settings.INDEX_EMBED_BATCH,
+    mode: str = "markdown" if USE_MARKDOWN else "plain",
+    force: bool = False,
+    rebuild_index: bool = False,
+    store: Optional[FaissVectorStore] = None
+) -> FaissVectorStore:
     """
-    Parses and indexes all PDF documents in the local documents directory.
-    Returns a persistent vector store.
+    Parses and indexes all new or changed documents in `docs_dir` into the
+    persistent vector store (see the module comment). `force` ignores the
+    manifest; `rebuild_index` also retrains/rebuilds the ANN index over all
+    vectors. Returns the vector store.
     """
-    dim = get_embedding_dimension()
-    vector_store = FaissVectorStore(dim)
+    if store is None:
+        store = FaissVectorStore(get_embedding_dimension())
+    manifest_path = _manifest_path(store.persist_path or settings.VECTOR_DB_PATH)
+    recorded = {} if force else load_manifest(manifest_path, mode)
+    files = discover_documents(docs_dir)
+    # Entries of files that are gone are dropped (their chunks stay in the store)
+    entries = {rel: recorded[rel] for rel in files if rel in recorded}
 
-    for file in os.listdir(DOCS_DIR):
-        if not file.lower().endswith(".pdf"):
+    todo: List[Tuple[str, os.stat_result]] = []
+    for rel in files:
+        st = os.stat(os.path.join(docs_dir, rel))
+        old = entries.get(rel)
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
             continue
+        todo.append((rel, st))
+    print(f"📚 {len(files)} documents in {docs_dir}: {len(files) - len(todo)} unchanged, {len(todo)} to index")
 
-        file_path = os.path.join(DOCS_DIR, file)
-        print(f"\n📄 Indexing: {file_path}")
+    progress = _Progress(len(todo))
 
-        try:
-            # Parse
-            if USE_MARKDOWN:
-                parsed_text = parse_pdf_markdown(file_path)
-            else:
-                with open(file_path, "rb") as f:
-                    parsed_text = parse_pdf_plain(f.read())
+    # Chunks parsed but not yet embedded, and the files they complete
+    pending_texts: List[str] = []
+    pending_meta: List[ChunkMeta] = []
+    pending_digests = set()
+    pending_files: List[Tuple[str, dict]] = []
 
-            # Chunk
-            chunks = chunk_text(parsed_text)
-            print(f"🔹 Total chunks: {len(chunks)}")
+    def flush():
+        if pending_texts:
+            t0 = time.perf_counter()
+            vectors = embed_texts(pending_texts, batch_size=batch_size)
+            store.add_documents(pending_texts, vectors, auto_compact=False, metadata=pending_meta)
+            progress.embedded_batch(len(pending_texts), time.perf_counter() - t0)
+        # Only now are these files' chunks durable; record them
+        entries.update(pending_files)
+        save_manifest(manifest_path, mode, entries)
+        pending_texts.clear()
+        pending_meta.clear()
+        pending_digests.clear()
+        pending_files.clear()
 
-            # Embed
-            embeddings = embed_texts(chunks)
+    pool = ProcessPoolExecutor(max_workers=max(workers, 1))
+    queue = iter(todo)
+    in_flight: Dict[Future, Tuple[str, os.stat_result]] = {}
 
-            # Add to FAISS
-            vector_store.add_documents(chunks, embeddings)
-            print("✅ Done.\n")
+    def submit_next():
+        item = next(queue, None)
+        if item is not None:
+            rel, st = item
+            known = entries.get(rel, {}).get("sha256")
+            in_flight[pool.submit(parse_file, os.path.join(docs_dir, rel), mode, known)] = item
 
-        except Exception as e:
-            print(f"❌ Failed to index {file_path}: {e}")
+    try:
+        # Two files per worker in flight: enough to keep them busy while this
+        # process embeds, without holding the whole library's chunks in memory
+        for _ in range(max(workers, 1) * 2):
+            submit_next()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                rel, st = in_flight.pop(future)
+                submit_next()
+                try:
+                    sha256, chunks = future.result()
+                except Exception as e:
+                    progress.file_failed(rel, e)
+                    continue
 
-    return vector_store
+                new = 0
+                if chunks is not None:
+                    for i in store.missing([chunk for chunk, _, _ in chunks]):
+                        text, first_page, last_page = chunks[i]
+                        digest = chunk_digest(text)
+                        if digest not in pending_digests:
+                            pending_digests.add(digest)
+                            pending_texts.append(text)
+                            pending_meta.append(ChunkMeta(sha256, first_page, last_page))
+                            new += 1
+                    count = len(chunks)
+                else:
+                    count = entries[rel]["chunks"]
+                pending_files.append((rel, {
+                    "sha256": sha256,
+                    "size": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                    "chunks": count,
+                    "indexed_at": time.time(),
+                }))
+                progress.file_done(rel, st.st_size, len(chunks) if chunks is not None else None, new)
+                if len(pending_texts) >= batch_size:
+                    flush()
+        flush()
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrupted; files recorded so far are kept, re-run to resume.")
+        raise
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
 
-if __name__ == "__main__":
-    store = index_local_documents()
+    t0 = time.perf_counter()
+    store.compact(wait=True, rebuild=rebuild_index)
+    progress.summary(time.perf_counter() - t0)
+    print(f"✅ {len(store.texts)} chunks in {store.persist_path}")
+    return store
+
+def main():
+    ap = argparse.ArgumentParser(description="Bulk-index a local document library into the persistent vector store.")
+    ap.add_argument("--docs-dir", default=DOCS_DIR)
+    ap.add_argument("--workers", type=int, default=settings.INDEX_PARSE_WORKERS, help="parse processes")
+    ap.add_argument("--batch-size", type=int, default=settings.INDEX_EMBED_BATCH, help="chunks per encode call")
+    ap.add_argument("--mode", choices=["markdown", "plain"], default="markdown" if USE_MARKDOWN else "plain")
+    ap.add_argument("--force", action="store_true", help="ignore the manifest and re-parse every file")
+    ap.add_argument("--rebuild-index", action="store_true", help="retrain / rebuild the ANN index at the end")
+    ap.add_argument("--query", help="run a test search afterwards")
+    ap.add_argument("--tenant", help="index into this tenant's partition instead of the global store")
+    args = ap.parse_args()
 
-    # Test with a query
-    from embedder.embed import embed_query
+    store = None
+    if args.tenant:
+        from db.partitions import PartitionedVectorStore
+        partitions = PartitionedVectorStore()
+        path = partitions.path(partitions.route(args.tenant, provision=True))
+        print(f"🗂️ Tenant {args.tenant!r} → partition {path}")
+        store = FaissVectorStore(get_embedding_dimension(), persist_path=path)
 
-    query = "What is the waiting period for cataract surgery?"
-    q_vec = embed_query(query)
-    results = store.search(q_vec, top_k=3)
+    try:
+        store = index_local_documents(
+            args.docs_dir, args.workers, args.batch_size, args.mode, args.force, args.rebuild_index, store
+        )
+    except KeyboardInterrupt:
+        raise SystemExit(130)
 
-    print("\n🔍 Top Matches:")
-    for i, chunk in enumerate(results):
-        print(f"\n--- Match {i+1} ---\n{chunk[:500]}\n")
+    if args.query:
+        # Test with a query
+        from embedder.embed import embed_query
+
+        results = store.search_results(embed_query(args.query), top_k=3)[0]
+        print("\n🔍 Top Matches:")
+        for i, hit in enumerate(results):
+            pages = f", pages {hit.page_start}-{hit.page_end}" if hit.page_start is not None else ""
+            print(f"\n--- Match {i+1} (distance {hit.distance:.3f}{pages}) ---\n{hit.text[:500]}\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# lazy_import.py
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_module(name: str) -> ModuleType:
+    """
+    Returns module `name` without executing it yet: the real import happens on
+    first attribute access (importlib.util.LazyLoader). Keeps heavy native
+    libraries (faiss, ...) out of import time for modules that only need them
+    once they are actually used.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -1,23 +1,149 @@
 # main.py
 
 import os
+import json
 import time
 import uvicorn
 import asyncio
-from fastapi import FastAPI, HTTPException, Header, Depends
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Header, Depends, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, HttpUrl
-from typing import List, Optional
+from typing import AsyncIterator, List, Literal, Optional
 from config import settings
-from rag.rag_system import generate_prompts
-from generator.llm import call_gemini_api
+from rag.answering import answer_request, stream_answers
+from rag.executors import run_blocking, shutdown_executors
+from generator.llm import start_llm_client, close_llm_client
+from cache.answer_cache import get_answer_cache
+from cache.document_cache import get_document_cache
+from cache.embedding_cache import get_embedding_cache
+from parser.document_parser import DocumentTooLarge
+from db.vector_store import get_persistent_store, loaded_persistent_store, reload_persistent_store
+from db.partitions import UnknownTenant, get_partitioned_store
+from rag.warmup import get_warmup_state, skip_warm_up, warm_up
+from telemetry.metrics import Counter, Gauge, Histogram, render, request_timings, server_timing_header
 
-app = FastAPI(title="Insurance RAG QA Service")
+_STARTED_AT = time.time()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Model, FAISS index + chunk texts and parsers load once, shared by every
+    # request. In the background by default, so /live answers immediately and
+    # /ready flips to 200 when they are in place.
+    warmup_task = None
+    if settings.WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(warm_up())
+        if settings.WARMUP_BLOCKING:
+            await warmup_task
+    else:
+        skip_warm_up()
+    # One pooled Gemini client (keep-alive / HTTP/2) shared by all requests
+    start_llm_client()
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    await close_llm_client()
+    shutdown_executors()
+
+app = FastAPI(title="Insurance RAG QA Service", lifespan=lifespan)
+
+# ─── Metrics ──────────────────────────────────────────────────────────────────
+# Stage timings, Gemini calls and token counts are recorded where they happen
+# (see telemetry/metrics.py); these cover HTTP traffic and, read at scrape
+# time, the caches and the resident index.
+
+HTTP_IN_FLIGHT = Gauge("rag_http_requests_in_flight", "HTTP requests being served")
+HTTP_REQUESTS = Counter("rag_http_requests_total", "HTTP requests by route and status", ("route", "status"))
+HTTP_SECONDS = Histogram(
+    "rag_http_request_seconds",
+    "HTTP request latency by route, until the response body is fully sent (SSE streams: the whole stream)",
+    ("route",)
+)
+
+def _cache_stats() -> dict:
+    caches = {"answer": get_answer_cache().stats(), "document": get_document_cache().stats()}
+    embedding_cache = get_embedding_cache()
+    if embedding_cache is not None:
+        caches["embedding"] = embedding_cache.stats()
+    return caches
+
+def _cache_lookups() -> dict:
+    return {
+        (cache, result): stats[result]
+        for cache, stats in _cache_stats().items()
+        for result in ("hits", "similar_hits", "disk_hits", "misses") if result in stats
+    }
+
+def _resident_stores() -> dict:
+    stores = {}
+    store = loaded_persistent_store()
+    if store is not None:
+        stores["global"] = (len(store.texts), store.memory_bytes())
+    if settings.PARTITIONED_STORE:
+        for name, p in get_partitioned_store().stats()["resident"].items():
+            stores[f"partition:{name}"] = (p["chunks"], p["bytes"])
+    return stores
+
+Gauge(
+    "rag_cache_hit_ratio", "Hits / lookups per cache since startup", ("cache",),
+    collect=lambda: {(cache,): stats["hit_rate"] for cache, stats in _cache_stats().items()}
+)
+Counter("rag_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"), collect=_cache_lookups)
+Gauge(
+    "rag_index_chunks", "Chunks in each resident persistent store", ("store",),
+    collect=lambda: {(name,): chunks for name, (chunks, _) in _resident_stores().items()}
+)
+Gauge(
+    "rag_index_bytes", "Approximate memory of each resident persistent store", ("store",),
+    collect=lambda: {(name,): nbytes for name, (_, nbytes) in _resident_stores().items()}
+)
+
+def _observe_request(request: Request, status: int, t0: float):
+    HTTP_IN_FLIGHT.dec()
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    HTTP_REQUESTS.inc(route=route, status=status)
+    HTTP_SECONDS.observe(time.perf_counter() - t0, route=route)
+
+async def _observed_body(body: AsyncIterator, request: Request, status: int, t0: float) -> AsyncIterator:
+    # A request is served once its body is fully sent (or the client left):
+    # for /run/stream that is after the last event, not when headers go out
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        _observe_request(request, status, t0)
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """
+    Counts and times every request, including sending its body; with
+    SERVER_TIMING_HEADER the response carries the request's stage breakdown
+    (Server-Timing: embed_queries;dur=…). Headers go out before a streamed
+    body, so there it covers only the work done before the first event.
+    """
+    HTTP_IN_FLIGHT.inc()
+    t0 = time.perf_counter()
+    try:
+        with request_timings() as timings:
+            response = await call_next(request)
+    except BaseException:
+        _observe_request(request, 500, t0)
+        raise
+    if settings.SERVER_TIMING_HEADER:
+        response.headers["Server-Timing"] = server_timing_header({**timings, "total": time.perf_counter() - t0})
+    response.body_iterator = _observed_body(response.body_iterator, request, response.status_code, t0)
+    return response
 
 # ─── Schemas ──────────────────────────────────────────────────────────────────
 
 class QueryRequest(BaseModel):
     documents: str # ❗ change from List[HttpUrl] to List[str]
     questions: List[str]
+    tenant: Optional[str] = None  # partition to search (PARTITIONED_STORE); None → DEFAULT_TENANT; see PARTITION_TENANTS
+    scope: Literal["all", "document"] = "all"  # "document": context from `documents` only
+
+class StreamQueryRequest(QueryRequest):
+    stream_tokens: bool = False  # also send Gemini's partial text as `token` events (one call per question)
 
 class QueryResponse(BaseModel):
     answers: List[str]
@@ -46,6 +172,84 @@ def hello():
 async def health():
     return {"status": "ok", "message": "Service is running."}
 
+@app.get("/live", tags=["health"])
+async def live():
+    """
+    Liveness: the process is up and its event loop is responsive.
+    """
+    return {"status": "ok", "uptime_s": round(time.time() - _STARTED_AT, 3)}
+
+@app.get("/ready", tags=["health"])
+async def ready():
+    """
+    Readiness: 200 once warm-up has loaded the model, the vector store and the
+    parsers; 503 (with per-step progress) before that or if it failed.
+    """
+    state = get_warmup_state()
+    if not state.ready:
+        return JSONResponse(status_code=503, content=state.to_dict())
+    return state.to_dict()
+
+@app.get("/metrics", tags=["health"])
+async def metrics():
+    """
+    Prometheus metrics of this worker process: per-stage latency histograms,
+    Gemini calls / retries / tokens, cache hit ratios, index size and
+    in-flight requests.
+    """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    return PlainTextResponse(await run_blocking(render), media_type="text/plain; version=0.0.4")
+
+# ─── Vector Store Reload ──────────────────────────────────────────────────────
+@app.post(
+    "/api/v1/admin/reload-index",
+    dependencies=[Depends(verify_token)],
+    tags=["admin"]
+)
+async def reload_index():
+    """
+    Swaps in the on-disk index after it was rebuilt out of process
+    (e.g. by index_documents.py). In-flight searches finish on the old copy.
+    With PARTITIONED_STORE, every resident partition is re-read.
+    """
+    if settings.PARTITIONED_STORE:
+        reloaded = await run_blocking(get_partitioned_store().reload)
+        await run_blocking(get_answer_cache().clear)
+        return {"status": "ok", "partitions": reloaded}
+    reloaded = await run_blocking(reload_persistent_store)
+    if not reloaded:
+        raise HTTPException(status_code=404, detail="No vector store found on disk.")
+    # Cached answers were generated from the old index
+    await run_blocking(get_answer_cache().clear)
+    return {"status": "ok", "chunks": len(get_persistent_store().texts)}
+
+# ─── Partitions ───────────────────────────────────────────────────────────────
+@app.get(
+    "/api/v1/admin/partitions",
+    dependencies=[Depends(verify_token)],
+    tags=["admin"]
+)
+async def partition_stats():
+    """
+    Routing table and resident partitions (size, pins) against the memory budget.
+    """
+    if not settings.PARTITIONED_STORE:
+        raise HTTPException(status_code=404, detail="PARTITIONED_STORE is off.")
+    return await run_blocking(get_partitioned_store().stats)
+
+# ─── Answer Cache Stats ───────────────────────────────────────────────────────
+@app.get(
+    "/api/v1/admin/answer-cache",
+    dependencies=[Depends(verify_token)],
+    tags=["admin"]
+)
+async def answer_cache_stats():
+    """
+    Hit / near-duplicate hit / miss / eviction counters of the answer cache.
+    """
+    return get_answer_cache().stats()
+
 # ─── RAG Endpoint with Retry Logic ────────────────────────────────────────────
 @app.post(
     "/api/v1/hackrx/run",
@@ -54,40 +258,27 @@ async def health():
     tags=["query"]
 )
 async def run_hackrx(req: QueryRequest):
-    # Validate input
-    if not req.questions:
-        raise HTTPException(status_code=400, detail="`questions` must be a non-empty list.")
-    
-    docs = req.documents if req.documents else ""
+    docs = _validate(req)
     attempts = 0
 
     while attempts < settings.MAX_RETRIES:
         try:
-            # 1) Generate prompts (this will also index any new docs)
-            prompts = generate_prompts(docs, req.questions)
-
-            # 2) Call your LLM here for each prompt.
-            #    Replace the placeholder below with a real API call to Gemini/GPT.
-            answers: List[str] = []
-            # for prompt in prompts:
-            #     # e.g. answer = await call_gemini_api(prompt)
-            #     answers.append(prompt)  # placeholder
-            # #print("Generated answers:", answers)
-            # return QueryResponse(answers=answers)
-            # Fire off all Gemini calls in parallel
-            # (adjust concurrency if needed to avoid rate limits)
-            tasks = [call_gemini_api(prompt) for prompt in prompts]
-            try:
-                answers = await asyncio.gather(*tasks)
-            except Exception as e:
-                # handle errors in one or more calls
-                raise HTTPException(status_code=500, detail=f"LLM error: {e}")
+            # 1) Ingest the document (if new) and answer: cached answers are
+            #    reused, the rest are retrieved and packed into Gemini calls.
+            #    Download is async, parse/embed/search run in bounded pools and
+            #    the shared limiter in generator.llm caps calls in flight.
+            answers: List[str] = await answer_request(docs, req.questions, req.tenant, req.scope)
 
             # Clean up numbering if any
-            answers = [ans.lstrip("0123456789. ").strip() for ans in answers]
+            answers = [_clean_answer(ans) for ans in answers]
 
             return QueryResponse(answers=answers)
 
+        except DocumentTooLarge as e:
+            # Retrying won't make it smaller
+            raise HTTPException(status_code=413, detail=str(e))
+        except UnknownTenant as e:
+            raise HTTPException(status_code=403, detail=str(e))
         except Exception as e:
             attempts += 1
             is_retryable = attempts < settings.MAX_RETRIES
@@ -95,7 +286,89 @@ async def run_hackrx(req: QueryRequest):
                 raise HTTPException(status_code=500, detail=str(e))
             
             delay = settings.INITIAL_RETRY_DELAY_MS * (2 ** (attempts - 1)) / 1000.0
-            time.sleep(delay)
+            await asyncio.sleep(delay)
+
+def _validate(req: QueryRequest) -> str:
+    if not req.questions:
+        raise HTTPException(status_code=400, detail="`questions` must be a non-empty list.")
+
+    docs = req.documents if req.documents else ""
+    if req.scope == "document" and not docs:
+        raise HTTPException(status_code=400, detail="`scope` \"document\" needs `documents`.")
+    if settings.PARTITIONED_STORE:
+        # `tenant` is client-supplied: refuse ones without a partition up front
+        try:
+            get_partitioned_store().route(req.tenant)
+        except UnknownTenant as e:
+            raise HTTPException(status_code=403, detail=str(e))
+    return docs
+
+def _clean_answer(answer: str) -> str:
+    return answer.lstrip("0123456789. ").strip()
+
+# ─── Streaming RAG Endpoint (Server-Sent Events) ──────────────────────────────
+@app.post(
+    "/api/v1/hackrx/run/stream",
+    dependencies=[Depends(verify_token)],
+    response_class=StreamingResponse,
+    tags=["query"]
+)
+async def run_hackrx_stream(req: StreamQueryRequest):
+    """
+    Same request as /hackrx/run, answered as a text/event-stream:
+    - `answer` {"index", "answer"} for each question as soon as it is answered
+      (completion order, cached answers first; index is into `questions`)
+    - `token` {"index", "text"} fragments of Gemini's output with `stream_tokens`
+    - `done` {"answers": n} at the end, or `error` {"status", "detail"}
+    The whole request is retried like /hackrx/run only until the first event
+    has been sent.
+    """
+    docs = _validate(req)
+    return StreamingResponse(
+        _answer_events(docs, req),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _answer_events(docs: str, req: StreamQueryRequest) -> AsyncIterator[str]:
+    attempts = 0
+    sent = 0
+    while True:
+        try:
+            async for event in stream_answers(
+                docs, req.questions, req.tenant, req.scope,
+                tokens=req.stream_tokens, idle_seconds=settings.STREAM_PING_SECONDS
+            ):
+                if event is None:
+                    yield ": ping\n\n"
+                    continue
+                kind, data = event
+                if kind == "answer":
+                    data = {**data, "answer": _clean_answer(data["answer"])}
+                sent += 1
+                yield _sse(kind, data)
+            yield _sse("done", {"answers": len(req.questions)})
+            return
+
+        except DocumentTooLarge as e:
+            yield _sse("error", {"status": 413, "detail": str(e)})
+            return
+        except UnknownTenant as e:
+            yield _sse("error", {"status": 403, "detail": str(e)})
+            return
+        except Exception as e:
+            attempts += 1
+            if sent or attempts >= settings.MAX_RETRIES:
+                status = e.status_code if isinstance(e, HTTPException) else 500
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                yield _sse("error", {"status": status, "detail": detail})
+                return
+
+            delay = settings.INITIAL_RETRY_DELAY_MS * (2 ** (attempts - 1)) / 1000.0
+            await asyncio.sleep(delay)
 
 # ─── Entry Point ──────────────────────────────────────────────────────────────
 if __name__ == "__main__":
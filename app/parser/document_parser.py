@@ -1,35 +1,113 @@
 # parser/document_parser.py
 
+import httpx
 import requests
-import tempfile
 import os
 import io
-from typing import Literal
-import pdfplumber
-import pymupdf4llm
-from docx import Document as DocxDocument
+from collections import deque
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Dict, Iterator, List, Literal, Optional, Tuple
+from urllib.parse import urlparse
+from config import settings
+
+# pdfplumber, pymupdf, pymupdf4llm and python-docx are imported by the
+# functions that use them, so importing this module stays cheap
+if TYPE_CHECKING:
+    import pymupdf
+
+class DocumentTooLarge(ValueError):
+    """
+    The document exceeds MAX_DOCUMENT_MB (declared or while downloading).
+    """
 
 def parse_pdf_plain(buffer: bytes) -> str:
     """
     Extracts raw text from PDF using pdfplumber.
     """
+    import pdfplumber
+
     text_parts = []
     with pdfplumber.open(io.BytesIO(buffer)) as pdf:
         for page in pdf.pages:
             text_parts.append(page.extract_text() or "")
     return "\n\n".join(text_parts)
 
-def parse_pdf_markdown(path: str) -> str:
+def parse_pdf_markdown(path) -> str:
     """
     Converts PDF to Markdown via pymupdf4llm.
-    Expects a file path, so we write buffer to a temp file.
+    Accepts a file path or an already opened pymupdf.Document.
     """
+    import pymupdf4llm
+
     return pymupdf4llm.to_markdown(path, write_images=False)
 
+def _open_pdf(buffer: bytes) -> "pymupdf.Document":
+    import pymupdf
+
+    # Straight from memory; no temp file
+    doc = pymupdf.open(stream=buffer, filetype="pdf")
+    # to_markdown bakes forms/annotations before scanning; do it up front so
+    # the header scan below sees the same page content
+    if doc.is_form_pdf or (doc.is_pdf and doc.has_annots()):
+        doc.bake()
+    return doc
+
+def pdf_layout(buffer: bytes, mode: Literal["plain","markdown"] = "markdown"):
+    """
+    Page count and, for markdown, the font-size → header-level map that
+    to_markdown would build by scanning the whole document. Computing it once
+    and passing it to every page keeps page-wise output identical.
+    """
+    import pdfplumber
+    import pymupdf4llm
+
+    if mode != "markdown":
+        with pdfplumber.open(io.BytesIO(buffer)) as pdf:
+            return len(pdf.pages), None
+    with _open_pdf(buffer) as doc:
+        return doc.page_count, pymupdf4llm.IdentifyHeaders(doc)
+
+def _markdown_pages(doc: "pymupdf.Document", start: int, stop: int, hdr_info) -> List[str]:
+    import pymupdf4llm
+
+    return [
+        pymupdf4llm.to_markdown(doc, pages=[pno], hdr_info=hdr_info, write_images=False)
+        for pno in range(start, stop)
+    ]
+
+def _plain_pages(pdf, start: int, stop: int) -> List[str]:
+    # parse_pdf_plain joins pages with "\n\n"; carry it on every page but the first
+    return [
+        ("\n\n" if pno else "") + (pdf.pages[pno].extract_text() or "")
+        for pno in range(start, stop)
+    ]
+
+def parse_pdf_pages(
+    buffer: bytes,
+    start: int,
+    stop: int,
+    mode: Literal["plain","markdown"] = "markdown",
+    hdr_info=None
+) -> List[str]:
+    """
+    Text of pages [start, stop), one string per page. Concatenating all pages
+    gives exactly what parse_pdf_markdown / parse_pdf_plain return.
+    Module-level (picklable) so page windows can be parsed in a process pool.
+    """
+    import pdfplumber
+
+    if mode == "markdown":
+        with _open_pdf(buffer) as doc:
+            return _markdown_pages(doc, start, stop, hdr_info)
+    with pdfplumber.open(io.BytesIO(buffer)) as pdf:
+        return _plain_pages(pdf, start, stop)
+
 def parse_docx(buffer: bytes) -> str:
     """
     Extract raw text from a DOCX buffer using python-docx.
     """
+    from docx import Document as DocxDocument
+
     doc = DocxDocument(io.BytesIO(buffer))
     paragraphs = [p.text for p in doc.paragraphs]
     return "\n\n".join(paragraphs)
@@ -40,55 +118,217 @@ def parse_plain_text(buffer: bytes) -> str:
     """
     return buffer.decode('utf-8', errors='ignore')
 
-def get_document_text(
+def _lower_keys(headers) -> Dict[str, str]:
+    # Header lookups below use lower-case names (content-type, etag, ...)
+    return {k.lower(): v for k, v in headers.items()}
+
+def _check_size(size: int, max_bytes: int):
+    if max_bytes and size > max_bytes:
+        raise DocumentTooLarge(
+            f"Document exceeds the {max_bytes // (1024 * 1024)} MB limit (MAX_DOCUMENT_MB)."
+        )
+
+def fetch_document(
     document_url: str,
-    mode: Literal["plain","markdown"] = "markdown"
-) -> str:
+    max_bytes: int = settings.MAX_DOCUMENT_MB * 1024 * 1024
+) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Downloads the document at `document_url`, streaming it in blocks and
+    giving up as soon as it passes `max_bytes` (0 → no limit).
+    Returns the raw bytes and the response headers (lower-cased names).
     """
-    Downloads the document at `document_url`, infers its type
-    (PDF, DOCX, TXT/EML) and returns its extracted text.
+    with requests.get(document_url, stream=True, timeout=30) as resp:
+        resp.raise_for_status()
+        headers = _lower_keys(resp.headers)
+        _check_size(int(headers.get("content-length") or 0), max_bytes)
+        blocks, size = [], 0
+        for block in resp.iter_content(chunk_size=1 << 16):
+            size += len(block)
+            _check_size(size, max_bytes)
+            blocks.append(block)
+    return b"".join(blocks), headers
 
-    - For PDFs:
-      - mode="plain": uses pdfplumber
-      - mode="markdown": uses pymupdf4llm.to_markdown
+def head_document(document_url: str) -> Dict[str, str]:
+    """
+    Issues a HEAD request and returns the response headers, or an empty dict
+    if the server doesn't support HEAD. Used to revalidate cached documents.
+    """
+    try:
+        resp = requests.head(document_url, allow_redirects=True, timeout=10)
+        resp.raise_for_status()
+    except requests.RequestException:
+        return {}
+    return _lower_keys(resp.headers)
 
-    - For DOCX: uses python-docx
-    - For TXT or EML: decodes UTF-8
+async def fetch_document_async(
+    document_url: str,
+    max_bytes: int = settings.MAX_DOCUMENT_MB * 1024 * 1024
+) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Async `fetch_document` for the API path (doesn't block the event loop).
+    """
+    async with httpx.AsyncClient(timeout=30, follow_redirects=True) as client:
+        async with client.stream("GET", document_url) as resp:
+            resp.raise_for_status()
+            headers = _lower_keys(resp.headers)
+            _check_size(int(headers.get("content-length") or 0), max_bytes)
+            blocks, size = [], 0
+            async for block in resp.aiter_bytes(1 << 16):
+                size += len(block)
+                _check_size(size, max_bytes)
+                blocks.append(block)
+    return b"".join(blocks), headers
+
+async def head_document_async(document_url: str) -> Dict[str, str]:
+    """
+    Async `head_document`.
     """
-    # 1) Download
-    resp = requests.get(document_url, stream=True, timeout=30)
-    resp.raise_for_status()
-    buffer = resp.content
+    try:
+        async with httpx.AsyncClient(timeout=10, follow_redirects=True) as client:
+            resp = await client.head(document_url)
+            resp.raise_for_status()
+    except httpx.HTTPError:
+        return {}
+    return _lower_keys(resp.headers)
 
-    # 2) Determine type
-    content_type = resp.headers.get("content-type", "")
-    ext = os.path.splitext(document_url)[1].lower().lstrip(".")
+def _document_kind(document_url: str, content_type: str = "") -> str:
+    ext = os.path.splitext(urlparse(document_url).path)[1].lower().lstrip(".")
 
-    # 3) Dispatch parser
     if 'pdf' in content_type or "application/pdf" in content_type or ext == "pdf":
-        if mode == "markdown":
-            # write to temp file for pypdf4llm
-            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tf:
-                tf.write(buffer)
-                tf_path = tf.name
-            try:
-                return parse_pdf_markdown(tf_path)
-            finally:
-                os.remove(tf_path)
-        else:
-            return parse_pdf_plain(buffer)
-
+        return "pdf"
     elif (
         "application/vnd.openxmlformats-officedocument.wordprocessingml.document" in content_type
         or ext == "docx"
     ):
-        return parse_docx(buffer)
-
+        return "docx"
     elif (
         "text/plain" in content_type
         or ext in {"txt", "eml"}
     ):
-        return parse_plain_text(buffer)
-
+        return "text"
     else:
         raise ValueError(f"Unsupported document type: {content_type or ext}")
+
+def parse_document(
+    buffer: bytes,
+    document_url: str,
+    content_type: str = "",
+    mode: Literal["plain","markdown"] = "markdown",
+    executor: Optional[Executor] = None
+) -> str:
+    """
+    Infers the type of an already-downloaded document (PDF, DOCX, TXT/EML)
+    from its content-type / URL extension and returns its extracted text.
+
+    - For PDFs:
+      - mode="plain": uses pdfplumber
+      - mode="markdown": uses pymupdf4llm.to_markdown
+
+    - For DOCX: uses python-docx
+    - For TXT or EML: decodes UTF-8
+
+    With an `executor` (a process pool), PDF page ranges are converted in
+    parallel; the output is byte-identical to the serial path.
+    """
+    kind = _document_kind(document_url, content_type)
+
+    if kind == "pdf":
+        if executor is not None:
+            return parse_pdf_parallel(buffer, executor, mode)
+        if mode == "markdown":
+            with _open_pdf(buffer) as doc:
+                return parse_pdf_markdown(doc)
+        return parse_pdf_plain(buffer)
+    elif kind == "docx":
+        return parse_docx(buffer)
+    return parse_plain_text(buffer)
+
+def iter_document_pages(
+    buffer: bytes,
+    document_url: str,
+    content_type: str = "",
+    mode: Literal["plain","markdown"] = "markdown",
+    executor: Optional[Executor] = None,
+    window: int = settings.PARSE_PAGE_WINDOW,
+    max_in_flight: int = max(settings.PARSE_POOL_WORKERS, 1) + 1
+) -> Iterator[str]:
+    """
+    Incremental `parse_document`: yields a PDF's text page by page (other
+    types in one piece), so chunking/embedding can start on the first pages
+    while later ones are still being parsed. "".join(pages) equals
+    parse_document(...).
+
+    With an `executor` (the parse process pool), PDFs are parsed there in
+    windows of `window` pages, up to `max_in_flight` windows at once (one per
+    worker plus one queued), and yielded back in page order.
+    """
+    if _document_kind(document_url, content_type) != "pdf":
+        yield parse_document(buffer, document_url, content_type, mode)
+        return
+
+    if executor is None:
+        import pdfplumber
+        import pymupdf4llm
+
+        if mode == "markdown":
+            with _open_pdf(buffer) as doc:
+                hdr_info = pymupdf4llm.IdentifyHeaders(doc)
+                for pno in range(doc.page_count):
+                    yield from _markdown_pages(doc, pno, pno + 1, hdr_info)
+        else:
+            with pdfplumber.open(io.BytesIO(buffer)) as pdf:
+                for pno in range(len(pdf.pages)):
+                    yield from _plain_pages(pdf, pno, pno + 1)
+        return
+
+    page_count, hdr_info = executor.submit(pdf_layout, buffer, mode).result()
+    starts = iter(range(0, page_count, window))
+    in_flight = deque()
+
+    def submit_next():
+        start = next(starts, None)
+        if start is not None:
+            stop = min(start + window, page_count)
+            in_flight.append(executor.submit(parse_pdf_pages, buffer, start, stop, mode, hdr_info))
+
+    try:
+        for _ in range(max_in_flight):
+            submit_next()
+        while in_flight:
+            pages = in_flight.popleft().result()
+            submit_next()
+            yield from pages
+    finally:
+        # Consumer stopped early (error / cancelled request)
+        for future in in_flight:
+            future.cancel()
+
+def parse_pdf_parallel(
+    buffer: bytes,
+    executor: Executor,
+    mode: Literal["plain","markdown"] = "markdown",
+    window: int = settings.PARSE_PAGE_WINDOW,
+    max_in_flight: int = max(settings.PARSE_POOL_WORKERS, 1) + 1
+) -> str:
+    """
+    Whole-document PDF text, with page ranges converted in parallel across
+    `executor`. pymupdf4llm converts every page on its own (only the header
+    map is document-wide, and it is computed once up front), so joining the
+    ranges in order gives exactly the serial output, including headings and
+    tables at page boundaries.
+    """
+    return "".join(iter_document_pages(
+        buffer, "document.pdf", "application/pdf", mode, executor, window, max_in_flight
+    ))
+
+def get_document_text(
+    document_url: str,
+    mode: Literal["plain","markdown"] = "markdown"
+) -> str:
+    """
+    Downloads the document at `document_url` and returns its extracted text.
+    See `parse_document` for how the type and parser are chosen.
+    """
+    buffer, headers = fetch_document(document_url)
+    content_type = headers.get("content-type", "")
+    return parse_document(buffer, document_url, content_type, mode)
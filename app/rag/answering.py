@@ -0,0 +1,258 @@
+# rag/answering.py
+#
+# Answer generation for a request:
+# - repeated (document, question) pairs are served from the answer cache,
+#   exactly or via a near-duplicate question
+# - the rest are packed into as few Gemini calls as fit under
+#   MAX_LLM_INPUT_TOKENS (see rag_system.pack_questions); any answer missing
+#   from a packed response is re-asked with its own prompt
+# - stream_answers() hands out each answer as soon as it is ready (and, if
+#   asked, Gemini's partial text) for the streaming endpoint
+
+import asyncio
+import json
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from config import settings
+from cache.answer_cache import document_fingerprint, get_answer_cache, store_fingerprint
+from db.vector_store import FaissVectorStore
+from embedder.embed import embed_queries
+from generator.llm import call_gemini_api
+from rag.executors import run_blocking
+from telemetry.metrics import stage
+from rag.rag_system import (
+    PromptBatch, build_prompt, ingest_async, pack_questions, request_store, retrieve_async
+)
+
+# on_answer(question index, answer) / on_token(question index, text fragment)
+AnswerCallback = Callable[[int, str], None]
+
+
+def parse_batch_answers(text: str, count: int) -> Dict[int, str]:
+    """
+    Maps 0-based question positions to answers from a packed response.
+    Accepts {"answers": {"1": ...}}, a bare {"1": ...} or a JSON list, with or
+    without a ``` fence; unparseable or missing entries are simply left out.
+    """
+    body = text.strip()
+    if body.startswith("```"):
+        body = body.strip("`").strip()
+        if body[:4].lower() == "json":
+            body = body[4:]
+    try:
+        data = json.loads(body)
+    except ValueError:
+        # Tolerate prose around the object
+        start, end = body.find("{"), body.rfind("}")
+        if start < 0 or end <= start:
+            return {}
+        try:
+            data = json.loads(body[start:end + 1])
+        except ValueError:
+            return {}
+
+    if isinstance(data, dict) and "answers" in data:
+        data = data["answers"]
+    if isinstance(data, list):
+        items = enumerate(data, 1)
+    elif isinstance(data, dict):
+        items = data.items()
+    else:
+        return {}
+
+    answers = {}
+    for key, value in items:
+        try:
+            number = int(key)
+        except (TypeError, ValueError):
+            continue
+        if 1 <= number <= count and isinstance(value, str) and value.strip():
+            answers[number - 1] = value.strip()
+    return answers
+
+def _notify(on_answer: Optional[AnswerCallback], answers: Dict[int, str]) -> Dict[int, str]:
+    if on_answer is not None:
+        for i, answer in answers.items():
+            on_answer(i, answer)
+    return answers
+
+async def _answer_one(
+    i: int,
+    prompt: str,
+    on_answer: Optional[AnswerCallback] = None,
+    on_token: Optional[AnswerCallback] = None
+) -> str:
+    on_text = (lambda text: on_token(i, text)) if on_token is not None else None
+    answer = await call_gemini_api(prompt, on_text=on_text)
+    _notify(on_answer, {i: answer})
+    return answer
+
+async def _answer_batch(
+    batch: PromptBatch,
+    questions: List[str],
+    retrieved: List[Tuple[List[str], List[str]]],
+    on_answer: Optional[AnswerCallback] = None
+) -> Dict[int, str]:
+    if len(batch.question_indices) == 1:
+        (i,) = batch.question_indices
+        return {i: await _answer_one(i, batch.prompt, on_answer)}
+
+    parsed = parse_batch_answers(
+        await call_gemini_api(batch.prompt, json_mode=True), len(batch.question_indices)
+    )
+    answers = _notify(on_answer, {batch.question_indices[pos]: ans for pos, ans in parsed.items()})
+
+    missing = [i for i in batch.question_indices if i not in answers]
+    if missing:
+        print(f"⚠️ Packed answer incomplete ({len(missing)}/{len(batch.question_indices)} missing); asking those one by one.")
+        fallback = await asyncio.gather(*(
+            _answer_one(i, build_prompt(questions[i], *retrieved[i]), on_answer) for i in missing
+        ))
+        answers.update(zip(missing, fallback))
+    return answers
+
+async def answer_questions(
+    questions: List[str],
+    retrieved: List[Tuple[List[str], List[str]]],
+    on_answer: Optional[AnswerCallback] = None
+) -> List[str]:
+    """
+    Answers every question with as few Gemini calls as the token budget allows.
+    `on_answer` is called for each answer as soon as its call returns.
+    """
+    with stage("prompt_build"):
+        batches = pack_questions(questions, retrieved)
+    answers: Dict[int, str] = {}
+    for part in await asyncio.gather(*(_answer_batch(b, questions, retrieved, on_answer) for b in batches)):
+        answers.update(part)
+    return [answers[i] for i in range(len(questions))]
+
+async def _generate(
+    questions: List[str],
+    retrieved: List[Tuple[List[str], List[str]]],
+    on_answer: Optional[AnswerCallback] = None,
+    on_token: Optional[AnswerCallback] = None
+) -> List[str]:
+    # Partial text of a packed JSON answer isn't any one question's, so
+    # token streaming always asks one question per call
+    if settings.LLM_BATCH_QUESTIONS and on_token is None:
+        return await answer_questions(questions, retrieved, on_answer)
+    # One prompt per question, all fired in parallel
+    with stage("prompt_build"):
+        prompts = [build_prompt(q, *r) for q, r in zip(questions, retrieved)]
+    return list(await asyncio.gather(*(
+        _answer_one(i, prompt, on_answer, on_token) for i, prompt in enumerate(prompts)
+    )))
+
+async def answer_request(
+    document_url: Optional[str],
+    questions: List[str],
+    tenant: Optional[str] = None,
+    scope: str = "all",
+    on_answer: Optional[AnswerCallback] = None,
+    on_token: Optional[AnswerCallback] = None
+) -> List[str]:
+    """
+    Answers for one /hackrx/run request. Cached answers skip retrieval and
+    Gemini; only the questions that miss are embedded once, searched and sent.
+    `tenant` picks the partition searched when PARTITIONED_STORE is on;
+    scope="document" answers from the request's document alone.
+    `on_answer` / `on_token` (see stream_answers) are called with the
+    question's index as each answer / streamed text fragment arrives.
+    """
+    async with request_store(tenant) as (persistent_store, partition):
+        return await _answer(persistent_store, partition, document_url, questions, scope, on_answer, on_token)
+
+async def _answer(
+    persistent_store: FaissVectorStore,
+    partition: Optional[str],
+    document_url: Optional[str],
+    questions: List[str],
+    scope: str,
+    on_answer: Optional[AnswerCallback] = None,
+    on_token: Optional[AnswerCallback] = None
+) -> List[str]:
+    persistent_store, doc = await ingest_async(document_url, persistent_store)
+    if not settings.ANSWER_CACHE_ENABLED:
+        retrieved = await retrieve_async(persistent_store, doc, questions, scope=scope)
+        return await _generate(questions, retrieved, on_answer, on_token)
+
+    cache = get_answer_cache()
+    # Answers only carry over between requests that saw the same context
+    namespace = "|".join(filter(None, [
+        f"partition:{partition}" if partition else "",
+        f"scope:{scope}" if scope != "all" else "",
+    ]))
+    fingerprint = (
+        document_fingerprint(doc.sha256, namespace) if doc
+        else store_fingerprint(len(persistent_store.texts), namespace)
+    )
+
+    answers: List[Optional[str]] = await run_blocking(lambda: [cache.get(fingerprint, q) for q in questions])
+    _notify(on_answer, {i: answer for i, answer in enumerate(answers) if answer is not None})
+    missing = [i for i, answer in enumerate(answers) if answer is None]
+    if not missing:
+        return answers
+
+    # Near-duplicates of cached questions; the embeddings are reused for retrieval
+    query_vecs = await run_blocking(embed_queries, [questions[i] for i in missing])
+    similar = await run_blocking(lambda: [cache.get_similar(fingerprint, v) for v in query_vecs])
+    todo = [k for k, answer in enumerate(similar) if answer is None]
+    for k, answer in enumerate(similar):
+        if answer is not None:
+            answers[missing[k]] = answer
+            _notify(on_answer, {missing[k]: answer})
+
+    if todo:
+        todo_questions = [questions[missing[k]] for k in todo]
+        todo_vecs = query_vecs[todo]
+        retrieved = await retrieve_async(persistent_store, doc, todo_questions, todo_vecs, scope)
+        # Callbacks get indices into the request's questions, not into todo
+        generated = await _generate(
+            todo_questions, retrieved,
+            (lambda j, answer: on_answer(missing[todo[j]], answer)) if on_answer is not None else None,
+            (lambda j, text: on_token(missing[todo[j]], text)) if on_token is not None else None,
+        )
+        await run_blocking(lambda: [
+            cache.put(fingerprint, q, answer, v) for q, answer, v in zip(todo_questions, generated, todo_vecs)
+        ])
+        for k, answer in zip(todo, generated):
+            answers[missing[k]] = answer
+    return answers
+
+async def stream_answers(
+    document_url: Optional[str],
+    questions: List[str],
+    tenant: Optional[str] = None,
+    scope: str = "all",
+    tokens: bool = False,
+    idle_seconds: float = 0.0
+) -> AsyncIterator[Optional[Tuple[str, dict]]]:
+    """
+    answer_request as a stream of events, in the order they happen:
+    ("answer", {"index", "answer"}) for every question as soon as it is
+    answered (cached ones first) and, with `tokens`, ("token", {"index",
+    "text"}) for each fragment of Gemini's output (one call per question).
+    Yields None after `idle_seconds` without an event (0 → never), so the
+    caller can keep its connection alive. A failure is raised after the
+    events that came before it; closing the stream early cancels the work.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.ensure_future(answer_request(
+        document_url, questions, tenant, scope,
+        on_answer=lambda i, answer: queue.put_nowait(("answer", {"index": i, "answer": answer})),
+        on_token=(lambda i, text: queue.put_nowait(("token", {"index": i, "text": text}))) if tokens else None,
+    ))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), idle_seconds or None)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if event is None:
+                break
+            yield event
+        await task   # re-raises a failure
+    finally:
+        task.cancel()
@@ -0,0 +1,89 @@
+# rag/executors.py
+#
+# Bounded pools for the blocking stages of the request pipeline, so the
+# FastAPI event loop only ever awaits them.
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from config import settings
+
+_blocking_pool: Optional[ThreadPoolExecutor] = None
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_store_writer: Optional[ThreadPoolExecutor] = None
+
+
+def _get_blocking_pool() -> ThreadPoolExecutor:
+    global _blocking_pool
+    if _blocking_pool is None:
+        _blocking_pool = ThreadPoolExecutor(
+            max_workers=settings.BLOCKING_POOL_WORKERS,
+            thread_name_prefix="rag-blocking"
+        )
+    return _blocking_pool
+
+def _get_parse_pool() -> Executor:
+    global _parse_pool
+    if settings.PARSE_POOL_WORKERS <= 0:
+        return _get_blocking_pool()
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=settings.PARSE_POOL_WORKERS)
+    return _parse_pool
+
+def get_page_parse_pool() -> Optional[Executor]:
+    """
+    The process pool for page-window PDF parsing, or None when
+    PARSE_POOL_WORKERS is 0: pages are then parsed inline by the consumer
+    (waiting on the thread pool from one of its own threads could deadlock).
+    """
+    if settings.PARSE_POOL_WORKERS <= 0:
+        return None
+    return _get_parse_pool()
+
+async def run_blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Runs I/O- or GIL-releasing work (embedding, FAISS, cache files) in the
+    bounded thread pool, in a copy of the caller's context (like
+    asyncio.to_thread) so per-request state such as stage timings carries over.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_get_blocking_pool(), functools.partial(ctx.run, fn, *args, **kwargs))
+
+async def run_store_write(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Runs a vector store mutation on the single store-writer thread. Writes
+    are applied one at a time in arrival order, and a burst of concurrent
+    ingests queues here instead of parking blocking-pool threads on the
+    store's write mutex.
+    """
+    global _store_writer
+    if _store_writer is None:
+        _store_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-store-writer")
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_store_writer, functools.partial(ctx.run, fn, *args, **kwargs))
+
+async def run_cpu_bound(fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Runs pure-Python CPU work (document parsing) in the process pool, so it
+    doesn't hold the GIL of the serving process. `fn` and its arguments must
+    be picklable (module-level functions, bytes, str).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_parse_pool(), fn, *args)
+
+def shutdown_executors():
+    global _blocking_pool, _parse_pool, _store_writer
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+    if _blocking_pool is not None:
+        _blocking_pool.shutdown(wait=False, cancel_futures=True)
+        _blocking_pool = None
+    if _store_writer is not None:
+        # Let queued writes reach the WAL rather than dropping them
+        _store_writer.shutdown(wait=True)
+        _store_writer = None
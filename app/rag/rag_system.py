@@ -1,89 +1,314 @@
-from typing import List, Optional
+import hashlib
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Tuple
+import numpy as np
 from config import settings
-from embedder.embed import embed_query, embed_texts, get_embedding_dimension
-from db.vector_store import FaissVectorStore
-from parser.document_parser import get_document_text
-from chunker.text_chunker import chunk_text
+from embedder.embed import embed_queries, embed_texts, get_embedding_dimension
+from db.chunk_metadata import ChunkMeta
+from db.vector_store import FaissVectorStore, SearchResult, get_persistent_store
+from db.partitions import get_partitioned_store
+from parser.document_parser import (
+    fetch_document, fetch_document_async, head_document, head_document_async, iter_document_pages
+)
+from cache.document_cache import CachedDocument, UrlEntry, get_document_cache
+from cache.answer_cache import document_fingerprint, get_answer_cache
+from chunker.text_chunker import iter_chunks_with_pages
+from rag.executors import get_page_parse_pool, run_blocking, run_store_write
+from rag.single_flight import SingleFlight
+from telemetry.metrics import Stopwatch, record_stage, stage
 
-def generate_prompts(
-    document_url: Optional[str],
-    questions: List[str]
-) -> List[str]:
-    # 1) Load persistent store (existing docs)
-    persistent_store = FaissVectorStore(
-        get_embedding_dimension(),
-        persist_path=settings.VECTOR_DB_PATH
+def _embed_pages(sha256: str, pages: Iterable[str]) -> CachedDocument:
+    """
+    Chunks + embeds a document as its pages arrive and caches the result.
+    Chunks are embedded every EMBED_STREAM_BATCH while later pages are
+    still being parsed (in the parse pool, see iter_document_pages).
+    Every chunk is kept, including those some store already holds (their
+    vectors come from the embedding cache), so the cached document stays
+    complete whichever store or partition it is later searched against.
+    """
+    chunks: List[str] = []
+    page_ranges: List[Tuple[int, int]] = []
+    parts: List[np.ndarray] = []
+    pending: List[Tuple[str, int, int]] = []   # (chunk, first page, last page)
+
+    def embed_pending():
+        parts.append(embed_texts([chunk for chunk, _, _ in pending]))
+        chunks.extend(chunk for chunk, _, _ in pending)
+        page_ranges.extend((first, last) for _, first, last in pending)
+        pending.clear()
+
+    # Pages are parsed lazily as the chunker pulls them: time spent waiting
+    # on the page iterator is parsing, the rest of the pull is chunking
+    parsing, pulling = Stopwatch(), Stopwatch()
+    for batch in pulling.iterate(iter_chunks_with_pages(parsing.iterate(pages))):
+        pending.extend(batch)
+        if len(pending) >= settings.EMBED_STREAM_BATCH:
+            embed_pending()
+    if pending or not parts:
+        embed_pending()
+    record_stage("parse", parsing.seconds)
+    record_stage("chunk", pulling.seconds - parsing.seconds)
+
+    doc = CachedDocument(
+        sha256, chunks, np.concatenate(parts) if len(parts) > 1 else parts[0], pages=page_ranges
     )
+    get_document_cache().put(doc)
+    return doc
 
-    # 2) If there's a new document, parse/ chunk/ embed it once
-    new_chunks: List[str] = []
-    new_vecs: List[List[float]] = []
-    if document_url:
-        text = get_document_text(document_url, mode="markdown")
-        all_new_chunks = chunk_text(text)
-        # Filter out chunks already present in persistent store
-        new_chunks = [c for c in all_new_chunks if c not in persistent_store.texts]
-        new_vecs = embed_texts(new_chunks)
-
-        # Build an in-memory FAISS index for just this new doc, only if we have new chunks
-        if new_chunks:
-            temp_store = FaissVectorStore(get_embedding_dimension(), persist_path=None)
-            temp_store.clear()
-            temp_store.add_documents(new_chunks, new_vecs)
-        else:
-            temp_store = None
+def _invalidate_if_changed(entry: Optional[UrlEntry], sha256: str):
+    # The URL now serves different bytes: answers about the old ones are stale
+    if entry is not None and entry.sha256 != sha256:
+        get_answer_cache().invalidate(document_fingerprint(entry.sha256))
+
+def _ingest_document(document_url: str) -> CachedDocument:
+    """
+    Returns the chunks + vectors for `document_url`, doing as little work as the
+    document cache allows:
+    - URL checked recently → nothing at all
+    - URL's ETag/Last-Modified unchanged → one HEAD request
+    - bytes already seen (same SHA-256, any URL) → download only
+    - otherwise download, parse, chunk and embed
+    """
+    cache = get_document_cache()
+
+    entry = cache.lookup_url(document_url)
+    if entry and not cache.is_fresh(entry):
+        with stage("download"):
+            fresh = entry.matches(head_document(document_url))
     else:
-        temp_store = None
+        fresh = entry is not None
+    if fresh:
+        doc = cache.get(entry.sha256)
+        if doc is not None:
+            cache.touch_url(document_url)
+            return doc
+
+    with stage("download"):
+        buffer, headers = fetch_document(document_url)
+    sha256 = hashlib.sha256(buffer).hexdigest()
+    doc = cache.get(sha256)
+    if doc is None:
+        pages = iter_document_pages(
+            buffer, document_url, headers.get("content-type", ""), "markdown", get_page_parse_pool()
+        )
+        doc = _embed_pages(sha256, pages)
+    _invalidate_if_changed(entry, sha256)
+    cache.record_url(document_url, sha256, headers)
+    return doc
+
+_ingest_flights = SingleFlight()   # ("url", URL) / ("sha256", digest) → ingest in flight
+
+async def _coalesced(key: Tuple[str, str], fn: Callable[[], Awaitable[CachedDocument]]) -> CachedDocument:
+    # Requests that join another's ingest record the time they waited for it
+    if not _ingest_flights.is_running(key):
+        return await _ingest_flights.do(key, fn)
+    with stage("ingest_wait"):
+        return await _ingest_flights.do(key, fn)
+
+async def _ingest_document_async(document_url: str) -> CachedDocument:
+    """
+    Same steps as `_ingest_document`, but HTTP is awaited, parsing runs in the
+    process pool and chunking/embedding/cache IO in the blocking thread pool,
+    so the event loop stays free for other requests.
+
+    Concurrent requests for the same URL share one ingest, and different URLs
+    that turn out to serve the same bytes share the parse/chunk/embed step.
+    """
+    return await _coalesced(("url", document_url), lambda: _ingest_url_async(document_url))
+
+async def _ingest_url_async(document_url: str) -> CachedDocument:
+    cache = get_document_cache()
+
+    entry = cache.lookup_url(document_url)
+    if entry and not cache.is_fresh(entry):
+        with stage("download"):
+            fresh = entry.matches(await head_document_async(document_url))
+    else:
+        fresh = entry is not None
+    if fresh:
+        doc = await run_blocking(cache.get, entry.sha256)
+        if doc is not None:
+            cache.touch_url(document_url)
+            return doc
+
+    with stage("download"):
+        buffer, headers = await fetch_document_async(document_url)
+    sha256 = await run_blocking(lambda: hashlib.sha256(buffer).hexdigest())
+    doc = await _coalesced(
+        ("sha256", sha256),
+        lambda: _load_or_embed_async(sha256, buffer, document_url, headers.get("content-type", ""))
+    )
+    await run_blocking(_invalidate_if_changed, entry, sha256)
+    await run_blocking(cache.record_url, document_url, sha256, headers)
+    return doc
 
-    prompts: List[str] = []
+async def _load_or_embed_async(
+    sha256: str,
+    buffer: bytes,
+    document_url: str,
+    content_type: str
+) -> CachedDocument:
+    doc = await run_blocking(get_document_cache().get, sha256)
+    if doc is None:
+        pages = iter_document_pages(
+            buffer, document_url, content_type, "markdown", get_page_parse_pool()
+        )
+        doc = await run_blocking(_embed_pages, sha256, pages)
+    return doc
 
-    # 3) For each question, retrieve and assemble context
-    for question in questions:
-        qv = embed_query(question)
+def _is_persisted(doc: CachedDocument, persistent_store: FaissVectorStore) -> bool:
+    """
+    Cheap check that a cached document's chunks still sit at their recorded IDs.
+    """
+    if not doc.chunks:
+        return True
+    if doc.id_range is None:
+        return False
+    start, end = doc.id_range
+    return (
+        persistent_store.get_id(doc.chunks[0]) == start
+        and persistent_store.get_id(doc.chunks[-1]) == end - 1
+    )
+
+def _pending_chunks(
+    doc: Optional[CachedDocument],
+    persistent_store: FaissVectorStore
+) -> Tuple[List[str], Optional[np.ndarray], List[ChunkMeta]]:
+    """
+    The document's chunks (with vectors and metadata) that aren't in the
+    persistent store yet.
+    """
+    if doc is None or _is_persisted(doc, persistent_store):
+        return [], None, []
+    # Chunks already present in the persistent store are searched there
+    with stage("dedup"):
+        pending = persistent_store.missing(doc.chunks)
+    return [doc.chunks[i] for i in pending], doc.vectors[pending], doc.metadata(pending)
+
+def select_context(
+    new_hits: List[SearchResult],
+    existing_hits: List[SearchResult],
+    token_budget: int = settings.CONTEXT_TOKEN_BUDGET,
+    max_chunks: int = settings.TOP_K_CHUNKS,
+    max_distance: float = settings.CONTEXT_MAX_DISTANCE,
+    min_score_ratio: float = settings.CONTEXT_MIN_SCORE_RATIO
+) -> Tuple[List[str], List[str]]:
+    """
+    Picks one question's context from both stores' hits by score rather
+    than a fixed number from each: hits farther than `max_distance` or
+    scoring below `min_score_ratio` × the best are dropped, then the best
+    remaining chunks are taken while they fit in `token_budget` (the best
+    one always does). Returns (new-document chunks, existing chunks).
+    """
+    # New-document hits first, so they win ties and duplicates
+    hits = [(hit, True) for hit in new_hits] + [(hit, False) for hit in existing_hits]
+    if max_distance > 0:
+        # BM25-only hits have a nan distance and stay
+        hits = [(hit, new) for hit, new in hits if not hit.distance > max_distance]
+    if hits and min_score_ratio > 0:
+        best = max(hit.score for hit, _ in hits)
+        hits = [(hit, new) for hit, new in hits if hit.score >= min_score_ratio * best]
+    hits.sort(key=lambda h: -h[0].score)
+
+    top_new: List[str] = []
+    top_existing: List[str] = []
+    taken = set()
+    tokens = 0
+    for hit, new in hits:
+        if len(taken) >= max_chunks:
+            break
+        cost = estimate_tokens(hit.text)
+        if hit.text in taken or (taken and tokens + cost > token_budget):
+            continue
+        taken.add(hit.text)
+        tokens += cost
+        (top_new if new else top_existing).append(hit.text)
+    return top_new, top_existing
+
+def _retrieve(
+    questions: List[str],
+    persistent_store: Optional[FaissVectorStore],
+    new_chunks: List[str],
+    new_vecs: Optional[np.ndarray],
+    new_meta: Optional[List[ChunkMeta]] = None,
+    query_vecs: Optional[np.ndarray] = None
+) -> List[Tuple[List[str], List[str]]]:
+    """
+    Returns (chunks from the new document, chunks from existing documents)
+    for every question, chosen by select_context. `query_vecs` skips
+    embedding the questions again; without a `persistent_store` only the
+    new chunks are searched.
+    """
+    # Build an in-memory FAISS index for just this new doc, only if we have new chunks
+    temp_store = None
+    if new_chunks:
+        with stage("search"):
+            temp_store = FaissVectorStore(get_embedding_dimension(), persist_path=None)
+            temp_store.clear()
+            temp_store.add_documents(new_chunks, new_vecs, metadata=new_meta)
 
+    # Embed every question in one pass and search each store once for all of them
+    if query_vecs is None:
+        query_vecs = embed_queries(questions)
+    queries = questions if settings.HYBRID_SEARCH else None
+    depth = max(settings.CONTEXT_CANDIDATES, settings.TOP_K_CHUNKS)
+    with stage("search"):
         if temp_store:
-            top_new = temp_store.search(qv, top_k=3)
-            top_existing = persistent_store.search(qv, top_k=2)
+            new_hits = temp_store.search_results(query_vecs, depth, queries)
         else:
-            top_new = []
-            top_existing = persistent_store.search(qv, top_k=5)
-
-        # Deduplicate
-        seen = set()
-        unique_new = [c for c in top_new if not (c in seen or seen.add(c))]
-        unique_existing = [c for c in top_existing if not (c in seen or seen.add(c))]
-
-        # Build context string
-        if unique_new:
-            context = (
-                "The following context is extracted primarily from the **newly uploaded document**:\n\n"
-                + "\n\n--Chunk_Start--\n\n".join(unique_new)
-                + "\n\nThe following context is retrieved from the **existing indexed documents**:\n\n"
-                + "\n\n--Chunk_Start--\n\n".join(unique_existing)
-            )
+            new_hits = [[] for _ in questions]
+        if persistent_store is not None:
+            existing_hits = persistent_store.search_results(query_vecs, depth, queries)
         else:
-            context = (
-                "The following context is retrieved from the **existing indexed documents**:\n\n"
-                + "\n\n--Chunk_Start--\n\n".join(unique_existing)
-            )
+            existing_hits = [[] for _ in questions]
+        return [select_context(new, existing) for new, existing in zip(new_hits, existing_hits)]
 
-        # Build the prompt
-        prompt = f"""
-You are an expert insurance assistant. Use only the provided document context to answer the question below.
-
-Instructions:
-- Base your answer strictly on the given context. Do not use outside knowledge.
+_INSTRUCTIONS = """- Base your answer strictly on the given context. Do not use outside knowledge.
 - Keep the answers precise and relevant to the question. Do not add unnecessary information like disclaimers, etc.
 - GIVE THE BEST POSSIBLE ANSWER BASED ON THE CONTEXT PROVIDED.
-- Give A brief explanation for reaching a decision by utilizing the source documents/context.
+- Give A brief explanation for reaching a decision by utilizing the source documents/context."""
 
-Example Question and Answer for reference:
+_EXAMPLES = """Example Question and Answer for reference:
 - Q: What is the grace period for premium payment under the National Parivar Mediclaim Plus Policy?
   A: A grace period of thirty days is provided for premium payment after the due date to renew or continue the policy without losing continuity benefits.
 - Q: What is the waiting period for pre-existing diseases (PED) to be covered?
   A: There is a waiting period of thirty-six (36) months of continuous coverage from the first policy inception for pre-existing diseases and their direct complications to be covered.
 - Q: Are there any sub-limits on room rent and ICU charges for Plan A?
-  A: Yes, for Plan A, the daily room rent is capped at 1% of the Sum Insured, and ICU charges are capped at 2% of the Sum Insured. These limits do not apply if the treatment is for a listed procedure in a Preferred Provider Network (PPN).
+  A: Yes, for Plan A, the daily room rent is capped at 1% of the Sum Insured, and ICU charges are capped at 2% of the Sum Insured. These limits do not apply if the treatment is for a listed procedure in a Preferred Provider Network (PPN)."""
+
+def _format_context(top_new: List[str], top_existing: List[str]) -> str:
+    # Deduplicate
+    seen = set()
+    unique_new = [c for c in top_new if not (c in seen or seen.add(c))]
+    unique_existing = [c for c in top_existing if not (c in seen or seen.add(c))]
+
+    if unique_new:
+        return (
+            "The following context is extracted primarily from the **newly uploaded document**:\n\n"
+            + "\n\n--Chunk_Start--\n\n".join(unique_new)
+            + "\n\nThe following context is retrieved from the **existing indexed documents**:\n\n"
+            + "\n\n--Chunk_Start--\n\n".join(unique_existing)
+        )
+    return (
+        "The following context is retrieved from the **existing indexed documents**:\n\n"
+        + "\n\n--Chunk_Start--\n\n".join(unique_existing)
+    )
+
+def build_prompt(question: str, top_new: List[str], top_existing: List[str]) -> str:
+    """
+    Assembles the instruction-driven prompt for one question.
+    """
+    context = _format_context(top_new, top_existing)
+
+    # Build the prompt
+    return f"""
+You are an expert insurance assistant. Use only the provided document context to answer the question below.
+
+Instructions:
+{_INSTRUCTIONS}
+
+{_EXAMPLES}
 
 Document Context:
 ----------------
@@ -94,13 +319,225 @@ Question: {question}
 
 Answer (based only on the above context):
 """
-        prompts.append(prompt)
+
+def build_batch_prompt(questions: List[str], top_new: List[str], top_existing: List[str]) -> str:
+    """
+    One prompt for several questions over their merged context; the model is
+    asked for JSON answers keyed by the questions' 1-based numbers.
+    """
+    context = _format_context(top_new, top_existing)
+    numbered = "\n".join(f"{i}. {q}" for i, q in enumerate(questions, 1))
+    example = ", ".join(f'"{i}": "<answer to question {i}>"' for i in range(1, min(len(questions), 2) + 1))
+
+    return f"""
+You are an expert insurance assistant. Use only the provided document context to answer each of the numbered questions below.
+
+Instructions:
+{_INSTRUCTIONS}
+- Answer every question on its own; an answer must not refer to the other questions.
+
+{_EXAMPLES}
+
+Document Context:
+----------------
+{context}
+----------------
+
+Questions:
+{numbered}
+
+Respond with JSON only, with one answer per question number, in the form:
+{{"answers": {{{example}}}}}
+"""
+
+# Rough chars-per-token for English prose (CHUNK_SIZE 1800 chars ≈ 500 tokens)
+_CHARS_PER_TOKEN = 3.5
+_BATCH_OVERHEAD_CHARS = len(build_batch_prompt([], [], []))
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / _CHARS_PER_TOKEN) + 1
+
+@dataclass
+class PromptBatch:
+    prompt: str
+    question_indices: List[int]   # positions in the request's `questions`
+
+def pack_questions(
+    questions: List[str],
+    retrieved: List[Tuple[List[str], List[str]]],
+    max_tokens: int = settings.MAX_LLM_INPUT_TOKENS,
+    max_questions: int = settings.LLM_BATCH_MAX_QUESTIONS
+) -> List[PromptBatch]:
+    """
+    Greedily packs questions, in order, into as few prompts as fit under
+    `max_tokens`: each batch's context is the deduplicated union of its
+    questions' retrieved chunks. A batch of one is a plain `build_prompt`.
+    """
+    batches: List[PromptBatch] = []
+    members: List[int] = []
+    new_chunks: dict = {}        # ordered sets: chunk → None
+    existing_chunks: dict = {}
+    size = _BATCH_OVERHEAD_CHARS
+
+    def close():
+        if len(members) == 1:
+            i = members[0]
+            prompt = build_prompt(questions[i], *retrieved[i])
+        else:
+            prompt = build_batch_prompt(
+                [questions[i] for i in members], list(new_chunks), list(existing_chunks)
+            )
+        batches.append(PromptBatch(prompt, list(members)))
+
+    for i, (question, (top_new, top_existing)) in enumerate(zip(questions, retrieved)):
+        added = [c for c in dict.fromkeys(top_new + top_existing) if c not in new_chunks and c not in existing_chunks]
+        # chunk + "--Chunk_Start--" separator, question + its number and newline
+        cost = sum(len(c) + 21 for c in added) + len(question) + 6
+        if members and (
+            len(members) >= max_questions
+            or (size + cost) / _CHARS_PER_TOKEN > max_tokens
+        ):
+            close()
+            members, new_chunks, existing_chunks = [], {}, {}
+            size = _BATCH_OVERHEAD_CHARS
+            added = list(dict.fromkeys(top_new + top_existing))
+            cost = sum(len(c) + 21 for c in added) + len(question) + 6
+
+        members.append(i)
+        for c in top_new:
+            new_chunks.setdefault(c, None)
+            existing_chunks.pop(c, None)
+        for c in top_existing:
+            if c not in new_chunks:
+                existing_chunks.setdefault(c, None)
+        size += cost
+
+    if members:
+        close()
+    return batches
+
+def _persist_new_chunks(
+    doc: CachedDocument,
+    persistent_store: FaissVectorStore,
+    new_chunks: List[str],
+    new_vecs: np.ndarray,
+    new_meta: List[ChunkMeta]
+):
+    print("📥 Persisting new document embeddings to main FAISS store...")
+    # Appends to the store's write-ahead log; no full index rewrite. Chunks
+    # another request persisted in the meantime are skipped.
+    with stage("persist"):
+        id_range = persistent_store.add_missing(new_chunks, new_vecs, metadata=new_meta)
+    if id_range is not None and len(new_chunks) == len(doc.chunks):
+        get_document_cache().mark_persisted(doc.sha256, id_range)
+
+def generate_prompts(
+    document_url: Optional[str],
+    questions: List[str]
+) -> List[str]:
+    # 1) Resident persistent store (existing docs), loaded once per process
+    persistent_store = get_persistent_store()
+
+    # 2) If there's a new document, parse/ chunk/ embed it once
+    #    (or pull its chunks + vectors straight from the document cache)
+    doc = _ingest_document(document_url) if document_url else None
+    new_chunks, new_vecs, new_meta = _pending_chunks(doc, persistent_store)
+
+    # 3) Retrieve context for every question and build the prompts
+    retrieved = _retrieve(questions, persistent_store, new_chunks, new_vecs, new_meta)
+    with stage("prompt_build"):
+        prompts = [build_prompt(q, top_new, top_existing) for q, (top_new, top_existing) in zip(questions, retrieved)]
 
     # 4) After all prompts are built, update the persistent store once
-    if document_url and settings.ALLOW_DB_UPDATE and new_chunks:
-        print("📥 Persisting new document embeddings to main FAISS store...")
-        persistent_store.add_documents(new_chunks, new_vecs)
-        # If your FaissVectorStore exposes a ._save() or .persist() method:
-        persistent_store._save()
+    if doc and settings.ALLOW_DB_UPDATE and new_chunks:
+        _persist_new_chunks(doc, persistent_store, new_chunks, new_vecs, new_meta)
 
     return prompts
+
+@asynccontextmanager
+async def request_store(tenant: Optional[str] = None) -> AsyncIterator[Tuple[FaissVectorStore, Optional[str]]]:
+    """
+    The persistent store a request searches, with its partition name: the
+    resident global store (partition None), or with PARTITIONED_STORE the
+    tenant's partition, loaded on demand and pinned until the block exits.
+    """
+    if not settings.PARTITIONED_STORE:
+        yield await run_blocking(get_persistent_store), None
+        return
+    partitions = get_partitioned_store()
+    name = partitions.route(tenant)
+    store = await run_blocking(partitions.acquire, name)
+    try:
+        yield store, name
+    finally:
+        await run_blocking(partitions.release, name)
+
+async def ingest_async(
+    document_url: Optional[str],
+    persistent_store: Optional[FaissVectorStore] = None
+) -> Tuple[FaissVectorStore, Optional[CachedDocument]]:
+    """
+    The persistent store (the resident global one unless given), plus the
+    request's document (if any) with its chunks + vectors. Every blocking
+    stage runs in a bounded pool, so one large PDF doesn't stall other
+    requests (or /health).
+    """
+    if persistent_store is None:
+        persistent_store = await run_blocking(get_persistent_store)
+    doc = await _ingest_document_async(document_url) if document_url else None
+    return persistent_store, doc
+
+async def retrieve_async(
+    persistent_store: FaissVectorStore,
+    doc: Optional[CachedDocument],
+    questions: List[str],
+    query_vecs: Optional[np.ndarray] = None,
+    scope: str = "all"
+) -> List[Tuple[List[str], List[str]]]:
+    """
+    (new-document chunks, existing chunks) for every question; then merges the
+    document's new chunks into the persistent store. scope="document" takes
+    context only from the request's document, not the whole store.
+    """
+    if scope == "document" and doc is None:
+        raise ValueError("scope='document' needs a document")
+    new_chunks, new_vecs, new_meta = await run_blocking(_pending_chunks, doc, persistent_store)
+
+    if scope == "document":
+        # Search all of the document's chunks (the cached copy is complete),
+        # not the persistent store: chunks it shares with documents stored
+        # earlier are recorded there under those documents' IDs
+        retrieved = await run_blocking(
+            _retrieve, questions, None, doc.chunks, doc.vectors, doc.metadata(), query_vecs
+        )
+    else:
+        retrieved = await run_blocking(
+            _retrieve, questions, persistent_store, new_chunks, new_vecs, new_meta, query_vecs
+        )
+
+    if doc and settings.ALLOW_DB_UPDATE and new_chunks:
+        await run_store_write(_persist_new_chunks, doc, persistent_store, new_chunks, new_vecs, new_meta)
+
+    return retrieved
+
+async def retrieve_context_async(
+    document_url: Optional[str],
+    questions: List[str]
+) -> List[Tuple[List[str], List[str]]]:
+    """
+    Ingests the document (if any) and returns (new-document chunks, existing
+    chunks) for every question.
+    """
+    persistent_store, doc = await ingest_async(document_url)
+    return await retrieve_async(persistent_store, doc, questions)
+
+async def generate_prompts_async(
+    document_url: Optional[str],
+    questions: List[str]
+) -> List[str]:
+    """
+    Non-blocking `generate_prompts` for the API: one prompt per question.
+    """
+    retrieved = await retrieve_context_async(document_url, questions)
+    with stage("prompt_build"):
+        return [build_prompt(q, top_new, top_existing) for q, (top_new, top_existing) in zip(questions, retrieved)]
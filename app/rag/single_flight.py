@@ -0,0 +1,39 @@
+# rag/single_flight.py
+#
+# Request coalescing: concurrent callers asking for the same key share one
+# execution. The first caller starts the work as its own task; later callers
+# await that task instead of repeating it (same result, same exception).
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    await flights.do(key, lambda: fetch(key)) — at most one `fetch(key)` in
+    flight per key; the key is forgotten as soon as it finishes, so later
+    calls run it again (caching is the caller's business).
+
+    The shared work runs as a separate task, so a caller that is cancelled
+    (e.g. its client disconnected) doesn't cancel it for the others. Meant
+    for use from a single event loop.
+    """
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._flights.get(key)
+        if task is None:
+            task = self._flights[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def is_running(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Every caller may have been cancelled; don't log "exception never retrieved"
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,113 @@
+# rag/warmup.py
+#
+# Start-up warm-up. The embedding model, FAISS, the BM25 index, the PDF/DOCX
+# parsers and langchain are all loaded on first use, so the server accepts connections
+# (and answers /live) almost at once; warm_up() then loads them from the
+# FastAPI lifespan so the first real request doesn't pay for it, and /ready
+# only reports 200 once it has.
+
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from rag.executors import run_blocking
+
+
+class WarmupState:
+    """
+    Progress of warm_up(), as reported by /ready.
+    """
+    def __init__(self):
+        self.status = "pending"            # pending → warming → ready | failed (skipped: warm-up off)
+        self.steps: Dict[str, float] = {}  # finished step → seconds
+        self.current: Optional[str] = None
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        # With warm-up off everything still loads lazily on the first request
+        return self.status in ("ready", "skipped")
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "ready": self.ready,
+            "current_step": self.current,
+            "steps": dict(self.steps),
+            "error": self.error,
+            "seconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+        }
+
+
+_state = WarmupState()
+
+def get_warmup_state() -> WarmupState:
+    return _state
+
+def _load_embedding_model():
+    from embedder.embed import warm_up as warm_up_model
+    warm_up_model()
+
+def _resident_store():
+    # With partitions, only the default tenant's partition is preloaded
+    from config import settings
+    from db.partitions import get_partitioned_store
+    from db.vector_store import get_persistent_store
+    if not settings.PARTITIONED_STORE:
+        return get_persistent_store()
+    partitions = get_partitioned_store()
+    name = partitions.route(None)
+    store = partitions.acquire(name)
+    partitions.release(name)
+    return store
+
+def _load_vector_store():
+    _resident_store()
+
+def _load_lexical_index():
+    from config import settings
+    if settings.HYBRID_SEARCH:
+        _resident_store().warm_up_lexical()
+
+def _load_parsers():
+    # Parse-pool workers import these themselves; this covers inline parsing
+    import docx
+    import pdfplumber
+    import pymupdf
+    import pymupdf4llm
+    from chunker.text_chunker import get_splitter
+    get_splitter()
+
+_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("embedding_model", _load_embedding_model),
+    ("vector_store", _load_vector_store),
+    ("lexical_index", _load_lexical_index),
+    ("parsers", _load_parsers),
+]
+
+async def warm_up():
+    """
+    Runs every warm-up step in the blocking pool, recording timings in the
+    shared WarmupState. A failing step marks the state failed (requests still
+    retry the lazy load themselves).
+    """
+    _state.status = "warming"
+    _state.started_at = time.time()
+    try:
+        for name, step in _STEPS:
+            _state.current = name
+            t0 = time.perf_counter()
+            await run_blocking(step)
+            _state.steps[name] = round(time.perf_counter() - t0, 3)
+            print(f"🔥 Warm-up: {name} ready in {_state.steps[name]:.2f}s")
+        _state.status = "ready"
+    except Exception as e:
+        _state.status = "failed"
+        _state.error = f"{_state.current}: {e}"
+        print(f"❌ Warm-up failed at {_state.current}: {e}")
+    finally:
+        _state.current = None
+        _state.finished_at = time.time()
+
+def skip_warm_up():
+    _state.status = "skipped"
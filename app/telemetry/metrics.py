@@ -0,0 +1,240 @@
+# telemetry/metrics.py
+#
+# Process-local metrics rendered in the Prometheus text format (no client
+# library): labelled counters, gauges and histograms, plus stage() timers.
+# Every stage timing goes into the rag_stage_seconds histogram and, while a
+# request_timings() block is active (one per HTTP request, see main.py), into
+# that request's breakdown for the Server-Timing header. Each uvicorn worker
+# keeps its own registry, so scrape every worker.
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+LabelValues = Tuple[str, ...]
+
+# Seconds; spans a FAISS search (ms) up to a slow Gemini call (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[[], Dict[LabelValues, float]]] = None
+    ):
+        """
+        `collect`, if given, is called at scrape time and returns the current
+        value per label-value tuple (() without labels), for values that
+        already live elsewhere (cache counters, index sizes).
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, float]]:
+        if self._collect is not None:
+            values = self._collect()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for key, value in values.items():
+            yield self.name, key, value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, List[float]] = {}   # per-bucket counts + [sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def totals(self) -> Dict[LabelValues, Tuple[float, int]]:
+        """
+        (sum, count) of the observations per label-value tuple.
+        """
+        with self._lock:
+            return {key: (values[-2], int(values[-1])) for key, values in self._series.items()}
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, float]]:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in series.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                yield f"{self.name}_bucket", key + (_format_value(bound),), cumulative
+            yield f"{self.name}_bucket", key + ("+Inf",), values[-1]
+            yield f"{self.name}_sum", key, values[-2]
+            yield f"{self.name}_count", key, values[-1]
+
+
+def render() -> str:
+    """
+    Every registered metric in the Prometheus text exposition format (0.0.4).
+    A failing `collect` callback only drops its own metric.
+    """
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        try:
+            samples = list(metric.samples())
+        except Exception as e:
+            print(f"⚠️ Could not collect metric {metric.name}: {e}")
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        labelnames = metric.labelnames + (("le",) if metric.kind == "histogram" else ())
+        for name, key, value in samples:
+            if key:
+                labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(labelnames, key))
+                name = f"{name}{{{labels}}}"
+            lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# ─── Stage timers ─────────────────────────────────────────────────────────────
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Time spent in each pipeline stage (download, parse, chunk, dedup, embed_chunks, "
+    "embed_queries, ingest_wait, search, prompt_build, gemini_call, gemini, ...)",
+    ("stage",)
+)
+
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+_timings_lock = threading.Lock()
+
+def record_stage(stage: str, seconds: float):
+    """
+    Adds one stage timing to the histogram and to the current request's
+    breakdown (if any). Safe from pool threads that run the request's work
+    (run_blocking copies the request's context).
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        with _timings_lock:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    with stage("search"): ... — times the block as one `name` stage.
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0)
+
+@contextmanager
+def request_timings() -> Iterator[Dict[str, float]]:
+    """
+    Collects the stage timings recorded inside the block (summed per stage).
+    """
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """
+    A Server-Timing header value: `stage;dur=<ms>` per stage.
+    """
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+class Stopwatch:
+    """
+    Accumulates the time spent waiting on an iterator, for stages that run
+    lazily inside another loop (parsing pages as the chunker pulls them).
+    """
+    def __init__(self):
+        self.seconds = 0.0
+
+    def iterate(self, iterable: Iterable[T]) -> Iterator[T]:
+        it = iter(iterable)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.seconds += time.perf_counter() - t0
+                return
+            self.seconds += time.perf_counter() - t0
+            yield item
@@ -0,0 +1,110 @@
+# test_answer_cache.py
+#
+# AnswerCache: expiry, LRU eviction, near-duplicate matching around the
+# similarity threshold, invalidation when the context changes, the SQLite
+# tier across a reopen, and the hit/miss counters.
+
+import math
+import time
+import numpy as np
+import pytest
+from cache import answer_cache
+from cache.answer_cache import AnswerCache, document_fingerprint, store_fingerprint
+from cache.document_cache import UrlEntry
+from config import settings
+from rag import rag_system
+
+DOC = document_fingerprint("a" * 64)
+
+
+def _at_angle(cosine: float) -> np.ndarray:
+    # Unit vector whose cosine similarity with [1, 0] is `cosine`
+    return np.array([cosine, math.sqrt(1 - cosine ** 2)], dtype=np.float32)
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    cache = AnswerCache(ttl_seconds=60)
+    cache.put(DOC, "What is the grace period?", "30 days")
+    assert cache.get(DOC, "what is the grace period") == "30 days"
+
+    now = time.time()
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now + 61)
+    assert cache.get(DOC, "What is the grace period?") is None
+    assert cache.counters["expired"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    assert AnswerCache().max_entries == settings.ANSWER_CACHE_MAX_ENTRIES
+    cache = AnswerCache(max_entries=2)
+    cache.put(DOC, "q1", "a1")
+    cache.put(DOC, "q2", "a2")
+    assert cache.get(DOC, "q1") == "a1"     # q2 is now the least recently used
+    cache.put(DOC, "q3", "a3")
+
+    assert cache.get(DOC, "q2") is None
+    assert (cache.get(DOC, "q1"), cache.get(DOC, "q3")) == ("a1", "a3")
+    assert cache.counters["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_near_duplicate_threshold():
+    threshold = settings.ANSWER_CACHE_SIMILARITY
+    cache = AnswerCache(similarity=threshold)
+    cache.put(DOC, "What is the grace period?", "30 days", np.array([1.0, 0.0]))
+
+    assert cache.get_similar(DOC, _at_angle(threshold + 0.001)) == "30 days"
+    assert cache.get_similar(DOC, _at_angle(threshold - 0.001)) is None
+    # Near-duplicates never cross documents
+    assert cache.get_similar(document_fingerprint("b" * 64), _at_angle(1.0)) is None
+
+
+def test_changed_context_misses():
+    cache = AnswerCache()
+    cache.put(document_fingerprint("a" * 64), "q", "old bytes")
+    cache.put(store_fingerprint(10), "q", "ten chunks")
+
+    assert cache.get(document_fingerprint("b" * 64), "q") is None
+    assert cache.get(store_fingerprint(11), "q") is None
+    assert cache.get(document_fingerprint("a" * 64, "scope:document"), "q") is None
+
+
+def test_new_bytes_at_a_url_invalidate_its_answers(monkeypatch):
+    cache = AnswerCache()
+    monkeypatch.setattr(rag_system, "get_answer_cache", lambda: cache)
+    cache.put(DOC, "q1", "a1")
+    cache.put(DOC, "q2", "a2")
+    entry = UrlEntry("a" * 64, etag='"v1"', last_modified=None, checked_at=0.0)
+
+    rag_system._invalidate_if_changed(entry, "a" * 64)
+    assert cache.get(DOC, "q1") == "a1"
+    rag_system._invalidate_if_changed(entry, "b" * 64)
+    assert cache.get(DOC, "q1") is None and cache.get(DOC, "q2") is None
+    assert cache.counters["invalidated"] == 2
+
+
+def test_sqlite_backend_survives_a_reopen(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    cache = AnswerCache(db_path=path)
+    cache.put(DOC, "What is the grace period?", "30 days", np.array([1.0, 0.0]))
+    cache.put(DOC, "Is dental covered?", "No")
+    cache.invalidate(document_fingerprint("b" * 64))
+
+    reopened = AnswerCache(db_path=path)
+    assert reopened.get(DOC, "is dental covered") == "No"
+    assert reopened.get_similar(document_fingerprint("a" * 64), _at_angle(1.0)) == "30 days"
+
+    reopened.invalidate(DOC)
+    assert AnswerCache(db_path=path).get(DOC, "Is dental covered?") is None
+
+
+def test_hit_and_miss_counters():
+    cache = AnswerCache()
+    cache.put(DOC, "q", "a", np.array([1.0, 0.0]))
+    cache.get(DOC, "q")                                  # exact hit
+    assert cache.get(DOC, "other") is None               # not a miss yet...
+    cache.get_similar(DOC, _at_angle(1.0))               # ...near-duplicate hit
+    cache.get_similar(DOC, _at_angle(0.0))               # miss
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["similar_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
@@ -0,0 +1,87 @@
+# test_batch_answers.py
+#
+# Packed prompts: parsing the JSON answer Gemini returns for several
+# questions, and re-asking one by one whatever it left out.
+
+import asyncio
+import json
+import pytest
+from rag import answering
+from rag.answering import answer_questions, parse_batch_answers
+
+
+@pytest.mark.parametrize("text", [
+    '{"answers": {"1": "Thirty days.", "2": "Yes, up to Rs 40,000."}}',
+    '{"1": "Thirty days.", "2": "Yes, up to Rs 40,000."}',
+    '["Thirty days.", "Yes, up to Rs 40,000."]',
+    '```json\n{"answers": {"1": "Thirty days.", "2": "Yes, up to Rs 40,000."}}\n```',
+    'Here you go: {"answers": {"1": "Thirty days.", "2": "Yes, up to Rs 40,000."}} Hope it helps.',
+])
+def test_parse_accepted_shapes(text):
+    assert parse_batch_answers(text, 2) == {0: "Thirty days.", 1: "Yes, up to Rs 40,000."}
+
+
+def test_parse_keeps_only_numbered_nonempty_answers_in_range():
+    text = json.dumps({"answers": {
+        "1": "  Thirty days. ",
+        "2": "",                   # empty → missing
+        "3": ["not", "a string"],  # wrong type → missing
+        "4": "Out of range",       # extra answer → ignored
+        "0": "Also out of range",
+        "note": "not a number",
+    }})
+    assert parse_batch_answers(text, 3) == {0: "Thirty days."}
+
+
+@pytest.mark.parametrize("text", ["", "Sorry, I can't help with that.", "{not json}", '"just a string"', "42"])
+def test_parse_garbage_gives_nothing(text):
+    assert parse_batch_answers(text, 3) == {}
+
+
+QUESTIONS = ["What is the grace period?", "Is cataract covered?", "Is dental covered?", "Who can cancel?"]
+RETRIEVED = [(["Grace period is thirty days."], []), ([], ["Cataract up to Rs 40,000."]),
+             (["Dental is excluded."], []), ([], ["Either party with 15 days notice."])]
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    """
+    Replaces Gemini: packed (json_mode) prompts get `packed_reply`, single
+    prompts get "single:<question>". Records every call.
+    """
+    calls = []
+
+    async def call(prompt, json_mode=False, on_text=None, **_):
+        calls.append((json_mode, prompt))
+        if json_mode:
+            return fake.packed_reply
+        question = next(q for q in QUESTIONS if q in prompt)
+        return f"single:{question}"
+
+    fake = type("FakeGemini", (), {"calls": calls, "packed_reply": ""})()
+    monkeypatch.setattr(answering, "call_gemini_api", call)
+    return fake
+
+
+def test_complete_packed_answer_needs_one_call(fake_gemini):
+    fake_gemini.packed_reply = json.dumps({"answers": {str(n): f"packed {n}" for n in range(1, 5)}})
+    answers = asyncio.run(answer_questions(QUESTIONS, RETRIEVED))
+    assert answers == ["packed 1", "packed 2", "packed 3", "packed 4"]
+    assert len(fake_gemini.calls) == 1
+
+
+def test_missing_answers_fall_back_to_single_prompts(fake_gemini):
+    # Answer 3 is missing, answer 2 is empty and an extra 5th one is ignored
+    fake_gemini.packed_reply = json.dumps({"answers": {"1": "packed 1", "2": " ", "4": "packed 4", "5": "extra"}})
+    seen = {}
+    answers = asyncio.run(answer_questions(QUESTIONS, RETRIEVED, on_answer=seen.__setitem__))
+    assert answers == ["packed 1", f"single:{QUESTIONS[1]}", f"single:{QUESTIONS[2]}", "packed 4"]
+    assert seen == dict(enumerate(answers))
+    assert [json_mode for json_mode, _ in fake_gemini.calls] == [True, False, False]
+
+
+def test_unparseable_packed_answer_falls_back_for_every_question(fake_gemini):
+    fake_gemini.packed_reply = "I cannot answer in JSON."
+    answers = asyncio.run(answer_questions(QUESTIONS, RETRIEVED))
+    assert answers == [f"single:{q}" for q in QUESTIONS]
+    assert len(fake_gemini.calls) == 1 + len(QUESTIONS)
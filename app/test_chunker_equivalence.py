@@ -0,0 +1,77 @@
+# test_chunker_equivalence.py
+#
+# iter_chunks / iter_chunks_with_pages replay RecursiveCharacterTextSplitter's
+# top-level merge one page at a time (see chunker/text_chunker.py). Whatever
+# the page boundaries, they must produce exactly chunk_text's chunks; this is
+# the guard to run when upgrading langchain-text-splitters.
+
+import random
+import pytest
+from chunker.text_chunker import chunk_text, get_splitter, iter_chunks, iter_chunks_with_pages
+
+WORDS = ("policy insured premium claim hospital waiting period exclusion benefit "
+         "sum cover room rent maternity cataract ayush grace renewal").split()
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    # Some single line breaks inside a paragraph, as PDF extraction leaves them
+    return "\n".join(text[i:i + 90] for i in range(0, len(text), 90))
+
+def _document(seed: int) -> str:
+    rng = random.Random(seed)
+    chunk_size = get_splitter()._chunk_size
+    parts = []
+    for _ in range(rng.randint(5, 40)):
+        kind = rng.random()
+        if kind < 0.15:
+            # Longer than a chunk: split further with the finer separators
+            parts.append(_paragraph(rng, chunk_size // 3))
+        elif kind < 0.2:
+            parts.append("")                                   # runs of blank lines
+        else:
+            parts.append(_paragraph(rng, rng.randint(3, 120)))
+    return "\n\n".join(parts)
+
+def _pages(text: str, rng: random.Random):
+    # Arbitrary cut points, including ones that fall inside a "\n\n"
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(0, 12))))
+    bounds = [0] + cuts + [len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_iter_chunks_matches_chunk_text(seed):
+    text = _document(seed)
+    pages = _pages(text, random.Random(seed))
+    streamed = [chunk for batch in iter_chunks(pages) for chunk in batch]
+    assert streamed == chunk_text(text)
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "one short page without any paragraph break",
+    "x" * 5000,                                           # no separator at all
+    "\n\nleading break",
+    "trailing break\n\n",
+    "\n\n\n\n",
+    "a\n\nb\n\nc",
+])
+def test_edge_cases(text):
+    for pages in ([text], list(text)):                    # one page, or a page per character
+        streamed = [chunk for batch in iter_chunks(pages) for chunk in batch]
+        assert streamed == chunk_text(text)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_page_ranges(seed):
+    text = _document(seed)
+    pages = _pages(text, random.Random(seed)) or [text]
+    located = [item for batch in iter_chunks_with_pages(pages) for item in batch]
+    assert [chunk for chunk, _, _ in located] == chunk_text(text)
+
+    previous_first = 1
+    for chunk, first, last in located:
+        assert previous_first <= first <= last <= len(pages)
+        assert chunk in "".join(pages[first - 1:last])
+        previous_first = first
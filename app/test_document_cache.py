@@ -0,0 +1,131 @@
+# test_document_cache.py
+#
+# DocumentCache: the URL map's cap, the in-memory LRU, the on-disk tier
+# across a reopen (and its config fingerprint), and revalidating a URL with
+# a HEAD request.
+
+import itertools
+import os
+import numpy as np
+import pytest
+from benchmarks.bench_pipeline import HashingEncoder
+from cache import document_cache
+from cache.answer_cache import AnswerCache
+from cache.document_cache import CachedDocument, DocumentCache
+from embedder import embed
+from rag import rag_system
+
+URL = "https://example.com/policy.pdf"
+
+
+def _doc(sha256: str, n: int = 3) -> CachedDocument:
+    vectors = np.random.default_rng(len(sha256)).random((n, 4), dtype=np.float32)
+    return CachedDocument(sha256, [f"{sha256} chunk {i}" for i in range(n)], vectors,
+                          pages=[(i + 1, i + 1) for i in range(n)])
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Strictly increasing time.time() for the URL map's checked_at."""
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(document_cache.time, "time", lambda: float(next(ticks)))
+
+
+def test_url_map_drops_the_least_recently_checked(clock):
+    cache = DocumentCache(max_urls=2)
+    cache.record_url("https://a", "sha-a", {"ETag": '"a"'})
+    cache.record_url("https://b", "sha-b", {})
+    cache.touch_url("https://a")
+    cache.record_url("https://c", "sha-c", {})
+
+    assert cache.lookup_url("https://b") is None
+    assert cache.lookup_url("https://a").etag == '"a"'
+    assert cache.lookup_url("https://c").sha256 == "sha-c"
+
+
+def test_memory_tier_is_an_lru():
+    cache = DocumentCache(max_entries=2)
+    first, second = _doc("a"), _doc("b")
+    cache.put(first)
+    cache.put(second)
+    assert cache.get("a") is first          # "b" is now the least recently used
+    cache.put(_doc("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is first
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 2)
+
+
+def test_disk_tier_survives_a_reopen(tmp_path, hashing_model):
+    doc = _doc("a")
+    DocumentCache(cache_dir=str(tmp_path)).put(doc)
+    files = os.listdir(tmp_path)
+    assert {"a.json", "a.npy"} <= set(files) and not [f for f in files if f.endswith(".tmp")]
+
+    reopened = DocumentCache(cache_dir=str(tmp_path))
+    loaded = reopened.get("a")
+    assert loaded.chunks == doc.chunks and loaded.pages == doc.pages
+    np.testing.assert_array_equal(loaded.vectors, doc.vectors)
+    assert reopened.counters["disk_hits"] == 1
+
+    reopened.mark_persisted("a", (10, 13))
+    assert DocumentCache(cache_dir=str(tmp_path)).get("a").id_range == (10, 13)
+
+
+def test_disk_entries_are_tied_to_the_embedding_backend(tmp_path, hashing_model):
+    DocumentCache(cache_dir=str(tmp_path)).put(_doc("a"))
+    embed.use_model(HashingEncoder(dim=64), backend="onnx-int8")
+    cache = DocumentCache(cache_dir=str(tmp_path))
+    assert cache.get("a") is None
+    assert cache.counters["misses"] == 1
+
+
+@pytest.fixture
+def ingest(monkeypatch):
+    """
+    _ingest_document with a given cache and fake HTTP: `head` holds the HEAD
+    response's headers, `served` the bytes a GET returns; parsing and
+    embedding are skipped (a download yields a 1-chunk document).
+    """
+    state = type("Ingest", (), {})()
+    state.cache = DocumentCache(fresh_seconds=0)
+    state.answers = AnswerCache()
+    state.head, state.served, state.downloads = {}, b"", 0
+
+    def fetch_document(url):
+        state.downloads += 1
+        return state.served, dict(state.head)
+
+    def embed_pages(sha256, pages):
+        doc = _doc(sha256, 1)
+        state.cache.put(doc)
+        return doc
+
+    monkeypatch.setattr(rag_system, "get_document_cache", lambda: state.cache)
+    monkeypatch.setattr(rag_system, "get_answer_cache", lambda: state.answers)
+    monkeypatch.setattr(rag_system, "head_document", lambda url: dict(state.head))
+    monkeypatch.setattr(rag_system, "fetch_document", fetch_document)
+    monkeypatch.setattr(rag_system, "get_page_parse_pool", lambda: None)
+    monkeypatch.setattr(rag_system, "iter_document_pages", lambda *args: iter(()))
+    monkeypatch.setattr(rag_system, "_embed_pages", embed_pages)
+    return state
+
+
+def test_head_revalidation(ingest):
+    ingest.head, ingest.served = {"etag": '"v1"'}, b"version one"
+    first = rag_system._ingest_document(URL)
+    assert ingest.downloads == 1
+
+    # Same ETag: one HEAD request, served from the cache
+    assert rag_system._ingest_document(URL) is first
+    assert ingest.downloads == 1
+
+    # Changed ETag: downloaded again, and answers about the old bytes dropped
+    ingest.answers.put(rag_system.document_fingerprint(first.sha256), "q", "old answer")
+    ingest.head, ingest.served = {"etag": '"v2"'}, b"version two"
+    second = rag_system._ingest_document(URL)
+    assert ingest.downloads == 2
+    assert second.sha256 != first.sha256
+    assert ingest.cache.lookup_url(URL).etag == '"v2"'
+    assert ingest.answers.counters["invalidated"] == 1
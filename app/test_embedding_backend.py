@@ -0,0 +1,86 @@
+# test_embedding_backend.py
+#
+# The ONNX path must not need torch, and the embedding cache must be tagged
+# with the backend that actually serves embeddings, not the configured one.
+
+import sys
+import numpy as np
+import pytest
+from benchmarks.bench_pipeline import HashingEncoder
+from cache import embedding_cache
+from cache.embedding_cache import EmbeddingCache
+from config import settings
+from embedder import embed, onnx_backend
+
+
+@pytest.fixture
+def fresh_model():
+    """No model loaded; restores the previous one afterwards."""
+    previous, previous_backend = embed._model, embed._backend
+    embed.use_model(None)
+    yield
+    embed.use_model(previous, previous_backend)
+
+
+@pytest.fixture
+def cache_on(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "EMBED_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "EMBED_CACHE_PATH", str(tmp_path / "embedding_cache.sqlite3"))
+    monkeypatch.setattr(embedding_cache, "_embedding_cache", None)
+    monkeypatch.setattr(embedding_cache, "_embedding_cache_backend", None)
+
+
+def test_onnx_model_loads_without_torch(fresh_model, monkeypatch):
+    encoder = HashingEncoder(dim=16)
+    encoder.backend = "onnx-int8"
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "onnx")
+    monkeypatch.setattr(onnx_backend, "load_onnx_encoder", lambda: encoder)
+    # Any attempt to import torch / sentence_transformers now fails
+    monkeypatch.setitem(sys.modules, "torch", None)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", None)
+
+    assert embed.loaded_backend() == "onnx-int8"
+    assert embed._get_model() is encoder
+
+
+def test_cache_is_tagged_with_the_loaded_backend(fresh_model, cache_on, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "onnx")
+    embed.use_model(HashingEncoder(dim=16), backend="torch")   # e.g. the ONNX load fell back
+
+    vecs = embed.embed_texts(["grace period", "room rent"])
+    cache = embedding_cache.get_embedding_cache()
+    assert "|torch|" in cache.model_id
+    np.testing.assert_array_equal(embed.embed_texts(["grace period"]), vecs[:1])
+    assert cache.counters["hits"] == 1
+
+
+def test_switching_backend_reopens_the_cache(fresh_model, cache_on):
+    embed.use_model(HashingEncoder(dim=16), backend="onnx")
+    embed.embed_texts(["grace period"])
+    onnx_cache = embedding_cache.get_embedding_cache()
+
+    embed.use_model(HashingEncoder(dim=16), backend="torch")
+    embed.embed_texts(["grace period"])
+    torch_cache = embedding_cache.get_embedding_cache()
+
+    assert torch_cache is not onnx_cache
+    assert "|torch|" in torch_cache.model_id
+    assert torch_cache.counters == {"hits": 0, "misses": 1, "writes": 1}
+
+    # Opening the torch cache kept the ONNX rows
+    embed.use_model(HashingEncoder(dim=16), backend="onnx")
+    embed.embed_texts(["grace period"])
+    assert embedding_cache.get_embedding_cache().counters["hits"] == 1
+
+
+def test_only_stale_rows_of_the_same_model_and_backend_are_purged(tmp_path):
+    path = str(tmp_path / "embedding_cache.sqlite3")
+    vector = np.ones((1, 4), dtype=np.float32)
+    for model_id in ("/models/a|torch|v1", "/models/a|onnx|v1", "/models/b|onnx|v1"):
+        EmbeddingCache(path, model_id).put_many(["grace period"], vector)
+
+    # Model a's files changed while serving ONNX
+    EmbeddingCache(path, "/models/a|onnx|v2")
+    assert EmbeddingCache(path, "/models/a|torch|v1").get_many(["grace period"]).keys() == {0}
+    assert EmbeddingCache(path, "/models/b|onnx|v1").get_many(["grace period"]).keys() == {0}
+    assert EmbeddingCache(path, "/models/a|onnx|v1").get_many(["grace period"]) == {}
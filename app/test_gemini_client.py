@@ -0,0 +1,100 @@
+# test_gemini_client.py
+#
+# The shared Gemini client against benchmarks/mock_gemini.py: the in-flight
+# limit, the shared pause after a 429, the per-minute token bucket and
+# connection reuse.
+
+import asyncio
+import time
+import pytest
+from benchmarks.mock_gemini import start_in_thread
+from config import settings
+from generator import llm
+
+
+@pytest.fixture
+def mock_gemini(monkeypatch):
+    """
+    Starts a mock server and points the client at it; the test sets the
+    server's latency / rate and the limiter settings before calling.
+    """
+    server = start_in_thread()
+    base = f"http://127.0.0.1:{server.server_port}/v1beta/models/{settings.GEMINI_QNA_MODEL}"
+    monkeypatch.setattr(llm, "GEMINI_QNA_URL", f"{base}:generateContent")
+    monkeypatch.setattr(llm, "GEMINI_STREAM_URL", f"{base}:streamGenerateContent?alt=sse")
+    monkeypatch.setattr(settings, "GEMINI_HTTP2", False)
+    monkeypatch.setattr(settings, "GEMINI_REQUESTS_PER_MINUTE", 0)
+    monkeypatch.setattr(llm, "_client", None)
+    monkeypatch.setattr(llm, "_client_loop", None)
+    monkeypatch.setattr(llm, "_limiter", None)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _run(coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await llm.close_llm_client()
+    return asyncio.run(main())
+
+async def _timed_calls(n: int, delay: float = 0.0):
+    await asyncio.sleep(delay)
+    t0 = time.perf_counter()
+    answers = await asyncio.gather(*(llm.call_gemini_api(f"q{i}") for i in range(n)))
+    return answers, time.perf_counter() - t0
+
+
+def test_in_flight_calls_are_capped(mock_gemini, monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_MAX_CONCURRENCY", 2)
+    mock_gemini.latency = 0.2
+
+    answers, seconds = _run(_timed_calls(6))
+    assert answers == ["ok"] * 6
+    assert mock_gemini.stats["max_in_flight"] == 2
+    assert seconds >= 3 * 0.2
+
+
+def test_retry_after_pauses_every_caller(mock_gemini, monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_MAX_CONCURRENCY", 8)
+    monkeypatch.setattr(settings, "GEMINI_MAX_RETRY_AFTER", 1.2)
+    mock_gemini.rate = 2            # the third call in a second gets a 429...
+    mock_gemini.retry_after = 30    # ...asking for far longer than the cap
+
+    async def scenario():
+        first = asyncio.ensure_future(_timed_calls(3))
+        # Starts after the 429: waits out the pause instead of getting one too
+        late_answers, late_seconds = await _timed_calls(1, delay=0.2)
+        return await first, late_answers, late_seconds
+
+    (answers, seconds), late_answers, late_seconds = _run(scenario())
+    assert answers == ["ok"] * 3 and late_answers == ["ok"]
+    assert mock_gemini.stats["throttled"] == 1
+    assert 1.2 <= seconds < 5
+    assert late_seconds >= 0.9     # held until the pause ends, ~1s after it started
+
+
+def test_requests_per_minute_token_bucket(mock_gemini, monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "GEMINI_REQUESTS_PER_MINUTE", 240)
+
+    # A burst of 2 (one concurrency window), then one call every 0.25s
+    answers, seconds = _run(_timed_calls(5))
+    assert answers == ["ok"] * 5
+    assert mock_gemini.stats["throttled"] == 0
+    assert 3 * 0.25 - 0.05 <= seconds < 2
+
+
+def test_one_client_is_shared_across_calls(mock_gemini):
+    async def scenario():
+        await llm.call_gemini_api("warm-up")
+        client = llm._client
+        for i in range(4):
+            await llm.call_gemini_api(f"q{i}")
+        return client is llm._client
+
+    assert _run(scenario())
+    assert mock_gemini.stats["requests"] == 5
+    assert mock_gemini.stats["connections"] == 1
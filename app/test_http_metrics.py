@@ -0,0 +1,41 @@
+# test_http_metrics.py
+#
+# rag_http_request_seconds must cover a whole SSE stream, not just the time
+# until its headers were sent.
+
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+import main
+
+ROUTE = "/api/v1/hackrx/run/stream"
+HEADERS = {"Authorization": f"Bearer {main.settings.AUTH_TOKEN}"}
+
+
+@pytest.fixture
+def slow_stream(monkeypatch):
+    async def stream_answers(document_url, questions, tenant, scope, tokens, idle_seconds):
+        for i, _ in enumerate(questions):
+            await asyncio.sleep(0.1)
+            yield "answer", {"index": i, "answer": f"answer {i}"}
+
+    monkeypatch.setattr(main, "stream_answers", stream_answers)
+
+
+def _observed(route):
+    return main.HTTP_SECONDS.totals().get((route,), (0.0, 0))
+
+def test_stream_is_timed_until_the_last_event(slow_stream):
+    seconds_before, count_before = _observed(ROUTE)
+    t0 = time.perf_counter()
+    # Without the `with` block, so the lifespan (warm-up) doesn't run
+    response = TestClient(main.app).post(ROUTE, json={"documents": "", "questions": ["a", "b", "c"]}, headers=HEADERS)
+    wall = time.perf_counter() - t0
+    assert response.status_code == 200
+    assert response.text.count("event: answer") == 3 and "event: done" in response.text
+
+    seconds, count = _observed(ROUTE)
+    assert count == count_before + 1
+    assert 0.3 <= seconds - seconds_before <= wall
+    assert [value for _, _, value in main.HTTP_IN_FLIGHT.samples()] == [0]
@@ -0,0 +1,121 @@
+# test_lexical_index.py
+#
+# The BM25 side of hybrid search: tokenizing, scoring against the textbook
+# formula, reloading a saved CSR segment with postings added on top, and
+# reciprocal rank fusion.
+
+import math
+from collections import Counter
+import numpy as np
+import pytest
+from db.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+DOCS = [
+    "Room rent is capped at 1% of the sum insured per day.",
+    "Pre-existing diseases are covered after a waiting period of 36 months.",
+    "The waiting period for cataract surgery is 24 months.",
+    "Cataract surgery is covered up to Rs 40,000 per eye, see clause 3.1.4.",
+    "A grace period of thirty days is allowed for premium payment.",
+]
+MORE = [
+    "Maternity expenses have a waiting period of 9 months under clause 3.1.4.",
+    "Dental treatment is excluded unless caused by an accident.",
+]
+QUERIES = ["waiting period", "cataract surgery", "clause 3.1.4", "pre-existing", "dental accident", "rent"]
+
+
+def test_tokenize():
+    assert tokenize("What is the Grace-Period under Clause 3.1.4 for COVID-19?") == [
+        "grace-period", "grace", "period", "clause", "3.1.4", "covid-19", "covid", "19",
+    ]
+    # Stopword parts of a compound are dropped, the compound itself kept
+    assert tokenize("in-patient and/or day care") == ["in-patient", "patient", "and/or", "day", "care"]
+    assert tokenize("the of and") == []
+
+
+def _bm25(docs, query, k1, b):
+    # Textbook BM25 (with the +1 idf that never goes negative)
+    tokenized = [tokenize(d) for d in docs]
+    avg_len = sum(map(len, tokenized)) / len(tokenized)
+    scores = {}
+    for term, qtf in Counter(tokenize(query)).items():
+        containing = [i for i, tokens in enumerate(tokenized) if term in tokens]
+        idf = math.log(1 + (len(docs) - len(containing) + 0.5) / (len(containing) + 0.5))
+        for i in containing:
+            tf = tokenized[i].count(term)
+            norm = k1 * (1 - b + b * len(tokenized[i]) / avg_len)
+            scores[i] = scores.get(i, 0.0) + qtf * idf * tf * (k1 + 1) / (tf + norm)
+    return sorted(scores, key=lambda i: (-scores[i], i))
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_bm25_ranking_matches_the_formula(query):
+    index = LexicalIndex(k1=1.2, b=0.75)
+    index.add(DOCS)
+    assert index.search(tokenize(query), top_k=len(DOCS)).tolist() == _bm25(DOCS, query, 1.2, 0.75)
+
+
+def test_search_edges():
+    assert LexicalIndex().search(["cataract"], 3).tolist() == []
+    index = LexicalIndex()
+    index.add(DOCS)
+    assert index.search(["unknown"], 3).tolist() == []
+    assert len(index.search(tokenize("waiting period cataract"), 2)) == 2
+    batch = index.search_batch([tokenize("rent"), ["unknown"]], 3)
+    assert batch.tolist() == [[0, -1, -1], [-1, -1, -1]]
+
+
+def test_reloaded_segment_plus_tail_matches_a_fresh_index(tmp_path):
+    saved = LexicalIndex()
+    saved.add(DOCS + MORE[:1])
+    saved.save(str(tmp_path), count=len(DOCS))     # the last doc is not in the segment
+    reloaded = LexicalIndex.open(str(tmp_path))
+    assert len(reloaded) == len(DOCS)
+
+    # Tail postings on top of the CSR rows, for old terms and new ones
+    reloaded.add(MORE)
+    fresh = LexicalIndex()
+    fresh.add(DOCS + MORE)
+    for query in QUERIES:
+        tokens = tokenize(query)
+        assert reloaded.search(tokens, 10).tolist() == fresh.search(tokens, 10).tolist()
+
+    # Saving the mixed index again folds the tail into one segment
+    mixed_dir = tmp_path / "mixed"
+    mixed_dir.mkdir()
+    reloaded.save(str(mixed_dir))
+    again = LexicalIndex.open(str(mixed_dir))
+    for query in QUERIES:
+        tokens = tokenize(query)
+        assert again.search(tokens, 10).tolist() == fresh.search(tokens, 10).tolist()
+
+    assert LexicalIndex.open(str(tmp_path / "missing")) is None
+
+
+def test_rrf_sums_ranks_and_breaks_ties_by_lower_id():
+    dense = np.array([[7, 5, 3]])
+    sparse = np.array([[5, 7, 9]])
+    ids, scores = reciprocal_rank_fusion([dense, sparse], top_k=4, k=60)
+    # 5 and 7 tie at 1/61 + 1/62; 3 and 9 at 1/63
+    assert ids.tolist() == [[5, 7, 3, 9]]
+    assert scores[0] == pytest.approx([1 / 61 + 1 / 62] * 2 + [1 / 63] * 2)
+
+
+def test_rrf_skips_and_pads_with_minus_one():
+    dense = np.array([[4, -1, -1], [-1, -1, -1]])
+    sparse = np.array([[2, 4, -1], [-1, -1, -1]])
+    ids, scores = reciprocal_rank_fusion([dense, sparse], top_k=4, k=60)
+    assert ids.tolist() == [[4, 2, -1, -1], [-1, -1, -1, -1]]
+    assert scores[0].tolist()[2:] == [0, 0] and scores[1].tolist() == [0, 0, 0, 0]
+
+    empty_ids, empty_scores = reciprocal_rank_fusion([np.full((2, 3), -1)], top_k=2)
+    assert empty_ids.tolist() == [[-1, -1], [-1, -1]] and not empty_scores.any()
+
+
+def test_rrf_weights():
+    dense = np.array([[1, 2]])
+    sparse = np.array([[2, 1]])
+    assert reciprocal_rank_fusion([dense, sparse], 2, k=60, weights=(2.0, 1.0))[0].tolist() == [[1, 2]]
+    assert reciprocal_rank_fusion([dense, sparse], 2, k=60, weights=(1.0, 2.0))[0].tolist() == [[2, 1]]
+    ids, scores = reciprocal_rank_fusion([dense, sparse], 2, k=60, weights=(1.0, 0.0))
+    assert ids.tolist() == [[1, 2]] and scores[0] == pytest.approx([1 / 61, 1 / 62])
@@ -0,0 +1,51 @@
+# test_parallel_parse.py
+#
+# Page-window PDF parsing across a process pool must give byte-identical text
+# to the serial parsers, and page-by-page iteration must add up to the whole.
+
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+
+pytest.importorskip("pymupdf")
+pytest.importorskip("pymupdf4llm")
+pytest.importorskip("pdfplumber")
+
+from benchmarks.bench_pipeline import build_document
+from parser.document_parser import iter_document_pages, parse_document, parse_pdf_parallel
+
+URL = "https://example.com/policy.pdf"
+
+
+@pytest.fixture(scope="module")
+def pdf() -> bytes:
+    return build_document("pdf", pages=4, seed=3)
+
+@pytest.fixture(scope="module")
+def serial(pdf):
+    return {mode: parse_document(pdf, URL, mode=mode) for mode in ("plain", "markdown")}
+
+@pytest.fixture(scope="module")
+def pool():
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        yield executor
+
+
+@pytest.mark.parametrize("mode", ["plain", "markdown"])
+@pytest.mark.parametrize("window", [1, 3])
+def test_parallel_matches_serial(pdf, serial, pool, mode, window):
+    assert serial[mode].strip()
+    assert parse_pdf_parallel(pdf, pool, mode, window=window, max_in_flight=2) == serial[mode]
+
+
+@pytest.mark.parametrize("mode", ["plain", "markdown"])
+def test_pages_join_to_the_document(pdf, serial, pool, mode):
+    inline = list(iter_document_pages(pdf, URL, mode=mode))
+    pooled = list(iter_document_pages(pdf, URL, mode=mode, executor=pool, window=2, max_in_flight=2))
+    assert len(inline) == 4
+    assert inline == pooled
+    assert "".join(inline) == serial[mode]
+
+
+def test_non_pdf_is_one_piece(pool):
+    text = build_document("txt", pages=2, seed=1)
+    assert list(iter_document_pages(text, "https://example.com/policy.txt", executor=pool)) == [text.decode("utf-8")]
@@ -0,0 +1,95 @@
+# test_partitions.py
+#
+# Tenant routing (client-supplied tenants are checked against the allow-list
+# and the partition cap), the memory budget, and scope="document" retrieval.
+
+import asyncio
+import numpy as np
+import pytest
+from cache.document_cache import CachedDocument
+from config import settings
+from db.chunk_metadata import ChunkMeta
+from db.partitions import PartitionedVectorStore, UnknownTenant, allowed_tenants, partition_name
+from db.vector_store import FaissVectorStore
+from embedder.embed import embed_texts
+from rag.rag_system import retrieve_async
+
+DIM = 8
+
+
+def _partitions(tmp_path, tenants="", max_partitions=0, memory_budget=1 << 30):
+    return PartitionedVectorStore(
+        root=str(tmp_path), memory_budget=memory_budget, dim=DIM,
+        allowed=allowed_tenants(tenants), max_partitions=max_partitions,
+    )
+
+
+def test_allowed_tenants_parsing():
+    assert allowed_tenants(" acme, globex ,,") == {"acme", "globex"}
+    assert allowed_tenants("") == frozenset()
+
+
+def test_unknown_tenants_are_refused(tmp_path):
+    partitions = _partitions(tmp_path, tenants="acme")
+    assert partitions.route("acme") == partition_name("acme")
+    assert partitions.route(None) == partition_name(settings.DEFAULT_TENANT)
+    with pytest.raises(UnknownTenant):
+        partitions.route("someone-else")
+    assert "someone-else" not in partitions.routes()
+
+
+def test_routing_table_and_provisioning_admit_tenants(tmp_path):
+    # An operator provisions a tenant; afterwards it is routed like any other,
+    # also by a fresh manager reading ROUTING.json
+    _partitions(tmp_path).route("initech", provision=True)
+    assert _partitions(tmp_path).route("initech") == partition_name("initech")
+
+
+def test_wildcard_is_still_capped(tmp_path):
+    partitions = _partitions(tmp_path, tenants="*", max_partitions=2)
+    partitions.route("a")
+    partitions.route("b")
+    with pytest.raises(UnknownTenant, match="limit"):
+        partitions.route("c")
+    # Known tenants keep working at the cap
+    assert partitions.route("a") == partition_name("a")
+
+
+def test_budget_unloads_least_recently_used(tmp_path):
+    partitions = _partitions(tmp_path, tenants="*")
+    vectors = np.random.default_rng(0).random((200, DIM), dtype=np.float32)
+    for tenant in ("a", "b", "c"):
+        with partitions.use(tenant) as store:
+            store.add_documents([f"{tenant} chunk {i}" for i in range(200)], vectors)
+    one = partitions.stats()["resident"][partition_name("a")]["bytes"]
+
+    partitions.memory_budget = 2 * one
+    with partitions.use("c"):
+        pass
+    assert set(partitions.stats()["resident"]) == {partition_name("b"), partition_name("c")}
+
+    # A pinned partition is never unloaded, even over budget
+    partitions.memory_budget = 0
+    pinned = partitions.route("b")
+    partitions.acquire(pinned)
+    with partitions.use("c"):
+        pass
+    assert set(partitions.stats()["resident"]) == {pinned}
+    partitions.release(pinned)
+    assert partitions.stats()["resident"] == {}
+
+
+def test_document_scope_includes_chunks_stored_for_other_documents(hashing_model):
+    shared = "Pre-existing diseases are covered after a waiting period of 36 months."
+    stored = [shared, "Room rent is capped at 1% of the sum insured per day."]
+    store = FaissVectorStore(hashing_model.dim, persist_path=None)
+    store.add_documents(stored, embed_texts(stored), metadata=[ChunkMeta("doc-a")] * len(stored))
+
+    # Document B repeats A's clause: dedup keeps only A's copy in the store
+    chunks = [shared, "Dental treatment is excluded unless caused by an accident."]
+    doc = CachedDocument("doc-b", chunks, embed_texts(chunks))
+
+    question = ["What is the waiting period for pre-existing diseases?"]
+    ((top_new, top_existing),) = asyncio.run(retrieve_async(store, doc, question, scope="document"))
+    assert shared in top_new
+    assert top_existing == []
@@ -0,0 +1,64 @@
+# test_select_context.py
+#
+# select_context on hand-built hits: the distance cut-off
+# (CONTEXT_MAX_DISTANCE), the relative score cut-off (CONTEXT_MIN_SCORE_RATIO),
+# the token budget (CONTEXT_TOKEN_BUDGET) and how the picks are split
+# between the new document and the existing store.
+
+import math
+from db.vector_store import SearchResult
+from rag.rag_system import estimate_tokens, select_context
+
+CLAUSE = "Clause {}: covered subject to the policy terms and waiting periods."
+
+
+def _hit(n: int, distance: float, score: float, text: str = None) -> SearchResult:
+    return SearchResult(n, text or CLAUSE.format(n), distance, score)
+
+def _select(new, existing=(), **kwargs):
+    kwargs = {"token_budget": 10_000, "max_chunks": 10, "max_distance": 0.0, "min_score_ratio": 0.0, **kwargs}
+    return select_context(list(new), list(existing), **kwargs)
+
+
+def test_max_distance_drops_far_hits_but_keeps_bm25_only_ones():
+    new = [_hit(1, 0.4, 0.9), _hit(2, 1.6, 0.5), _hit(3, math.nan, 0.7)]
+    assert _select(new, max_distance=1.0) == ([CLAUSE.format(1), CLAUSE.format(3)], [])
+    # 0 → off
+    assert len(_select(new)[0]) == 3
+
+
+def test_min_score_ratio_is_relative_to_the_best_hit_of_either_store():
+    new = [_hit(1, 0.5, 0.40)]
+    existing = [_hit(2, 0.1, 1.00), _hit(3, 0.3, 0.55), _hit(4, 0.2, 0.49)]
+    assert _select(new, existing, min_score_ratio=0.5) == (
+        [], [CLAUSE.format(2), CLAUSE.format(3)]
+    )
+    assert _select(new, existing, min_score_ratio=0.4) == (
+        [CLAUSE.format(1)], [CLAUSE.format(2), CLAUSE.format(3), CLAUSE.format(4)]
+    )
+
+
+def test_token_budget_takes_best_first_and_skips_what_does_not_fit():
+    cost = estimate_tokens(CLAUSE.format(1))
+    short = "Dental is excluded."
+    hits = [_hit(1, 0.1, 0.9), _hit(2, 0.2, 0.8), _hit(3, 0.3, 0.7), _hit(4, 0.4, 0.6, text=short)]
+
+    top_new, _ = _select(hits, token_budget=2 * cost + estimate_tokens(short))
+    # Clause 3 would overrun the budget; the shorter, lower-scored chunk still fits
+    assert top_new == [CLAUSE.format(1), CLAUSE.format(2), short]
+
+    # The best hit is always taken, even over budget
+    assert _select(hits, token_budget=1)[0] == [CLAUSE.format(1)]
+    assert _select(hits, max_chunks=2)[0] == [CLAUSE.format(1), CLAUSE.format(2)]
+
+
+def test_picks_are_split_between_new_and_existing_chunks():
+    shared = "Pre-existing diseases are covered after 36 months."
+    new = [_hit(1, 0.3, 0.70), _hit(9, 0.2, 0.80, text=shared)]
+    existing = [_hit(2, 0.1, 0.95), _hit(5, 0.2, 0.80, text=shared), _hit(3, 0.4, 0.60)]
+
+    top_new, top_existing = _select(new, existing)
+    # Ordered by score within each list; a chunk found in both counts once, as new
+    assert top_new == [shared, CLAUSE.format(1)]
+    assert top_existing == [CLAUSE.format(2), CLAUSE.format(3)]
+    assert _select([], []) == ([], [])
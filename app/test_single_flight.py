@@ -0,0 +1,88 @@
+# test_single_flight.py
+#
+# SingleFlight coalescing: concurrent callers with the same key share one run
+# (result or exception), and a finished key runs again on the next call.
+
+import asyncio
+import pytest
+from rag.single_flight import SingleFlight
+
+
+class _Work:
+    """Counts runs; each run waits for `release` and returns/raises `outcome`."""
+    def __init__(self, outcome="done"):
+        self.runs = 0
+        self.release = asyncio.Event()
+        self.outcome = outcome
+
+    async def __call__(self):
+        self.runs += 1
+        await self.release.wait()
+        if isinstance(self.outcome, BaseException):
+            raise self.outcome
+        return self.outcome
+
+
+def test_concurrent_callers_share_one_run():
+    async def main():
+        flights = SingleFlight()
+        work = _Work()
+        callers = [asyncio.ensure_future(flights.do("doc", work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flights.is_running("doc")
+        work.release.set()
+        results = await asyncio.gather(*callers)
+        assert not flights.is_running("doc")
+        return work.runs, results
+
+    runs, results = asyncio.run(main())
+    assert runs == 1
+    assert results == ["done"] * 5
+
+
+def test_exception_reaches_every_caller():
+    async def main():
+        flights = SingleFlight()
+        work = _Work(ValueError("download failed"))
+        callers = [asyncio.ensure_future(flights.do("doc", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        work.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        return work.runs, results, flights.is_running("doc")
+
+    runs, results, running = asyncio.run(main())
+    assert runs == 1
+    assert all(isinstance(r, ValueError) and str(r) == "download failed" for r in results)
+    assert results[0] is results[1] is results[2]
+    assert not running
+
+
+def test_different_keys_and_later_calls_run_again():
+    async def main():
+        flights = SingleFlight()
+        work = _Work()
+        work.release.set()
+        first = await asyncio.gather(flights.do("a", work), flights.do("b", work))
+        again = await flights.do("a", work)
+        return work.runs, first, again
+
+    runs, first, again = asyncio.run(main())
+    assert runs == 3
+    assert first == ["done", "done"] and again == "done"
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def main():
+        flights = SingleFlight()
+        work = _Work()
+        leader = asyncio.ensure_future(flights.do("doc", work))
+        follower = asyncio.ensure_future(flights.do("doc", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        work.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return work.runs, await follower
+
+    assert asyncio.run(main()) == (1, "done")
@@ -0,0 +1,146 @@
+# test_streaming.py
+#
+# The streaming endpoint's event flow: stream_answers hands out each answer
+# (and, if asked, Gemini's partial text) under the right question index as
+# it arrives, and main._answer_events turns that into SSE frames, retries a
+# failure before the first event, reports later ones and pings when idle.
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+import pytest
+from fastapi import HTTPException
+import main
+from config import settings
+from rag import answering
+from rag.answering import stream_answers
+
+QUESTIONS = ["What is the grace period?", "Is cataract covered?", "Is dental covered?"]
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    """
+    Skips ingestion and retrieval; Gemini answers question i after
+    delays[i] seconds, streaming "answer" and " <i>" as two fragments.
+    """
+    fake = type("FakeGemini", (), {"delays": [0.0] * len(QUESTIONS)})()
+
+    @asynccontextmanager
+    async def request_store(tenant=None):
+        yield None, None
+
+    async def ingest_async(document_url, persistent_store=None):
+        return persistent_store, None
+
+    async def retrieve_async(persistent_store, doc, questions, query_vecs=None, scope="all"):
+        return [([], []) for _ in questions]
+
+    async def call(prompt, on_text=None, **_):
+        i = next(i for i, q in enumerate(QUESTIONS) if q in prompt)
+        await asyncio.sleep(fake.delays[i])
+        if on_text is not None:
+            on_text("answer")
+            on_text(f" {i}")
+        return f"answer {i}"
+
+    monkeypatch.setattr(answering, "request_store", request_store)
+    monkeypatch.setattr(answering, "ingest_async", ingest_async)
+    monkeypatch.setattr(answering, "retrieve_async", retrieve_async)
+    monkeypatch.setattr(answering, "call_gemini_api", call)
+    monkeypatch.setattr(settings, "LLM_BATCH_QUESTIONS", False)
+    return fake
+
+
+def _collect(stream):
+    async def run():
+        return [event async for event in stream]
+    return asyncio.run(run())
+
+def _frames(text_frames):
+    # SSE frames → (event, data) pairs; comments (pings) as ("ping", None)
+    parsed = []
+    for frame in text_frames:
+        if frame.startswith(":"):
+            parsed.append(("ping", None))
+            continue
+        event, data = frame.strip().split("\n")
+        parsed.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return parsed
+
+def _request(**kwargs):
+    return main.StreamQueryRequest(documents="", questions=QUESTIONS, **kwargs)
+
+
+def test_answers_carry_their_index_when_calls_finish_out_of_order(fake_pipeline):
+    fake_pipeline.delays = [0.2, 0.1, 0.0]
+    events = _collect(stream_answers(None, QUESTIONS))
+    assert events == [("answer", {"index": i, "answer": f"answer {i}"}) for i in (2, 1, 0)]
+
+
+def test_token_events_precede_each_answer(fake_pipeline):
+    fake_pipeline.delays = [0.1, 0.0, 0.2]
+    events = _collect(stream_answers(None, QUESTIONS, tokens=True))
+    for i in range(len(QUESTIONS)):
+        own = [(kind, data) for kind, data in events if data["index"] == i]
+        assert own == [
+            ("token", {"index": i, "text": "answer"}),
+            ("token", {"index": i, "text": f" {i}"}),
+            ("answer", {"index": i, "answer": f"answer {i}"}),
+        ]
+    # Without tokens=True, only answers
+    assert all(kind == "answer" for kind, _ in _collect(stream_answers(None, QUESTIONS)))
+
+
+def test_idle_stream_yields_pings(fake_pipeline, monkeypatch):
+    fake_pipeline.delays = [0.35, 0.0, 0.0]
+    events = _collect(stream_answers(None, QUESTIONS, idle_seconds=0.1))
+    assert events[:2] == [("answer", {"index": 1, "answer": "answer 1"}),
+                          ("answer", {"index": 2, "answer": "answer 2"})]
+    # ~3 idle intervals before the slow answer
+    pings = events[2:-1]
+    assert len(pings) >= 2 and set(pings) == {None}
+    assert events[-1] == ("answer", {"index": 0, "answer": "answer 0"})
+
+    monkeypatch.setattr(settings, "STREAM_PING_SECONDS", 0.1)
+    frames = _frames(_collect(main._answer_events("", _request())))
+    assert frames.count(("ping", None)) >= 2
+    assert frames[-1] == ("done", {"answers": len(QUESTIONS)})
+
+
+def test_failure_before_the_first_event_is_retried(monkeypatch):
+    attempts = []
+
+    async def flaky(document_url, questions, tenant, scope, tokens, idle_seconds):
+        attempts.append(tenant)
+        if len(attempts) == 1:
+            raise HTTPException(status_code=502, detail="Gemini API error: 503")
+        for i, _ in enumerate(questions):
+            yield "answer", {"index": i, "answer": f"{i + 1}. answer {i}"}
+
+    monkeypatch.setattr(main, "stream_answers", flaky)
+    monkeypatch.setattr(settings, "INITIAL_RETRY_DELAY_MS", 1)
+    frames = _frames(_collect(main._answer_events("", _request())))
+    assert len(attempts) == 2
+    # Answers are cleaned the same way as the non-streaming endpoint's
+    assert frames == [("answer", {"index": i, "answer": f"answer {i}"}) for i in range(3)] + [
+        ("done", {"answers": 3})
+    ]
+
+
+def test_failure_after_an_event_ends_the_stream_with_an_error(monkeypatch):
+    attempts = []
+
+    async def failing(document_url, questions, tenant, scope, tokens, idle_seconds):
+        attempts.append(tenant)
+        yield "answer", {"index": 0, "answer": "answer 0"}
+        raise HTTPException(status_code=502, detail="Gemini API error: 503")
+
+    monkeypatch.setattr(main, "stream_answers", failing)
+    monkeypatch.setattr(settings, "INITIAL_RETRY_DELAY_MS", 1)
+    frames = _frames(_collect(main._answer_events("", _request())))
+    assert len(attempts) == 1   # a retry would repeat answer 0
+    assert frames == [
+        ("answer", {"index": 0, "answer": "answer 0"}),
+        ("error", {"status": 502, "detail": "Gemini API error: 503"}),
+    ]
@@ -0,0 +1,130 @@
+# test_wal_replay.py
+#
+# Crash recovery of the persistent vector store: reopening replays the
+# write-ahead log, keeps every intact record and drops a torn or corrupt tail.
+
+import os
+import pickle
+import numpy as np
+import pytest
+from db.vector_store import MANIFEST_FILE, FaissVectorStore
+from db.wal import _FRAME, append_record, read_records
+
+DIM = 8
+
+
+def _vectors(n: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).random((n, DIM), dtype=np.float32)
+
+def _wal_path(store: FaissVectorStore) -> str:
+    return os.path.join(store.persist_path, store._wals[-1])
+
+
+def test_reopen_replays_every_record(tmp_path):
+    store = FaissVectorStore(DIM, persist_path=str(tmp_path))
+    store.add_documents(["a1", "a2"], _vectors(2, 0))
+    store.add_documents(["b1"], _vectors(1, 1))
+
+    reopened = FaissVectorStore(DIM, persist_path=str(tmp_path))
+    assert list(reopened.texts) == ["a1", "a2", "b1"]
+    assert reopened.search(_vectors(1, 1)[0], top_k=1) == ["b1"]
+
+
+def test_truncated_tail_record_is_dropped_and_repaired(tmp_path):
+    store = FaissVectorStore(DIM, persist_path=str(tmp_path))
+    store.add_documents(["a1", "a2"], _vectors(2, 0))
+    wal = _wal_path(store)
+    intact_size = os.path.getsize(wal)
+    store.add_documents(["b1"], _vectors(1, 1))
+    # Crash mid-append: only part of the second record reached the disk
+    with open(wal, "r+b") as f:
+        f.truncate(intact_size + _FRAME.size + 5)
+
+    reopened = FaissVectorStore(DIM, persist_path=str(tmp_path))
+    assert list(reopened.texts) == ["a1", "a2"]
+    assert os.path.getsize(wal) == intact_size
+
+    # Later appends land right after the last intact record and survive a reopen
+    reopened.add_documents(["c1"], _vectors(1, 2))
+    assert list(FaissVectorStore(DIM, persist_path=str(tmp_path)).texts) == ["a1", "a2", "c1"]
+
+
+def test_corrupt_record_stops_replay(tmp_path):
+    store = FaissVectorStore(DIM, persist_path=str(tmp_path))
+    store.add_documents(["a1"], _vectors(1, 0))
+    wal = _wal_path(store)
+    intact_size = os.path.getsize(wal)
+    store.add_documents(["b1"], _vectors(1, 1))
+    store.add_documents(["c1"], _vectors(1, 2))
+    # Flip a byte inside the second record's payload: its CRC no longer matches
+    with open(wal, "r+b") as f:
+        f.seek(intact_size + _FRAME.size + 2)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    reopened = FaissVectorStore(DIM, persist_path=str(tmp_path))
+    assert list(reopened.texts) == ["a1"]
+    assert os.path.getsize(wal) == intact_size
+
+
+def test_read_records_without_repair_leaves_file_alone(tmp_path):
+    wal = str(tmp_path / "wal-000000.log")
+    size = append_record(wal, ["x"], _vectors(1, 0), fsync=False)
+    with open(wal, "ab") as f:
+        f.write(b"WAL1garbage")
+
+    records = list(read_records(wal, repair=False))
+    assert [texts for texts, _, _ in records] == [["x"]]
+    np.testing.assert_array_equal(records[0][1], _vectors(1, 0))
+    assert os.path.getsize(wal) == size + len(b"WAL1garbage")
+
+
+def test_legacy_layout_is_migrated_without_deleting_it(tmp_path):
+    faiss = pytest.importorskip("faiss")
+    index = faiss.IndexFlatL2(DIM)
+    index.add(_vectors(3, 0))
+    faiss.write_index(index, str(tmp_path / "index.faiss"))
+    with open(tmp_path / "texts.pkl", "wb") as f:
+        pickle.dump(["p1", "p2", "p3"], f)
+
+    store = FaissVectorStore(DIM, persist_path=str(tmp_path))
+    store.compact(wait=True)
+    assert store._base_name.startswith("base-")
+    assert {"index.faiss", "texts.pkl", MANIFEST_FILE} <= set(os.listdir(tmp_path))
+
+    reopened = FaissVectorStore(DIM, persist_path=str(tmp_path))
+    assert reopened._base_name == store._base_name
+    assert list(reopened.texts) == ["p1", "p2", "p3"]
+
+
+def test_failed_compaction_keeps_ids_aligned(tmp_path, monkeypatch):
+    from db import vector_store
+
+    store = FaissVectorStore(DIM, persist_path=str(tmp_path))
+    vectors = _vectors(6, 0)
+    store.add_documents(["a1", "a2"], vectors[:2])
+    store.compact(wait=True)
+    store.add_documents(["b1", "b2"], vectors[2:4])
+
+    fsync_dir = vector_store.fsync_dir
+    def broken_fsync(path):
+        # Only while writing the new segment (step 2), not the manifest
+        if path.endswith(".tmp"):
+            raise OSError("disk full")
+        fsync_dir(path)
+    monkeypatch.setattr(vector_store, "fsync_dir", broken_fsync)
+    with pytest.raises(OSError):
+        store.compact(wait=True)
+    monkeypatch.undo()
+
+    # Adds after the failure, then a compaction that succeeds
+    store.add_documents(["c1", "c2"], vectors[4:])
+    store.compact(wait=True)
+
+    texts = ["a1", "a2", "b1", "b2", "c1", "c2"]
+    for reopened in (store, FaissVectorStore(DIM, persist_path=str(tmp_path))):
+        assert list(reopened.texts) == texts
+        assert reopened.index.ntotal == len(texts)
+        for text, vector in zip(texts, vectors):
+            assert reopened.search(vector, top_k=1) == [text]